@@ -1,5 +1,6 @@
 import os
 import re
+import time
 from enum import Enum
 from pathlib import Path
 
@@ -17,6 +18,10 @@ role_arn = (
     else "arn:aws:iam::760097843905:role/platform-developer"
 )
 
+# How long (in seconds) a copy of an API's search templates is used for
+# before checking whether they've changed
+search_templates_ttl = int(os.environ.get("RANK_SEARCH_TEMPLATES_TTL", 300))
+
 
 class ContentType(str, Enum):
     works = "works"
@@ -33,6 +38,9 @@ data_directory = Path(typer.get_app_dir("weco/rank"))
 index_config_directory = data_directory / "index_config"
 query_directory = data_directory / "queries"
 term_directory = data_directory / "terms"
+results_directory = data_directory / "results"
+corpus_directory = data_directory / "corpus"
+cache_directory = data_directory / "cache"
 
 # make sure that the directories exist
 for directory in [
@@ -40,9 +48,78 @@ for directory in [
     index_config_directory,
     query_directory,
     term_directory,
+    results_directory,
+    corpus_directory,
 ]:
     directory.mkdir(parents=True, exist_ok=True)
 
+# the cache holds credentials, so it should only be readable by its owner.
+# mkdir's mode only applies to a new directory, so tighten an existing one
+cache_directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+cache_directory.chmod(0o700)
+
+
+# Search templates which have already been fetched by this process
+_search_templates: dict[str, list[dict]] = {}
+
+
+def get_search_templates(api_url: str) -> list[dict]:
+    """
+    Returns the search templates from an API's `search-templates.json`.
+
+    Templates are cached in memory for the life of the process, and on disk
+    for `search_templates_ttl` seconds. After that, a conditional request is
+    used to check whether they've changed. If the API can't be reached, an
+    expired copy is used rather than failing.
+    """
+    # The cache module depends on the paths defined in this module
+    from .services import cache
+
+    if api_url in _search_templates:
+        return _search_templates[api_url]
+
+    cached_templates = cache.read("search_templates")
+    cached = cached_templates.get(api_url)
+    if cached is not None and (
+        time.time() - cached["fetched"] < search_templates_ttl
+    ):
+        _search_templates[api_url] = cached["templates"]
+        return cached["templates"]
+
+    headers = {}
+    if cached is not None and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached is not None and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        response = requests.get(
+            f"{api_url}/search-templates.json",
+            timeout=10,
+            headers=headers,
+        )
+        if cached is None or response.status_code != 304:
+            response.raise_for_status()
+            cached = {
+                "templates": response.json()["templates"],
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+    except requests.RequestException:
+        if cached is None:
+            raise
+        typer.echo(
+            f"Couldn't reach {api_url}, using search templates fetched at "
+            f"{time.ctime(cached['fetched'])}",
+            err=True,
+        )
+    else:
+        cached["fetched"] = time.time()
+        cache.write("search_templates", {**cached_templates, api_url: cached})
+
+    _search_templates[api_url] = cached["templates"]
+    return cached["templates"]
+
 
 def get_pipeline_search_template(
     api_url: str, content_type: ContentType
@@ -52,10 +129,7 @@ def get_pipeline_search_template(
     # raw value, e.g. "works".
     content_type_value = content_type.value
 
-    search_templates = requests.get(
-        f"{api_url}/search-templates.json",
-        timeout=10,
-    ).json()["templates"]
+    search_templates = get_search_templates(api_url)
 
     docs = next(
         template
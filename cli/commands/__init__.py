@@ -1,4 +1,6 @@
+import os
 from typing import Any, Optional, cast
+from urllib.parse import urlparse
 
 import beaupy
 import typer
@@ -6,6 +8,7 @@ from elasticsearch import Elasticsearch
 
 from .. import (
     ContentType,
+    get_pipeline_search_template,
     index_config_directory,
     query_directory,
 )
@@ -146,6 +149,28 @@ def prompt_user_to_choose_a_local_query(
     return query_path
 
 
+def read_query(query: Optional[str], content_type: ContentType) -> str:
+    """
+    Returns the contents of a query template, given either a URL of catalogue
+    API search templates or a local file path. If neither is given, the user
+    is prompted to choose one of the local queries.
+    """
+    if query is not None and str(urlparse(query).scheme).startswith("http"):
+        search_template = get_pipeline_search_template(
+            api_url=query, content_type=content_type
+        )
+        return search_template["query"]
+    elif query and os.path.isfile(query):
+        with open(query) as file_contents:
+            return file_contents.read()
+    else:
+        query_path = prompt_user_to_choose_a_local_query(
+            query, content_type=content_type
+        )
+        with open(query_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
 def raise_if_index_already_exists(client: Elasticsearch, index: str):
     if client.indices.exists(index=index):
         raise typer.BadParameter(f"{index} already exists")
@@ -1,23 +1,46 @@
 import beaupy
+import contextlib
+import itertools
 import json
-from typing import Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from time import monotonic, sleep
+from typing import Any, Optional, Union
 
+import rich.progress
 import typer
 from elasticsearch import Elasticsearch
 
 from .. import (
+    Cluster,
     ContentType,
+    corpus_directory,
     index_config_directory,
     get_pipeline_search_template,
     production_api_url,
 )
-from ..services import aws, elasticsearch
+from ..relevance_tests import collect_test_cases
+from ..searcher import Searcher
+from ..services import aws, bulk, corpus, elasticsearch
+from ..services.reindex import (
+    AdaptiveThrottle,
+    SearchLoadMonitor,
+    config_marker,
+    resumable_update,
+    sample_slice_boundaries,
+    slice_queries,
+)
 from . import (
     get_valid_indices,
     prompt_user_to_choose_a_local_config,
     prompt_user_to_choose_an_index,
     raise_if_index_already_exists,
+    read_query,
 )
+from ..templates import QueryTemplate
+from .task import follow_task
 
 app = typer.Typer(
     name="index",
@@ -40,6 +63,14 @@ def list_indices(context: typer.Context):
     typer.echo("\n".join(valid_indices))
 
 
+def parse_slices(slices: str) -> Union[int, str]:
+    if slices == "auto":
+        return slices
+    if not (slices.isdigit() and int(slices) > 0):
+        raise typer.BadParameter("--slices must be a positive number or auto")
+    return int(slices)
+
+
 @app.command()
 def create(
     context: typer.Context,
@@ -64,9 +95,38 @@ def create(
             "rank cluster"
         ),
     ),
+    batch_size: int = typer.Option(
+        default=1000,
+        help="The number of documents each reindex slice copies at once",
+        min=1,
+    ),
+    slices: str = typer.Option(
+        default="auto",
+        help=(
+            "The number of slices to split the reindex into, or 'auto' for "
+            "one per shard of the source index"
+        ),
+    ),
+    wait: bool = typer.Option(
+        default=True,
+        help=(
+            "Follow the reindex until it finishes. Refreshes and replicas are "
+            "turned off while it runs, and restored afterwards, only when "
+            "waiting"
+        ),
+    ),
+    force_merge_segments: Optional[int] = typer.Option(
+        default=None,
+        help=(
+            "After the reindex, merge each shard down to this many segments, "
+            "so that searches aren't slowed by many small segments"
+        ),
+        min=1,
+    ),
 ):
     """Create an index in the rank cluster"""
     client: Elasticsearch = context.meta["client"]
+    parsed_slices = parse_slices(slices)
     source_index = prompt_user_to_choose_an_index(
         client=client, index=source_index
     )
@@ -87,18 +147,55 @@ def create(
         f"Do you want to reindex {source_index} into {index}?",
         abort=True,
     ):
-        task = client.reindex(
-            body={
-                "source": {"index": source_index, "size": 100},
-                "dest": {"index": index},
-            },
-            wait_for_completion=False,
-        )
-        task_id = task["task"]
-        typer.echo(f"Reindex task {task_id} started")
-        typer.echo(
-            f"Run `rank task status --task-id={task_id}` to monitor its progress"
+        settings = (
+            bulk.bulk_indexing_settings(client, index)
+            if wait
+            else contextlib.nullcontext()
         )
+        with settings:
+            task = client.reindex(
+                source={"index": source_index, "size": batch_size},
+                dest={"index": index},
+                slices=parsed_slices,
+                wait_for_completion=False,
+            )
+            task_id = task["task"]
+            typer.echo(f"Reindex task {task_id} started")
+            if not wait:
+                typer.echo(
+                    f"Run `rank task status --task-id={task_id}` to monitor "
+                    "its progress"
+                )
+                return
+
+            finished = follow_task(client, task_id, "Reindexing")
+            if "error" in finished:
+                typer.echo(
+                    f"The reindex failed: {json.dumps(finished['error'])}",
+                    err=True,
+                )
+                raise typer.Exit(code=1)
+            response = finished["response"]
+            seconds = response["took"] / 1000
+            typer.echo(
+                f"Reindexed {response['created']} documents in "
+                f"{seconds:.1f}s ({response['created'] / max(seconds, 0.001):.0f} "
+                f"docs/s) with {slices} slices"
+            )
+            for failure in response.get("failures", [])[:10]:
+                typer.echo(json.dumps(failure), err=True)
+
+            if force_merge_segments is not None:
+                typer.echo(
+                    f"Merging each shard down to {force_merge_segments} "
+                    "segments"
+                )
+                start = monotonic()
+                client.options(request_timeout=3600).indices.forcemerge(
+                    index=index, max_num_segments=force_merge_segments
+                )
+                typer.echo(f"Merged in {monotonic() - start:.1f}s")
+        typer.echo("Restored the refresh interval and replicas")
 
 
 @app.command()
@@ -119,9 +216,62 @@ def update(
             "one from the index config directory"
         ),
     ),
+    query: Optional[str] = typer.Option(
+        default=None,
+        help="A JSON query restricting which documents to update",
+    ),
+    marker_field: Optional[str] = typer.Option(
+        default=None,
+        help=(
+            "A field in which to mark each document once it's updated (eg "
+            "rank.updated). Documents which are already marked are skipped, "
+            "so an interrupted update can be resumed by running it again. "
+            "The field is added to the mapping as a keyword"
+        ),
+    ),
+    marker: Optional[str] = typer.Option(
+        default=None,
+        help=(
+            "The value to mark updated documents with. The default is the "
+            "name of the config file and a hash of its contents"
+        ),
+    ),
+    slices: str = typer.Option(
+        default="auto",
+        help=(
+            "The number of slices to split the update into, or 'auto' for one "
+            "per shard"
+        ),
+    ),
+    scroll_size: int = typer.Option(
+        default=1000,
+        help="The number of documents each slice updates at once",
+        min=1,
+    ),
+    requests_per_second: Optional[float] = typer.Option(
+        default=None,
+        help=(
+            "The number of documents per second to update, across all slices. "
+            "Unthrottled if not provided. Use `rank task watch` to change it "
+            "while the update runs"
+        ),
+        min=0.1,
+    ),
+    proceed_on_conflicts: bool = typer.Option(
+        default=True,
+        help=(
+            "Skip documents which change while the update is running, rather "
+            "than stopping the update"
+        ),
+    ),
+    wait: bool = typer.Option(
+        default=True,
+        help="Follow the update until it finishes",
+    ),
 ):
     """Update an index in the rank cluster"""
     client: Elasticsearch = context.meta["client"]
+    parsed_slices = parse_slices(slices)
     index = prompt_user_to_choose_an_index(client=client, index=index)
     config_path = prompt_user_to_choose_a_local_config(config_path)
 
@@ -132,15 +282,62 @@ def update(
     client.indices.put_mapping(index=index, body=config["mappings"])
     typer.echo(f"{index} updated")
 
-    if typer.confirm(
+    if not typer.confirm(
         f"Do you want to update documents in {index} to use the new mapping?"
     ):
-        task = client.update_by_query(index=index, wait_for_completion=False)
-        task_id = task["task"]
-        typer.echo(f"Update task {task_id} started")
+        return
+
+    try:
+        update_query = json.loads(query) if query is not None else None
+    except json.JSONDecodeError:
+        raise typer.BadParameter("--query is not valid JSON")
+    script = None
+    if marker_field is not None:
+        marker = marker or config_marker(Path(config_path).stem, config)
+        client.indices.put_mapping(
+            index=index, properties={marker_field: {"type": "keyword"}}
+        )
+        update_query, script = resumable_update(
+            update_query, marker_field, marker
+        )
+        typer.echo(f"Marking updated documents with {marker_field}={marker}")
+    if update_query is not None:
+        remaining = client.count(index=index, query=update_query)["count"]
+        typer.echo(f"{remaining} documents to update")
+
+    task = client.update_by_query(
+        index=index,
+        query=update_query,
+        script=script,
+        slices=parsed_slices,
+        scroll_size=scroll_size,
+        conflicts="proceed" if proceed_on_conflicts else "abort",
+        requests_per_second=requests_per_second or -1,
+        wait_for_completion=False,
+    )
+    task_id = task["task"]
+    typer.echo(f"Update task {task_id} started")
+    if not wait:
         typer.echo(
-            f"Run `rank task status --task-id={task_id}` to monitor its progress"
+            "Run `rank task watch` to monitor its progress or rethrottle it"
         )
+        return
+
+    finished = follow_task(client, task_id, "Updating")
+    if "error" in finished:
+        typer.echo(
+            f"The update failed: {json.dumps(finished['error'])}", err=True
+        )
+        raise typer.Exit(code=1)
+    response = finished["response"]
+    seconds = response["took"] / 1000
+    typer.echo(
+        f"Updated {response['updated']} documents in {seconds:.1f}s "
+        f"({response['updated'] / max(seconds, 0.001):.0f} docs/s). "
+        f"{response['version_conflicts']} had conflicting changes"
+    )
+    for failure in response.get("failures", [])[:10]:
+        typer.echo(json.dumps(failure), err=True)
 
 
 @app.command(help="Delete an index")
@@ -191,6 +388,29 @@ def get(
     typer.echo(f"Index config written to {config_path}")
 
 
+def pipeline_remote(context: typer.Context, pipeline_date: str) -> dict:
+    """
+    The connection details a reindex in the rank cluster needs to read from
+    a pipeline cluster
+    """
+    secrets = aws.get_secrets(
+        session=context.meta["session"],
+        secret_prefix=f"elasticsearch/pipeline_storage_{pipeline_date}/",
+        secret_ids=[
+            "es_password",
+            "es_username",
+            "protocol",
+            "public_host",
+            "port",
+        ],
+    )
+    return {
+        "host": f"{secrets['protocol']}://{secrets['public_host']}:{secrets['port']}",
+        "username": secrets["es_username"],
+        "password": secrets["es_password"],
+    }
+
+
 @app.command()
 def replicate(
     context: typer.Context,
@@ -213,6 +433,66 @@ def replicate(
             "cluster. The default is to use the same name as the source index"
         ),
     ),
+    slices: int = typer.Option(
+        default=8,
+        help=(
+            "The number of reindex tasks to split the index between, by "
+            "ranges of --slice-field. Remote reindexes can't slice themselves"
+        ),
+        min=1,
+    ),
+    slice_field: str = typer.Option(
+        default="query.id",
+        help="A keyword or numeric field to split the index into slices by",
+    ),
+    batch_size: int = typer.Option(
+        default=500,
+        help="The number of documents each task fetches from production at once",
+        min=1,
+    ),
+    rate: float = typer.Option(
+        default=500,
+        help="The initial number of documents per second to copy, across all slices",
+        min=1,
+    ),
+    min_rate: float = typer.Option(
+        default=50,
+        help="The lowest number of documents per second to throttle down to",
+        min=1,
+    ),
+    max_rate: float = typer.Option(
+        default=20000,
+        help="The highest number of documents per second to throttle up to",
+        min=1,
+    ),
+    max_search_latency: float = typer.Option(
+        default=100,
+        help=(
+            "The mean production search latency, in milliseconds, above "
+            "which the copy is slowed down"
+        ),
+        min=1,
+    ),
+    max_search_queue: int = typer.Option(
+        default=10,
+        help=(
+            "The number of queued production searches above which the copy "
+            "is slowed down"
+        ),
+        min=0,
+    ),
+    poll_interval: float = typer.Option(
+        default=10,
+        help="How often to check production's load and rethrottle, in seconds",
+        min=1,
+    ),
+    watch: bool = typer.Option(
+        default=True,
+        help=(
+            "Stay running to rethrottle the tasks as production's load "
+            "changes. Without this, the tasks keep their initial rate"
+        ),
+    ),
 ):
     """Reindex an index from a production cluster to the rank cluster"""
     context.meta["session"] = aws.get_session(context.meta["role_arn"])
@@ -247,49 +527,569 @@ def replicate(
         text=(
             "Warning! Reindexing from the production cluster will put some "
             "extra pressure on it, and could affect production services like "
-            "the API. The reindex settings have been configured to minimise "
-            "this, but if you're worried, you might want to add capacity to "
-            "the production cluster before proceeding.\n\n"
+            "the API. The copy is throttled, and slowed down whenever "
+            "production searches slow down or queue, but if you're worried, "
+            "you might want to add capacity to the production cluster before "
+            "proceeding.\n\n"
             "Are you sure you want to proceed?"
         ),
         abort=True,
     ):
-        secrets = aws.get_secrets(
-            session=context.meta["session"],
-            secret_prefix=f"elasticsearch/pipeline_storage_{pipeline_date}/",
-            secret_ids=[
-                "es_password",
-                "es_username",
-                "protocol",
-                "public_host",
-                "port",
-            ],
+        remote = pipeline_remote(context, pipeline_date)
+        boundaries = sample_slice_boundaries(
+            pipeline_client, source_index, slice_field, slices
+        )
+        queries = slice_queries(slice_field, boundaries)
+        throttle = AdaptiveThrottle(
+            rate=rate,
+            min_rate=min_rate,
+            max_rate=max_rate,
+            max_latency_ms=max_search_latency,
+            max_queue=max_search_queue,
+        )
+
+        task_ids = []
+        for query in queries:
+            task = rank_client.reindex(
+                source={
+                    "remote": remote,
+                    "index": source_index,
+                    "query": query,
+                    "size": batch_size,
+                },
+                dest={"index": dest_index},
+                wait_for_completion=False,
+                # Each slice gets an equal share of the rate, which is
+                # measured in documents per second
+                requests_per_second=throttle.rate / len(queries),
+            )
+            task_ids.append(task["task"])
+
+        typer.echo(
+            f"Started {len(task_ids)} reindex tasks: {', '.join(task_ids)}"
+        )
+        if not watch:
+            typer.echo(
+                "Run `rank task watch` to monitor their progress or "
+                "rethrottle them"
+            )
+            return
+
+        typer.echo(
+            "Watching production's search load. Stopping this command leaves "
+            "the tasks running at their current rate"
+        )
+        watch_replication(
+            rank_client=rank_client,
+            monitor=SearchLoadMonitor(pipeline_client),
+            throttle=throttle,
+            task_ids=task_ids,
+            total=pipeline_client.count(index=source_index)["count"],
+            poll_interval=poll_interval,
+        )
+
+
+def watch_replication(
+    rank_client: Elasticsearch,
+    monitor: SearchLoadMonitor,
+    throttle: AdaptiveThrottle,
+    task_ids: list[str],
+    total: int,
+    poll_interval: float,
+):
+    """
+    Rethrottle reindex tasks according to the load on the cluster they're
+    copying from, until they've all finished
+    """
+    running = list(task_ids)
+    failures = []
+    with rich.progress.Progress(
+        *rich.progress.Progress.get_default_columns(),
+        rich.progress.TextColumn("{task.fields[status]}"),
+    ) as progress:
+        bar = progress.add_task("Replicating", total=total, status="")
+        while running:
+            sleep(poll_interval)
+            copied = 0
+            for task_id in list(task_ids):
+                task = rank_client.tasks.get(task_id=task_id)
+                status = task["task"]["status"]
+                copied += status["created"] + status["updated"]
+                if task["completed"] and task_id in running:
+                    running.remove(task_id)
+                    failures += task.get("response", {}).get("failures", [])
+
+            load = monitor.sample()
+            previous_rate = throttle.rate
+            throttle.update(load)
+            if running and throttle.rate != previous_rate:
+                for task_id in running:
+                    rank_client.reindex_rethrottle(
+                        task_id=task_id,
+                        requests_per_second=throttle.rate / len(running),
+                    )
+            progress.update(
+                bar,
+                completed=copied,
+                status=(
+                    f"{throttle.rate:.0f} docs/s, production search "
+                    f"{load.latency_ms:.0f}ms, {load.queue} queued, "
+                    f"{len(running)}/{len(task_ids)} slices running"
+                ),
+            )
+
+    if failures:
+        typer.echo(f"{len(failures)} documents failed to copy:")
+        for failure in failures[:10]:
+            typer.echo(json.dumps(failure))
+    else:
+        typer.echo("Replication complete")
+
+
+@app.command()
+def sample(
+    context: typer.Context,
+    content_type: ContentType = typer.Option(
+        default=None,
+        help="The content type of the tests to build a sample index for",
+        show_choices=True,
+        case_sensitive=False,
+        prompt=True,
+    ),
+    pipeline_date: str = typer.Option(
+        default=None,
+        help="The pipeline date from which to sample, uses the production cluster if unspecified",
+    ),
+    source_index: str = typer.Option(
+        default=None,
+        help=(
+            "The name of the index to sample. If an index is not provided, "
+            "the production index for the content type is used"
+        ),
+    ),
+    dest_index: str = typer.Option(
+        default=None,
+        help="The name of the index to create in the rank cluster",
+        prompt="The name of the index to create in the rank cluster",
+    ),
+    config_path: Optional[str] = typer.Option(
+        default=None,
+        help=(
+            "Path to a json file containing the index settings and mappings. "
+            "If a config file is not provided, you will be prompted to select "
+            "one from the index config directory"
+        ),
+    ),
+    query: Optional[str] = typer.Option(
+        default=None,
+        help=(
+            "The query used to find the top hits of each test search: a "
+            "local file path or a URL of catalogue API search templates"
+        ),
+    ),
+    top_n: int = typer.Option(
+        default=100,
+        help="The number of top hits of each test search to include",
+        min=0,
+    ),
+    background: int = typer.Option(
+        default=10000,
+        help=(
+            "The approximate number of randomly chosen documents to include. "
+            "More background documents make the sample's term statistics, "
+            "and so its scores, closer to the full index"
+        ),
+        min=0,
+    ),
+    batch_size: int = typer.Option(
+        default=500,
+        help="The number of documents to fetch from production at once",
+        min=1,
+    ),
+):
+    """
+    Build a small index in the rank cluster from the documents the relevance
+    tests need, plus a random sample of the rest
+    """
+    client: Elasticsearch = context.meta["client"]
+    if source_index is None:
+        source_index = elasticsearch._get_index_name(
+            pipeline_date, Cluster.pipeline_prod, content_type
         )
-        pipeline_host = f"{secrets['protocol']}://{secrets['public_host']}:{secrets['port']}"
-        pipeline_username = secrets["es_username"]
-        pipeline_password = secrets["es_password"]
-
-        task = rank_client.reindex(
-            body={
-                "source": {
-                    "remote": {
-                        "host": pipeline_host,
-                        "username": pipeline_username,
-                        "password": pipeline_password,
-                    },
+    if not pipeline_date:
+        prod_template = get_pipeline_search_template(
+            production_api_url, content_type=content_type
+        )
+        pipeline_date = prod_template["pipeline_date"]
+    pipeline_client = elasticsearch.pipeline_client(
+        context=context, pipeline_date=pipeline_date
+    )
+    if not pipeline_client.indices.exists(index=source_index):
+        raise typer.BadParameter(f"{source_index} does not exist")
+    raise_if_index_already_exists(client=client, index=dest_index)
+
+    config_path = prompt_user_to_choose_a_local_config(config_path)
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    test_cases = collect_test_cases(content_type.value)
+    ids = {
+        doc_id
+        for test_case in test_cases
+        for doc_id in test_case.referenced_ids
+    }
+    typer.echo(
+        f"{len(ids)} documents are referenced by {len(test_cases)} tests"
+    )
+
+    if top_n > 0:
+        query_template = QueryTemplate(
+            json.loads(read_query(query, content_type=content_type))
+        )
+        searcher = Searcher(
+            client=pipeline_client,
+            index=source_index,
+            render_query=query_template.render,
+            stable_sort_key="query.id",
+        )
+        searcher.prefetch(
+            (test_case.search_terms, top_n) for test_case in test_cases
+        )
+        for test_case in test_cases:
+            response = searcher.search(test_case.search_terms, top_n)
+            ids.update(hit["_id"] for hit in response["hits"]["hits"])
+        typer.echo(f"{len(ids)} documents including the top {top_n} hits")
+
+    client.indices.create(
+        index=dest_index,
+        mappings=config["mappings"],
+        settings=config["settings"],
+    )
+    typer.echo(f"Created {dest_index} with config {config_path}")
+
+    remote = pipeline_remote(context, pipeline_date)
+    queries: list[dict[str, Any]] = [
+        {"ids": {"values": list(chunk)}}
+        for chunk in itertools.batched(sorted(ids), 1000)
+    ]
+    if background > 0:
+        total = pipeline_client.count(index=source_index)["count"]
+        # Random scores are uniform between 0 and 1, so keeping those above
+        # 1 - p keeps each document with probability p
+        queries.append(
+            {
+                "function_score": {
+                    "random_score": {"seed": 0, "field": "_seq_no"},
+                    "boost_mode": "replace",
+                    "min_score": 1 - min(1, background / max(total, 1)),
+                }
+            }
+        )
+
+    # Remote reindexes of a few thousand documents only take a few minutes
+    reindex_client = client.options(request_timeout=3600)
+    with rich.progress.Progress() as progress:
+        bar = progress.add_task("Copying", total=len(queries))
+        for query_body in queries:
+            reindex_client.reindex(
+                source={
+                    "remote": remote,
                     "index": source_index,
-                    "size": 500,
+                    "query": query_body,
+                    "size": batch_size,
                 },
-                "dest": {"index": dest_index},
-            },
-            wait_for_completion=False,
-            requests_per_second=5,
-            # we minimise the impact on the production cluster by only indexing
-            # 500 documents at a time, and only issuing 5 requests per second
+                dest={"index": dest_index},
+                wait_for_completion=True,
+            )
+            progress.advance(bar)
+
+    client.indices.refresh(index=dest_index)
+    count = client.count(index=dest_index)["count"]
+    typer.echo(f"Copied {count} documents from {source_index} to {dest_index}")
+
+
+@app.command()
+def export(
+    context: typer.Context,
+    index: Optional[str] = typer.Option(
+        default=None,
+        help=(
+            "The name of the index to export. If an index is not provided, "
+            "you will be prompted to select one from the cluster"
+        ),
+    ),
+    cluster: Cluster = typer.Option(
+        default=Cluster.rank,
+        help="The ElasticSearch cluster to export from",
+        show_choices=True,
+        case_sensitive=False,
+    ),
+    pipeline_date: Optional[str] = typer.Option(
+        default=None,
+        help="An override for the pipeline date when a pipeline cluster is selected",
+    ),
+    content_type: Optional[ContentType] = typer.Option(
+        default=None,
+        help="The content type, used to find the index in a pipeline cluster",
+        show_choices=True,
+        case_sensitive=False,
+    ),
+    output: Optional[Path] = typer.Option(
+        default=None,
+        help=(
+            "The directory to write the export to. The default is a directory "
+            "named after the index in the corpus directory. An interrupted "
+            "export is resumed by running the same command again"
+        ),
+        file_okay=False,
+    ),
+    slices: int = typer.Option(
+        default=4,
+        help="The number of slices of the index to export in parallel",
+        min=1,
+    ),
+    sort_field: str = typer.Option(
+        default="query.id",
+        help=(
+            "A unique keyword field to slice and sort the index by, which "
+            "lets an interrupted export resume where it left off"
+        ),
+    ),
+    source_includes: Optional[list[str]] = typer.Option(
+        default=None,
+        help="Fields of each document's source to export (can be repeated)",
+    ),
+    source_excludes: Optional[list[str]] = typer.Option(
+        default=None,
+        help="Fields of each document's source to leave out (can be repeated)",
+    ),
+    page_size: int = typer.Option(
+        default=1000,
+        help="The number of documents each slice fetches at once",
+        min=1,
+    ),
+    shard_size: int = typer.Option(
+        default=50000,
+        help="The number of documents in each file of the export",
+        min=1,
+    ),
+):
+    """
+    Export the documents in an index to gzipped NDJSON files, for use with
+    `rank test --corpus`
+    """
+    # Each slice needs a connection of its own, so the export's client is
+    # created for it rather than reusing the callback's, which was sized
+    # before the number of slices was known
+    context.meta["concurrency"] = slices
+    if cluster == Cluster.rank and pipeline_date is None:
+        client: Elasticsearch = elasticsearch.rank_client(context)
+    else:
+        if content_type is None:
+            raise typer.BadParameter(
+                "--content-type is needed to export from a pipeline cluster"
+            )
+        client = elasticsearch._get_client(
+            context, pipeline_date, cluster, content_type
+        )
+        if index is None:
+            index = elasticsearch._get_index_name(
+                pipeline_date, cluster, content_type
+            )
+    index = prompt_user_to_choose_an_index(
+        client=client, index=index, content_type=content_type
+    )
+    directory = output or corpus_directory / index
+
+    manifest = corpus.read_manifest(directory)
+    if manifest is not None:
+        if manifest["index"] != index:
+            raise typer.BadParameter(
+                f"{directory} contains an export of {manifest['index']}"
+            )
+        typer.echo(f"Resuming the export in {directory}")
+    else:
+        source: Union[bool, dict[str, Any]] = True
+        if source_includes or source_excludes:
+            source = {
+                "includes": source_includes or [],
+                "excludes": source_excludes or [],
+            }
+        manifest = {
+            "index": index,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "sort_field": sort_field,
+            "source": source,
+            "boundaries": sample_slice_boundaries(
+                client, index=index, field=sort_field, slices=slices
+            ),
+        }
+        corpus.write_manifest(directory, manifest)
+    # A resumed export has to slice and sort the index in the same way
+    queries = slice_queries(manifest["sort_field"], manifest["boundaries"])
+
+    total = client.count(index=index)["count"]
+    resumed = sum(
+        corpus.SliceCheckpoint.read(directory, slice_number).documents
+        for slice_number in range(len(queries))
+    )
+    written = sum(
+        corpus.SliceCheckpoint.read(directory, slice_number).bytes
+        for slice_number in range(len(queries))
+    )
+    exported = 0
+    lock = threading.Lock()
+    start = monotonic()
+    pit_id = client.open_point_in_time(index=index, keep_alive="10m")["id"]
+    try:
+        with (
+            rich.progress.Progress() as progress,
+            ThreadPoolExecutor(max_workers=len(queries)) as executor,
+        ):
+            task = progress.add_task(
+                "Exporting", total=total, completed=resumed
+            )
+
+            def on_progress(documents: int, size: int):
+                nonlocal exported, written
+                with lock:
+                    exported += documents
+                    written += size
+                    progress.update(
+                        task,
+                        advance=documents,
+                        description=f"Exporting ({written / 1e6:.1f}MB)",
+                    )
+
+            futures = [
+                executor.submit(
+                    corpus.export_slice,
+                    client,
+                    index=index,
+                    pit_id=pit_id,
+                    query=query_body,
+                    sort_field=manifest["sort_field"],
+                    directory=directory,
+                    slice_number=slice_number,
+                    source=manifest["source"],
+                    page_size=page_size,
+                    shard_size=shard_size,
+                    on_progress=on_progress,
+                )
+                for slice_number, query_body in enumerate(queries)
+            ]
+            checkpoints = [future.result() for future in futures]
+    finally:
+        client.close_point_in_time(id=pit_id)
+
+    elapsed = monotonic() - start
+    documents = sum(checkpoint.documents for checkpoint in checkpoints)
+    typer.echo(
+        f"Exported {documents} documents from {index} to {directory} "
+        f"({sum(checkpoint.shards for checkpoint in checkpoints)} files, "
+        f"{written / 1e6:.1f}MB). This run exported {exported} documents in "
+        f"{elapsed:.1f}s ({exported / elapsed:.0f} docs/s) with "
+        f"{len(queries)} slices"
+    )
+
+
+@app.command(name="import")
+def import_corpus(
+    context: typer.Context,
+    corpus_path: Path = typer.Option(
+        ...,
+        "--corpus",
+        help=(
+            "An NDJSON file (or directory of files) of documents, like those "
+            "written by `rank index export`"
+        ),
+        exists=True,
+    ),
+    index: str = typer.Option(
+        default=None,
+        help="The name of the index to create in the rank cluster",
+        prompt="The name of the index to create in the rank cluster",
+    ),
+    config_path: Optional[str] = typer.Option(
+        default=None,
+        help=(
+            "Path to a json file containing the index settings and mappings. "
+            "If a config file is not provided, you will be prompted to select "
+            "one from the index config directory"
+        ),
+    ),
+    concurrency: int = typer.Option(
+        default=4,
+        help="The number of _bulk requests to have in flight at once",
+        min=1,
+    ),
+    batch_size_mb: float = typer.Option(
+        default=5,
+        help="The size of each _bulk request, in megabytes",
+        min=0.1,
+    ),
+    max_retries: int = typer.Option(
+        default=8,
+        help=(
+            "How many times to retry documents which the cluster rejects "
+            "because it's too busy, backing off exponentially"
+        ),
+        min=0,
+    ),
+):
+    """
+    Create an index in the rank cluster and load a corpus of documents into
+    it
+    """
+    client: Elasticsearch = context.meta["client"]
+    raise_if_index_already_exists(client=client, index=index)
+    config_path = prompt_user_to_choose_a_local_config(config_path)
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    client.indices.create(
+        index=index,
+        mappings=config["mappings"],
+        settings=config["settings"],
+    )
+    typer.echo(f"Created {index} with config {config_path}")
+
+    # Retries are handled by backing off, rather than by the client
+    bulk_client = client.options(request_timeout=300, max_retries=0)
+    start = monotonic()
+    with (
+        bulk.bulk_indexing_settings(client, index),
+        rich.progress.Progress() as progress,
+    ):
+        task = progress.add_task(
+            "Indexing", total=corpus.corpus_size(corpus_path)
+        )
+        stats = bulk.load_documents(
+            bulk_client,
+            index=index,
+            documents=corpus.read_corpus(corpus_path),
+            concurrency=concurrency,
+            max_bytes=int(batch_size_mb * 1_000_000),
+            max_retries=max_retries,
+            on_batch=lambda batch: progress.advance(
+                task, batch.indexed + batch.failed
+            ),
         )
+    elapsed = monotonic() - start
 
-        task_id = task["task"]
-        typer.echo(f"Reindex task {task_id} started")
+    typer.echo(
+        f"Indexed {stats.indexed} documents into {index} in {elapsed:.1f}s "
+        f"({stats.indexed / elapsed:.0f} docs/s, "
+        f"{stats.bytes / 1e6 / elapsed:.1f}MB/s). {stats.retried} rejected "
+        "documents were retried"
+    )
+    if stats.failed:
         typer.echo(
-            f"Run `rank task status --task-id={task_id}` to monitor its progress"
+            f"{stats.failed} documents failed: "
+            + ", ".join(
+                f"{count} {error}"
+                for error, count in stats.errors.most_common()
+            ),
+            err=True,
         )
+        raise typer.Exit(code=1)
@@ -0,0 +1,345 @@
+import json
+import math
+import random
+import threading
+from collections import Counter
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from time import monotonic, sleep
+from typing import Any, Optional
+
+import rich
+import rich.progress
+import typer
+from elasticsearch import ApiError, ConnectionTimeout, TransportError
+
+from .. import ContentType, Cluster, results_directory
+from ..latency import LatencyHistogram
+from ..services import aws
+from ..services.elasticsearch import (
+    _get_client,
+    _get_index_name,
+    warm_connections,
+)
+from ..templates import QueryTemplate
+from . import prompt_user_to_choose_an_index, read_query
+from .search import read_terms
+
+app = typer.Typer(name="load", help="Load test a query")
+
+# The ways a search can end, in the order they're reported
+outcomes = ["ok", "timed out", "rejected", "error"]
+
+
+@dataclass
+class LoadReport:
+    """The latencies and outcomes of every request in a load test"""
+
+    # the latency of every successful request, in microseconds, measured from
+    # when it was scheduled to be sent
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
+    outcomes: Counter = field(default_factory=Counter)
+    # the most requests which were scheduled but hadn't yet completed
+    max_outstanding: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def sent(self) -> int:
+        return sum(self.outcomes.values())
+
+
+def run_load(
+    search: Callable[[str], dict[str, Any]],
+    search_terms: Sequence[str],
+    qps: float,
+    duration: float,
+    concurrency: int,
+    poisson: bool = False,
+    seed: int = 0,
+    on_send: Optional[Callable[[float], None]] = None,
+) -> LoadReport:
+    """
+    Sends searches for the search terms in turn, at a fixed rate, for
+    `duration` seconds.
+
+    The schedule is open-loop: requests are sent when they're due, whether
+    or not earlier ones have come back. When every worker is busy, requests
+    queue, and their latency includes the time they spent queueing. A
+    closed loop would wait for the slow requests instead, and so would never
+    measure the requests it failed to send (coordinated omission).
+    """
+    if not search_terms:
+        raise ValueError("There are no search terms to send")
+    report = LoadReport()
+    lock = threading.Lock()
+    outstanding = 0
+    rng = random.Random(seed)
+
+    def send(search_terms: str, scheduled: float):
+        nonlocal outstanding
+        try:
+            response = search(search_terms)
+            outcome = "timed out" if response.get("timed_out") else "ok"
+        except ConnectionTimeout:
+            outcome = "timed out"
+        except ApiError as error:
+            outcome = "rejected" if error.meta.status == 429 else "error"
+        except TransportError:
+            outcome = "error"
+        except Exception:
+            # Nothing reads the worker's future, so any other failure must
+            # be counted here or the report's totals wouldn't add up
+            outcome = "error"
+        latency = monotonic() - scheduled
+        with lock:
+            if outcome == "ok":
+                report.histogram.record(latency * 1_000_000)
+            report.outcomes[outcome] += 1
+            outstanding -= 1
+
+    start = monotonic()
+    # seconds after the start that the next search is due
+    offset = 0.0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        i = 0
+        while offset < duration:
+            scheduled = start + offset
+            delay = scheduled - monotonic()
+            if delay > 0:
+                sleep(delay)
+            with lock:
+                outstanding += 1
+                report.max_outstanding = max(
+                    report.max_outstanding, outstanding
+                )
+            executor.submit(
+                send, search_terms[i % len(search_terms)], scheduled
+            )
+            if on_send is not None:
+                on_send(offset)
+            i += 1
+            offset = offset + rng.expovariate(qps) if poisson else i / qps
+    report.elapsed = monotonic() - start
+    return report
+
+
+@app.callback(invoke_without_command=True)
+def main(
+    context: typer.Context,
+    content_type: ContentType = typer.Option(
+        help="The content type to load test",
+        show_choices=True,
+        case_sensitive=False,
+        prompt=True,
+        default=None,
+    ),
+    query: Optional[str] = typer.Option(
+        help="The query to test: a local file path or a URL of catalogue API search templates",
+        default=None,
+    ),
+    index: Optional[str] = typer.Option(
+        help="The index to run searches against",
+        case_sensitive=False,
+        default=None,
+    ),
+    cluster: Cluster = typer.Option(
+        help="The ElasticSearch cluster on which to run searches",
+        show_choices=True,
+        case_sensitive=False,
+        prompt=True,
+        default=None,
+    ),
+    pipeline_date: Optional[str] = typer.Option(
+        help="An override for the pipeline date when a pipeline cluster is selected",
+        default=None,
+    ),
+    terms: Optional[Path] = typer.Option(
+        default=None,
+        help=(
+            "A file of search terms written by `rank search get-terms`. If "
+            "not provided, the most recent file for the content type is used"
+        ),
+        exists=True,
+        dir_okay=False,
+    ),
+    qps: float = typer.Option(
+        default=10,
+        help="The number of searches to send per second",
+        min=0.1,
+    ),
+    duration: float = typer.Option(
+        default=60,
+        help="How long to send searches for, in seconds",
+        min=1,
+    ),
+    concurrency: int = typer.Option(
+        default=10,
+        help=(
+            "The most searches to have in flight at once. Searches which are "
+            "due while all of them are busy wait, and their wait is measured"
+        ),
+        min=1,
+    ),
+    poisson: bool = typer.Option(
+        default=False,
+        help=(
+            "Send searches at random (Poisson) intervals averaging the target "
+            "rate, like independent users, rather than evenly spaced"
+        ),
+    ),
+    n: int = typer.Option(
+        default=10,
+        help="The number of results to return for each search",
+        min=1,
+        max=100,
+    ),
+    timeout: float = typer.Option(
+        default=10,
+        help="How long to wait for each search, in seconds",
+        min=0.1,
+    ),
+    stable_sort_key: str = typer.Option(
+        default="query.id",
+        help="A document property that can be used as a stable sort key",
+    ),
+):
+    """
+    Replay real search terms against an index at a target rate, and report
+    the latency and errors of the searches
+    """
+    if context.invoked_subcommand is not None:
+        return
+
+    context.meta["session"] = aws.get_session(context.meta["role_arn"])
+    context.meta["concurrency"] = concurrency
+    query_template = QueryTemplate(
+        json.loads(read_query(query, content_type=content_type))
+    )
+
+    if index is None:
+        index = _get_index_name(pipeline_date, cluster, content_type)
+    client = _get_client(context, pipeline_date, cluster, content_type)
+    index = prompt_user_to_choose_an_index(
+        client=client, index=index, content_type=content_type
+    )
+    warm_connections(client, concurrency)
+
+    # Replay terms as often as real users search for them
+    term_counts = read_terms(terms, content_type)
+    if not term_counts:
+        raise typer.BadParameter("There are no search terms to send")
+    search_terms = random.Random(0).choices(
+        list(term_counts),
+        weights=list(term_counts.values()),
+        k=math.ceil(qps * duration),
+    )
+
+    # Retries would hide rejections and timeouts, and count their time twice
+    search_client = client.options(request_timeout=timeout, max_retries=0)
+
+    def search(search_terms: str) -> dict[str, Any]:
+        return search_client.search(
+            index=index,
+            query=query_template.render(search_terms),
+            sort=[{"_score": "desc"}, {stable_sort_key: "asc"}],
+            size=n,
+            source=False,
+        ).body
+
+    with rich.progress.Progress() as progress:
+        task = progress.add_task(f"Sending {qps:g} searches/s", total=duration)
+        report = run_load(
+            search,
+            search_terms,
+            qps=qps,
+            duration=duration,
+            concurrency=concurrency,
+            poisson=poisson,
+            on_send=lambda elapsed: progress.update(task, completed=elapsed),
+        )
+        progress.update(task, completed=duration)
+
+    rich.print(build_report_table(report))
+    typer.echo(
+        f"Sent {report.sent} searches to {index} in {report.elapsed:.1f}s "
+        f"({report.sent / report.elapsed:.1f}/s, target {qps:g}/s). At most "
+        f"{report.max_outstanding} were outstanding at once"
+    )
+    path = write_report(
+        report,
+        index=index,
+        query_template=query_template.template,
+        settings={
+            "qps": qps,
+            "duration": duration,
+            "concurrency": concurrency,
+            "poisson": poisson,
+            "size": n,
+            "timeout": timeout,
+        },
+    )
+    typer.echo(f"Report saved to {path}")
+
+
+def build_report_table(report: LoadReport) -> rich.table.Table:
+    table = rich.table.Table(box=rich.box.HEAVY_EDGE)
+    table.add_column("Latency", justify="left")
+    table.add_column("ms", justify="right")
+    for label, p in [("p50", 50), ("p90", 90), ("p99", 99), ("p99.9", 99.9)]:
+        latency = report.histogram.value_at_percentile(p) / 1000
+        table.add_row(label, f"{latency:.1f}")
+    table.add_row("max", f"{report.histogram.max / 1000:.1f}")
+    table.add_section()
+    for outcome in outcomes:
+        table.add_row(outcome, str(report.outcomes[outcome]))
+    return table
+
+
+def write_report(
+    report: LoadReport,
+    index: str,
+    query_template: dict,
+    settings: dict[str, Any],
+    directory: Path = results_directory / "load",
+) -> Path:
+    """
+    Saves a load test's settings, outcomes and latency histogram as JSON, so
+    that runs can be compared later
+    """
+    # Reports are named after when they were created, so this is precise
+    # enough for scripted runs to be told apart
+    created = datetime.now(timezone.utc).isoformat(timespec="microseconds")
+    path = (
+        directory
+        / index
+        / f"{created.replace(':', '').replace('+0000', 'Z')}.json"
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Open the file exclusively, so an earlier report is never overwritten
+    with open(path, "x", encoding="utf-8") as f:
+        json.dump(
+            {
+                "index": index,
+                "query_template": query_template,
+                "created": created,
+                "settings": settings,
+                "elapsed": report.elapsed,
+                "max_outstanding": report.max_outstanding,
+                "outcomes": dict(report.outcomes),
+                "latency_us": {
+                    "precision_bits": report.histogram.precision_bits,
+                    "min": report.histogram.min,
+                    "max": report.histogram.max,
+                    "mean": report.histogram.mean
+                    if report.histogram.total
+                    else None,
+                    "buckets": dict(sorted(report.histogram.counts.items())),
+                },
+            },
+            f,
+            indent=2,
+        )
+    return path
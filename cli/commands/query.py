@@ -1,10 +1,8 @@
 import json
 
 import beaupy
-import requests
 import typer
-from typing import Optional
-from .. import query_directory, production_api_url
+from .. import query_directory, production_api_url, get_search_templates
 from . import get_local_query_files
 
 app = typer.Typer(
@@ -25,7 +23,7 @@ def list_queries():
 @app.command()
 def get(
     context: typer.Context,
-    api_url: Optional[str] = typer.Option(
+    api_url: str = typer.Option(
         default=production_api_url,
         help="The target API to get queries from",
         show_choices=True,
@@ -45,9 +43,7 @@ def get(
     N.B. This command will overwrite any existing queries in the query
     directory `data/queries`
     """
-    search_templates = requests.get(f"{api_url}/search-templates.json").json()[
-        "templates"
-    ]
+    search_templates = get_search_templates(api_url)
 
     if all:
         selected = search_templates
@@ -1,25 +1,31 @@
+import gzip
 import json
-import os
-from datetime import datetime
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from typing import Optional
-from urllib.parse import urlparse
 
-import chevron
 import rich
+import rich.progress
 import typer
 
 from .. import (
     ContentType,
     Cluster,
     term_directory,
-    get_pipeline_search_template,
 )
 from ..services import aws, elasticsearch
 from . import (
-    prompt_user_to_choose_a_local_query,
     prompt_user_to_choose_an_index,
+    read_query,
 )
+from ..latency import paired_permutation_test, percentile
+from ..profiling import ProfileSummary
 from ..services.elasticsearch import _get_client, _get_index_name
+from ..templates import QueryTemplate
 
 app = typer.Typer(
     name="search",
@@ -188,25 +194,19 @@ def main(
         default="query.id",
         help="A document property that can be used as a stable sort key",
     ),
+    profile: bool = typer.Option(
+        default=False,
+        help=(
+            "Profile the search, and report which clauses of the query, and "
+            "which shards, the time was spent in"
+        ),
+    ),
 ):
     if context.invoked_subcommand is None:
         context.meta["session"] = aws.get_session(context.meta["role_arn"])
         context.meta["content_type"] = content_type
 
-        if query is not None and str(urlparse(query).scheme).startswith("http"):
-            search_template = get_pipeline_search_template(
-                api_url=query, content_type=context.meta["content_type"]
-            )
-            query = search_template["query"]
-        elif query and os.path.isfile(query):
-            with open(query) as file_contents:
-                query = file_contents.read()
-        else:
-            query_path = prompt_user_to_choose_a_local_query(
-                query, content_type=context.meta["content_type"]
-            )
-            with open(query_path, "r", encoding="utf-8") as f:
-                query = f.read()
+        query = read_query(query, content_type=context.meta["content_type"])
 
         if index is None:
             index = _get_index_name(pipeline_date, cluster, content_type)
@@ -224,19 +224,51 @@ def main(
         if search_terms is None:
             search_terms = typer.prompt("What are you looking for?")
 
-        rendered_query = chevron.render(query, {"query": search_terms})
+        try:
+            query_template = QueryTemplate(json.loads(query))
+        except json.JSONDecodeError:
+            raise ValueError("The query did not contain valid JSON")
 
         response = context.meta["client"].search(
             index=context.meta["index"],
-            query=json.loads(rendered_query),
+            query=query_template.render(search_terms),
             sort=[{"_score": "desc"}, {stable_sort_key: "asc"}],
             size=n,
             source=["display"],
+            profile=profile,
         )
 
         table = build_results_table(response, context.meta["content_type"])
         rich.print(table)
 
+        if profile:
+            profile_summary = ProfileSummary()
+            profile_summary.add(search_terms, response)
+            typer.echo("\n".join(profile_summary.report()))
+
+
+# The reporting indices which hold page view events
+reporting_index = "*"
+
+
+def term_window(
+    since: Optional[datetime], until: Optional[datetime], days: int
+) -> tuple[datetime, datetime]:
+    """
+    The window to find searches in, in UTC. Elasticsearch reads timestamps
+    without a timezone as UTC, so times without one are taken to be UTC
+    rather than local time.
+    """
+
+    def as_utc(value: datetime) -> datetime:
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+
+    until = as_utc(until) if until else datetime.now(timezone.utc)
+    since = as_utc(since) if since else until - timedelta(days=days)
+    return since, until
+
 
 @app.command()
 def get_terms(
@@ -247,11 +279,29 @@ def get_terms(
         prompt=True,
         help="The content type to find real search terms for",
     ),
+    since: Optional[datetime] = typer.Option(
+        default=None,
+        help="The start of the window to find searches in, in UTC. Defaults to --days before --until",
+    ),
+    until: Optional[datetime] = typer.Option(
+        default=None,
+        help="The end of the window to find searches in, in UTC. Defaults to now",
+    ),
+    days: int = typer.Option(
+        default=30,
+        help="The length of the window, in days, if --since isn't given",
+        min=1,
+    ),
 ):
-    """Get a list of real search terms for a given content type"""
+    """
+    Get the real search terms for a given content type, with the number of
+    times each was searched for
+    """
     context.meta["session"] = aws.get_session(context.meta["role_arn"])
     reporting_client = elasticsearch.reporting_client(context=context)
 
+    since, until = term_window(since, until, days)
+
     # Page names and content types are currently the same but we don't want to
     # rely on that
     page_name = {
@@ -259,43 +309,242 @@ def get_terms(
         "images": "images",
     }[content_type.value]
 
-    response = reporting_client.search(
-        query={
-            "bool": {
-                "filter": [
-                    {"exists": {"field": "page.query.query"}},
-                    {"term": {"page.name": page_name}},
-                ],
-                "must_not": [
-                    {"match": {"properties.looksLikeSpam": "true"}},
-                ],
-            }
-        },
-        size=5000,
-        source_includes=["page.query.query"],
-        sort=[
-            {"@timestamp": {"order": "desc"}},
-        ],
-    )
+    query = {
+        "bool": {
+            "filter": [
+                {"exists": {"field": "page.query.query"}},
+                {"term": {"page.name": page_name}},
+                {
+                    "range": {
+                        "@timestamp": {
+                            "gte": since.isoformat(),
+                            "lt": until.isoformat(),
+                        }
+                    }
+                },
+            ],
+            "must_not": [
+                {"match": {"properties.looksLikeSpam": "true"}},
+            ],
+        }
+    }
 
-    terms = [
-        hit["_source"]["page"]["query"]["query"]
-        for hit in response["hits"]["hits"]
-    ]
-    unique_terms = list(set(terms))
+    total = reporting_client.count(index=reporting_index, query=query)["count"]
+    counts: Counter[str] = Counter()
+    with rich.progress.Progress() as progress:
+        task = progress.add_task("Reading search events", total=total)
+        for hits in elasticsearch.scan_with_pit(
+            reporting_client,
+            index=reporting_index,
+            query=query,
+            source={"includes": ["page.query.query"]},
+        ):
+            counts.update(
+                hit["_source"]["page"]["query"]["query"] for hit in hits
+            )
+            progress.advance(task, len(hits))
 
-    iso_date_without_time = datetime.now().date().isoformat()
-    filename = f"{content_type.value}_{iso_date_without_time}.json"
+    filename = f"{content_type.value}_{until.date().isoformat()}.json.gz"
     path = term_directory / filename
+    write_terms(path, counts, since=since, until=until)
+
+    typer.echo(
+        f"Saved {len(counts)} terms from {counts.total()} searches to {path}"
+    )
 
+
+def write_terms(
+    path: Path, counts: Counter[str], since: datetime, until: datetime
+):
+    """
+    Writes search terms and the number of times each was searched for, most
+    frequent first, to a gzipped JSON file
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(json.dumps(unique_terms, indent=2))
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(
+            {
+                "since": since.isoformat(),
+                "until": until.isoformat(),
+                "terms": counts.most_common(),
+            },
+            f,
+            ensure_ascii=False,
+        )
+
 
-    typer.echo(f"Saved {len(unique_terms)} terms to {path}")
+def read_terms(
+    termpath: Optional[Path], content_type: ContentType
+) -> Counter[str]:
+    """
+    Returns the search terms in a file written by `rank search get-terms`,
+    with the number of times each was searched for. If no file is given, the
+    most recent one for the content type is used.
+
+    Older files, which list each term once without a count, are read as if
+    every term was searched for once.
+    """
+    if termpath is None:
+        termfiles = sorted(term_directory.glob(f"{content_type.value}_*.json*"))
+        if not termfiles:
+            raise FileNotFoundError(
+                f"No search terms found in {term_directory}. You can fetch "
+                "some by running `rank search get-terms`"
+            )
+        termpath = termfiles[-1]
+
+    typer.echo(f"Using search terms: {termpath}")
+    if termpath.suffix == ".gz":
+        with gzip.open(termpath, "rt", encoding="utf-8") as f:
+            return Counter(dict(json.load(f)["terms"]))
+    with open(termpath, "r", encoding="utf-8") as f:
+        return Counter(json.load(f))
 
 
 @app.command()
-def compare():
+def compare(
+    context: typer.Context,
+    query_a: Optional[str] = typer.Option(
+        default=None,
+        help=(
+            "The first query to compare: a local file path or a URL of "
+            "catalogue API search templates"
+        ),
+    ),
+    query_b: Optional[str] = typer.Option(
+        default=None,
+        help=(
+            "The second query to compare: a local file path or a URL of "
+            "catalogue API search templates"
+        ),
+    ),
+    terms: Optional[Path] = typer.Option(
+        default=None,
+        help=(
+            "A file of search terms written by `rank search get-terms`. If "
+            "not provided, the most recent file for the content type is used"
+        ),
+        exists=True,
+        dir_okay=False,
+    ),
+    max_terms: int = typer.Option(
+        default=100,
+        help="The number of search terms to sample from the terms file",
+        min=1,
+    ),
+    warmup_rounds: int = typer.Option(
+        default=1,
+        help="The number of unmeasured rounds to run before measuring",
+        min=0,
+    ),
+    rounds: int = typer.Option(
+        default=5,
+        help="The number of measured rounds of every search term",
+        min=1,
+    ),
+):
     """Compare the speed of two queries against the same index"""
-    raise NotImplementedError
+    assert context.parent is not None
+    options = context.parent.params
+    content_type: ContentType = options["content_type"]
+    context.meta["session"] = aws.get_session(context.meta["role_arn"])
+
+    index = options["index"] or _get_index_name(
+        options["pipeline_date"], options["cluster"], content_type
+    )
+    client = _get_client(
+        context, options["pipeline_date"], options["cluster"], content_type
+    )
+    index = prompt_user_to_choose_an_index(
+        client=client, index=index, content_type=content_type
+    )
+
+    query_templates = {}
+    for label, query in [("A", query_a), ("B", query_b)]:
+        typer.echo(f"Query {label}:")
+        try:
+            query_templates[label] = QueryTemplate(
+                json.loads(read_query(query, content_type=content_type))
+            )
+        except json.JSONDecodeError:
+            raise ValueError(f"Query {label} did not contain valid JSON")
+
+    term_counts = read_terms(terms, content_type)
+    search_terms = random.Random(0).sample(
+        sorted(term_counts), min(max_terms, len(term_counts))
+    )
+
+    # the server-side and client-side durations of every measured search,
+    # in milliseconds, for each query and set of search terms
+    took: dict[str, dict[str, list[float]]] = {
+        label: defaultdict(list) for label in query_templates
+    }
+    wall: dict[str, dict[str, list[float]]] = {
+        label: defaultdict(list) for label in query_templates
+    }
+    with rich.progress.Progress() as progress:
+        task = progress.add_task(
+            "Searching", total=(warmup_rounds + rounds) * len(search_terms)
+        )
+        for round_number in range(warmup_rounds + rounds):
+            for i, term in enumerate(search_terms):
+                # Alternate which query goes first, so that neither benefits
+                # from caches warmed by the other
+                labels = (
+                    ["A", "B"] if (i + round_number) % 2 == 0 else ["B", "A"]
+                )
+                for label in labels:
+                    start = time.perf_counter()
+                    response = client.search(
+                        index=index,
+                        query=query_templates[label].render(term),
+                        sort=[
+                            {"_score": "desc"},
+                            {options["stable_sort_key"]: "asc"},
+                        ],
+                        size=options["n"],
+                        source=False,
+                        request_cache=False,
+                    )
+                    elapsed = (time.perf_counter() - start) * 1000
+                    if round_number >= warmup_rounds:
+                        took[label][term].append(response["took"])
+                        wall[label][term].append(elapsed)
+                progress.advance(task)
+
+    table = rich.table.Table(
+        caption=(
+            f"{len(search_terms)} search terms, {rounds} measured rounds, "
+            f"against {index}"
+        ),
+        caption_justify="left",
+        box=rich.box.HEAVY_EDGE,
+    )
+    table.add_column("Query", justify="left")
+    for measure in ["took", "wall"]:
+        for p in [50, 90, 99]:
+            table.add_column(f"{measure} p{p} (ms)", justify="right")
+    for label in query_templates:
+        row = [label]
+        for by_term in [took[label], wall[label]]:
+            all_durations = [d for ds in by_term.values() for d in ds]
+            row += [f"{percentile(all_durations, p):.1f}" for p in [50, 90, 99]]
+        table.add_row(*row)
+    rich.print(table)
+
+    for measure, durations in [("took", took), ("wall time", wall)]:
+        # compare the queries term by term, using each term's median
+        differences = [
+            statistics.median(durations["B"][term])
+            - statistics.median(durations["A"][term])
+            for term in search_terms
+        ]
+        median_difference = statistics.median(differences)
+        p_value = paired_permutation_test(
+            differences, statistic=statistics.median
+        )
+        verdict = "significant" if p_value < 0.05 else "not significant"
+        typer.echo(
+            f"Median per-term difference in {measure} (B - A): "
+            f"{median_difference:+.1f} ms (p = {p_value:.3f}, {verdict})"
+        )
@@ -1,6 +1,13 @@
 import time
-from typing import Optional
+from datetime import timedelta
+from typing import Any, Optional
 
+import beaupy
+import rich
+import rich.box
+import rich.live
+import rich.progress
+import rich.table
 import typer
 from elasticsearch import Elasticsearch
 from rich.progress import Progress
@@ -8,6 +15,12 @@ from rich.progress import Progress
 from ..services import aws, elasticsearch
 from . import get_valid_tasks, prompt_user_to_choose_a_task
 
+# The tasks which can be watched, and the APIs which rethrottle them
+rethrottlers = {
+    "indices:data/write/reindex": "reindex_rethrottle",
+    "indices:data/write/update/byquery": "update_by_query_rethrottle",
+}
+
 app = typer.Typer(
     name="task",
     help="Manage tasks running on the rank cluster",
@@ -81,3 +94,192 @@ def cancel(
     if typer.confirm(f"Are you sure you want to cancel {task_id}?", abort=True):
         client: Elasticsearch = context.meta["client"]
         client.tasks.cancel(task_id=task_id)
+
+
+def documents_done(status: dict[str, Any]) -> int:
+    return (
+        status.get("created", 0)
+        + status.get("updated", 0)
+        + status.get("deleted", 0)
+        + status.get("noops", 0)
+        + status.get("version_conflicts", 0)
+    )
+
+
+class TaskRates:
+    """
+    Tracks how quickly tasks are getting through their documents, smoothed
+    over successive polls so the rate doesn't jump around between batches
+    """
+
+    def __init__(self, smoothing: float = 0.3):
+        self.smoothing = smoothing
+        self._previous: dict[str, tuple[float, int]] = {}
+        self.rates: dict[str, float] = {}
+
+    def update(self, task_id: str, done: int, now: float) -> float:
+        if task_id in self._previous:
+            previous_time, previous_done = self._previous[task_id]
+            if now > previous_time:
+                rate = (done - previous_done) / (now - previous_time)
+                self.rates[task_id] = (
+                    rate
+                    if task_id not in self.rates
+                    else self.smoothing * rate
+                    + (1 - self.smoothing) * self.rates[task_id]
+                )
+        self._previous[task_id] = (now, done)
+        return self.rates.get(task_id, 0.0)
+
+
+def follow_task(
+    client: Elasticsearch,
+    task_id: str,
+    description: str,
+    poll_interval: float = 5,
+) -> dict[str, Any]:
+    """
+    Show the progress of a reindex or update task until it completes, and
+    return its final state, including its response
+    """
+    with Progress(
+        *Progress.get_default_columns(),
+        rich.progress.TextColumn("{task.fields[rate]}"),
+    ) as progress:
+        bar = progress.add_task(description, total=None, rate="")
+        rates = TaskRates()
+        while True:
+            task = client.tasks.get(task_id=task_id)
+            status = task["task"]["status"]
+            done = documents_done(status)
+            rate = rates.update(task_id, done, time.monotonic())
+            progress.update(
+                bar,
+                total=status.get("total") or None,
+                completed=done,
+                rate=f"{rate:.0f} docs/s" if rate else "",
+            )
+            if task["completed"]:
+                return dict(task)
+            time.sleep(poll_interval)
+
+
+def list_watchable_tasks(client: Elasticsearch) -> dict[str, dict[str, Any]]:
+    """
+    Returns the running reindex and update-by-query tasks, by ID, with any
+    child tasks (eg slices) nested under their parent
+    """
+    response = client.tasks.list(
+        detailed=True, actions=list(rethrottlers), group_by="parents"
+    )
+    return dict(response["tasks"])
+
+
+def build_tasks_table(
+    tasks: dict[str, dict[str, Any]], rates: TaskRates, now: float
+) -> rich.table.Table:
+    table = rich.table.Table(
+        caption="Press Ctrl+C to rethrottle or cancel a task",
+        caption_justify="left",
+        box=rich.box.HEAVY_EDGE,
+    )
+    table.add_column("Task", justify="left", no_wrap=True)
+    table.add_column("Action", justify="left")
+    table.add_column("Done", justify="right")
+    table.add_column("%", justify="right")
+    table.add_column("Docs/s", justify="right")
+    table.add_column("ETA", justify="right")
+    table.add_column("Batches", justify="right")
+    table.add_column("Conflicts", justify="right")
+    table.add_column("Retries", justify="right")
+    table.add_column("Throttle", justify="right")
+
+    def add_row(task_id: str, task: dict[str, Any], indent: str = ""):
+        status = task.get("status", {})
+        total = status.get("total", 0)
+        done = documents_done(status)
+        rate = rates.update(task_id, done, now)
+        eta = (
+            str(timedelta(seconds=round((total - done) / rate)))
+            if rate > 0 and total > done
+            else "-"
+        )
+        retries = status.get("retries", {})
+        throttle = status.get("requests_per_second", -1)
+        table.add_row(
+            f"{indent}{task_id}",
+            task["action"].rsplit("/", 1)[-1],
+            f"{done}/{total}",
+            f"{100 * done / total:.1f}" if total else "-",
+            f"{rate:.0f}",
+            eta,
+            str(status.get("batches", 0)),
+            str(status.get("version_conflicts", 0)),
+            str(retries.get("bulk", 0) + retries.get("search", 0)),
+            "unlimited" if throttle in (-1, float("inf")) else f"{throttle:g}",
+        )
+
+    for task_id, task in tasks.items():
+        add_row(task_id, task)
+        for child in task.get("children", []):
+            add_row(f"{child['node']}:{child['id']}", child, indent="└ ")
+    return table
+
+
+@app.command()
+def watch(
+    context: typer.Context,
+    interval: float = typer.Option(
+        default=2,
+        help="How often to refresh, in seconds",
+        min=0.5,
+    ),
+):
+    """
+    Watch every reindex and update-by-query task, with their throughput and
+    ETA, and rethrottle or cancel them
+    """
+    client: Elasticsearch = context.meta["client"]
+    rates = TaskRates()
+    while True:
+        try:
+            with rich.live.Live(auto_refresh=False) as live:
+                while True:
+                    tasks = list_watchable_tasks(client)
+                    live.update(
+                        build_tasks_table(tasks, rates, time.monotonic()),
+                        refresh=True,
+                    )
+                    if not tasks:
+                        typer.echo("No tasks running")
+                        return
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+        tasks = list_watchable_tasks(client)
+        choice = beaupy.select(
+            ["Rethrottle a task", "Cancel a task", "Keep watching", "Quit"]
+        )
+        if choice in (None, "Quit"):
+            return
+        if choice == "Keep watching" or not tasks:
+            continue
+
+        typer.echo("Select a task")
+        task_id = beaupy.select(
+            list(tasks),
+            preprocessor=lambda task_id: f"{task_id} | {tasks[task_id]['action']}",
+        )
+        if task_id is None:
+            continue
+        if choice == "Rethrottle a task":
+            requests_per_second = typer.prompt(
+                "Documents per second (-1 for unlimited)", type=float
+            )
+            rethrottle = getattr(client, rethrottlers[tasks[task_id]["action"]])
+            rethrottle(task_id=task_id, requests_per_second=requests_per_second)
+            typer.echo(f"Rethrottled {task_id} to {requests_per_second:g}")
+        elif typer.confirm(f"Are you sure you want to cancel {task_id}?"):
+            client.tasks.cancel(task_id=task_id)
+            typer.echo(f"Cancelled {task_id}")
@@ -1,23 +1,30 @@
 import json
-import os
 from typing import Optional
-from urllib.parse import urlparse
 from pathlib import Path
 import pytest
 import typer
 import importlib.util
+from time import perf_counter
 
 from .. import (
     ContentType,
     Cluster,
-    get_pipeline_search_template,
 )
 from . import (
-    prompt_user_to_choose_a_local_query,
+    prompt_user_to_choose_a_local_config,
     prompt_user_to_choose_an_index,
+    read_query,
 )
 from ..services import aws
-from ..services.elasticsearch import _get_client, _get_index_name
+from ..services.cassette import Cassette, RecordingClient, ReplayClient
+from ..services.corpus import read_corpus
+from ..services.local_search import LocalSearchClient, build_local_index
+from ..services.elasticsearch import (
+    _get_client,
+    _get_index_name,
+    warm_connections,
+)
+from ..latency import LatencyBaseline
 from ..plugin import RankPlugin
 
 app = typer.Typer(name="test", help="Run relevance tests")
@@ -67,44 +74,198 @@ def main(
         help="An override for the pipeline date when a pipeline cluster is selected",
         default=None,
     ),
+    batch_size: int = typer.Option(
+        help=(
+            "The number of test searches to send in each _msearch request. "
+            "Set to 0 to run each test's search individually"
+        ),
+        default=50,
+        min=0,
+    ),
+    concurrency: int = typer.Option(
+        help=(
+            "The number of test searches (or batches of searches) to run "
+            "against the cluster at once"
+        ),
+        default=1,
+        min=1,
+    ),
+    record: Optional[Path] = typer.Option(
+        help=(
+            "A directory in which to record every test search and its "
+            "response, for later use with --replay"
+        ),
+        file_okay=False,
+        default=None,
+    ),
+    replay: Optional[Path] = typer.Option(
+        help=(
+            "A directory of searches recorded with --record. Tests are run "
+            "against the recorded responses, without connecting to AWS or "
+            "Elasticsearch. The recorded index and query are used unless "
+            "--index or --query are given"
+        ),
+        exists=True,
+        file_okay=False,
+        default=None,
+    ),
+    corpus: Optional[Path] = typer.Option(
+        help=(
+            "An NDJSON file (or directory of files) of documents exported with "
+            "`rank index export`. Tests are run against a local, in-process "
+            "index of the documents, without connecting to AWS or "
+            "Elasticsearch. Only a subset of the query DSL is supported"
+        ),
+        exists=True,
+        default=None,
+    ),
+    index_config: Optional[str] = typer.Option(
+        help=(
+            "Path to a json file containing the index settings and mappings "
+            "for --corpus. If not provided, the user is prompted to choose "
+            "one of the saved index configs"
+        ),
+        default=None,
+    ),
+    analyzer_only: bool = typer.Option(
+        help=(
+            "Only run the tests which can be checked with the index's "
+            "analyzers, comparing the tokens of their search terms and "
+            "expected documents rather than searching. Much faster than a "
+            "full run, for validating changes to the mappings"
+        ),
+        default=False,
+    ),
+    latency: bool = typer.Option(
+        help=(
+            "Also run the latency tests, which repeat their searches to time "
+            "them. Their budgets come from the recorded latency baseline"
+        ),
+        default=False,
+    ),
+    record_latency_baseline: bool = typer.Option(
+        help=(
+            "Run the latency tests and record their timings as the latency "
+            "baseline, rather than judging them against it"
+        ),
+        default=False,
+    ),
+    latency_baseline: Optional[Path] = typer.Option(
+        help=(
+            "A json file of recorded latencies for the latency tests. "
+            "Defaults to latency_baseline.json in the content type's tests"
+        ),
+        dir_okay=False,
+        default=None,
+    ),
+    latency_headroom: float = typer.Option(
+        help=(
+            "How many times its recorded latency a latency test may take "
+            "before it fails"
+        ),
+        default=1.5,
+        min=1,
+    ),
+    save_results: bool = typer.Option(
+        help=(
+            "Save the ranked results of every test search to the results "
+            "directory, for comparison with other runs. Replayed runs are "
+            "never saved"
+        ),
+        default=True,
+    ),
+    profile: bool = typer.Option(
+        help=(
+            "Profile every test search, and report which clauses of the "
+            "query, and which shards, the time was spent in"
+        ),
+        default=False,
+    ),
+    search_timeout: float = typer.Option(
+        help=(
+            "The number of seconds Elasticsearch may spend on each test "
+            "search. Searches which run out of time return partial results, "
+            "and their tests fail"
+        ),
+        default=10,
+        min=0.001,
+    ),
 ):
     """Run relevance tests"""
     if context.invoked_subcommand is None:
-        context.meta["session"] = aws.get_session(context.meta["role_arn"])
-        context.meta["content_type"] = content_type
-        if query is not None and str(urlparse(query).scheme).startswith("http"):
-            search_template = get_pipeline_search_template(
-                api_url=query, content_type=context.meta["content_type"]
+        if record is not None and replay is not None:
+            raise typer.BadParameter("--record and --replay can't be combined")
+        if corpus is not None and replay is not None:
+            raise typer.BadParameter("--corpus and --replay can't be combined")
+        if analyzer_only and (corpus is not None or replay is not None):
+            raise typer.BadParameter(
+                "--analyzer-only needs an Elasticsearch cluster, so it can't "
+                "be combined with --corpus or --replay"
             )
-            query = search_template["query"]
-        elif query and os.path.isfile(query):
-            with open(query) as file_contents:
-                query = file_contents.read()
+
+        context.meta["content_type"] = content_type
+        context.meta["batch_size"] = batch_size
+        context.meta["concurrency"] = concurrency
+        context.meta["save_results"] = save_results and replay is None
+        context.meta["profile"] = profile
+        context.meta["analyzer_only"] = analyzer_only
+        context.meta["latency"] = latency or record_latency_baseline
+        context.meta["latency_baseline"] = LatencyBaseline(
+            latency_baseline
+            or root_test_directory
+            / content_type.value
+            / "latency_baseline.json",
+            headroom=latency_headroom,
+            recording=record_latency_baseline,
+        )
+        context.meta["search_timeout"] = f"{round(search_timeout * 1000)}ms"
+        if replay is not None:
+            cassette = Cassette(replay)
+        elif corpus is None:
+            context.meta["session"] = aws.get_session(context.meta["role_arn"])
+
+        if replay is not None and query is None:
+            query = json.dumps(cassette.manifest["query_template"])
         else:
-            query_path = prompt_user_to_choose_a_local_query(
-                query, content_type=context.meta["content_type"]
-            )
-            with open(query_path, "r", encoding="utf-8") as f:
-                query = f.read()
+            query = read_query(query, content_type=context.meta["content_type"])
 
-        if index is None:
-            index = _get_index_name(pipeline_date, cluster, content_type)
+        if replay is not None:
+            context.meta["client"] = ReplayClient(cassette)
+            context.meta["index"] = index or cassette.manifest["index"]
+        elif corpus is not None:
+            context.meta["client"] = get_local_client(corpus, index_config)
+            context.meta["index"] = index or corpus.name.split(".")[0]
+        else:
+            if index is None:
+                index = _get_index_name(pipeline_date, cluster, content_type)
 
-        context.meta["client"] = _get_client(
-            context, pipeline_date, cluster, content_type
-        )
+            context.meta["client"] = _get_client(
+                context, pipeline_date, cluster, content_type
+            )
+            if concurrency > 1:
+                warm_connections(context.meta["client"], concurrency)
 
-        context.meta["index"] = prompt_user_to_choose_an_index(
-            client=context.meta["client"],
-            index=index,
-            content_type=context.meta["content_type"],
-        )
+            context.meta["index"] = prompt_user_to_choose_an_index(
+                client=context.meta["client"],
+                index=index,
+                content_type=context.meta["content_type"],
+            )
 
         try:
             context.meta["query_template"] = json.loads(query)
         except json.JSONDecodeError:
             raise ValueError("The query did not contain valid JSON")
 
+        if record is not None:
+            cassette = Cassette(record)
+            cassette.write_manifest(
+                index=context.meta["index"],
+                query_template=context.meta["query_template"],
+            )
+            context.meta["client"] = RecordingClient(
+                context.meta["client"], cassette
+            )
+
         rank_plugin = RankPlugin(context=context)
         test_dir = root_test_directory / context.meta["content_type"].value
 
@@ -122,6 +283,28 @@ def main(
         raise typer.Exit(code=return_code)
 
 
+def get_local_client(
+    corpus: Path, index_config: Optional[str]
+) -> LocalSearchClient:
+    config_path = prompt_user_to_choose_a_local_config(index_config)
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    start = perf_counter()
+    local_index = build_local_index(config, read_corpus(corpus))
+    typer.echo(
+        f"Indexed {len(local_index)} documents from {corpus} in "
+        f"{perf_counter() - start:.1f}s"
+    )
+    if local_index.analysis.unsupported:
+        typer.echo(
+            "These parts of the index config aren't supported locally, and "
+            "were skipped: "
+            + ", ".join(sorted(local_index.analysis.unsupported)),
+            err=True,
+        )
+    return LocalSearchClient(local_index)
+
+
 @app.command(name="list")
 def list_tests():
     """List all tests that can be run"""
@@ -0,0 +1,138 @@
+import json
+import math
+import random
+import statistics
+from collections.abc import Callable, Iterable, Sequence
+from pathlib import Path
+from typing import Optional
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """The nearest-rank `p`th percentile of some values"""
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def paired_permutation_test(
+    differences: Sequence[float],
+    permutations: int = 10_000,
+    seed: int = 0,
+    statistic: Callable[[Iterable[float]], float] = statistics.fmean,
+) -> float:
+    """
+    Returns the two-sided p-value for a statistic (the mean, by default) of
+    some paired differences being different from zero.
+
+    Under the null hypothesis, each difference is as likely to be positive
+    as negative, so the observed statistic is compared against the same
+    statistic of many random sign-flips of the differences. Test the same
+    statistic that's reported, or the two can disagree.
+    """
+    differences = [d for d in differences if d != 0]
+    if not differences:
+        return 1.0
+
+    observed = abs(statistic(differences))
+    rng = random.Random(seed)
+    at_least_as_extreme = 0
+    for _ in range(permutations):
+        flipped = statistic(
+            [d if rng.random() < 0.5 else -d for d in differences]
+        )
+        if abs(flipped) >= observed:
+            at_least_as_extreme += 1
+    # Count the observed arrangement as one of the permutations, so the
+    # p-value is never zero
+    return (at_least_as_extreme + 1) / (permutations + 1)
+
+
+class LatencyHistogram:
+    """
+    Counts of recorded values in log-linear buckets, like an HdrHistogram.
+
+    Values are non-negative integers (eg microseconds), and are recorded to
+    within `significant_figures` of precision whatever their magnitude, so
+    a histogram of millions of values takes a few kilobytes.
+    """
+
+    def __init__(self, significant_figures: int = 3):
+        # Values are bucketed by their highest `precision_bits` bits, which
+        # is enough to tell apart values which differ in the given number of
+        # significant figures
+        self.precision_bits = math.ceil(math.log2(2 * 10**significant_figures))
+        # counts of values, keyed by the lowest value in their bucket
+        self.counts: dict[int, int] = {}
+        self.total = 0
+        self.min = 0
+        self.max = 0
+        self.sum = 0
+
+    def record(self, value: float):
+        value = max(0, round(value))
+        shift = max(0, value.bit_length() - self.precision_bits)
+        bucket = value >> shift << shift
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.min = value if not self.total else min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+        self.total += 1
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else math.nan
+
+    def value_at_percentile(self, p: float) -> float:
+        """
+        The highest value which is equivalent to the nearest-rank `p`th
+        percentile, at the histogram's precision
+        """
+        if not self.total:
+            return math.nan
+        target = max(1, math.ceil(p / 100 * self.total))
+        cumulative = 0
+        for bucket in sorted(self.counts):
+            cumulative += self.counts[bucket]
+            if cumulative >= target:
+                shift = max(0, bucket.bit_length() - self.precision_bits)
+                return min(bucket + (1 << shift) - 1, self.max)
+        return self.max
+
+
+class LatencyBaseline:
+    """
+    The latencies recorded for each latency test case on some cluster, from
+    which their budgets are derived.
+
+    A test's budget for a measurement (took or wall time) is its recorded
+    latency multiplied by `headroom`, so that budgets reflect what the
+    cluster has actually achieved rather than guesses. While `recording`,
+    tests store their measurements instead of being judged against them,
+    and `write` saves them for later runs.
+    """
+
+    def __init__(
+        self, path: Path, headroom: float = 1.5, recording: bool = False
+    ):
+        self.path = path
+        self.headroom = headroom
+        self.recording = recording
+        self.measurements: dict[str, dict[str, float]] = {}
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                self.measurements = json.load(f)
+
+    def budget(self, test_id: str, measurement: str) -> Optional[float]:
+        recorded = self.measurements.get(test_id, {}).get(measurement)
+        return None if recorded is None else recorded * self.headroom
+
+    def record(self, test_id: str, measurements: dict[str, float]):
+        self.measurements[test_id] = measurements
+
+    def write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.measurements, f, indent=2, sort_keys=True)
+            f.write("\n")
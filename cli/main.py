@@ -1,7 +1,7 @@
 import typer
 
 from . import role_arn
-from .commands import index, query, search, task, test
+from .commands import index, load, query, search, task, test
 
 app = typer.Typer(
     name="rank",
@@ -21,3 +21,4 @@ app.add_typer(index.app)
 app.add_typer(search.app)
 app.add_typer(task.app)
 app.add_typer(query.app)
+app.add_typer(load.app)
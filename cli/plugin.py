@@ -1,20 +1,50 @@
-import json
 import os
 from typing import Any, cast
 
-import chevron
 import typer
 from elasticsearch import Elasticsearch
 from pytest import StashKey, fixture, hookimpl
 
+from _pytest.skipping import evaluate_skip_marks
 from _pytest.terminal import TerminalReporter
 
+from .profiling import ProfileSummary
+from .relevance_tests import metrics
+from .relevance_tests.models import LatencyTestCase, RecallTestCase, TestCase
+from .results import RunResults
+from .searcher import Searcher
+from .templates import QueryTemplate
+from .tokens import TokenChecker
+
 
 class RankPlugin:
     def __init__(self, *, context: typer.Context):
         self._client = context.meta["client"]
         self._index = context.meta["index"]
-        self._query_template = json.dumps(context.meta["query_template"])
+        self._stable_sort_key = "query.id"
+        self._content_type = context.meta["content_type"]
+        self._test_cases: list[TestCase] = []
+        self._query_template = QueryTemplate(context.meta["query_template"])
+        self._save_results = context.meta["save_results"]
+        self._profile = context.meta["profile"]
+        self._searcher = Searcher(
+            client=self._client,
+            index=self._index,
+            render_query=self._query_template.render,
+            stable_sort_key=self._stable_sort_key,
+            batch_size=context.meta["batch_size"],
+            concurrency=context.meta["concurrency"],
+            profile=self._profile,
+            timeout=context.meta["search_timeout"],
+        )
+        self._analyzer_only = context.meta["analyzer_only"]
+        self._run_latency_tests = context.meta["latency"]
+        self._latency_baseline = context.meta["latency_baseline"]
+        self._token_checker = TokenChecker(
+            client=self._client,
+            index=self._index,
+            render_query=self._query_template.render,
+        )
 
     # This is a hack to rewrite test names in the output, excluding their
     # common prefix. This is useful in particular for when rank is installed
@@ -61,9 +91,136 @@ class RankPlugin:
 
     @hookimpl(tryfirst=True)
     def pytest_collection_modifyitems(self, session, config, items):
+        deselected = [
+            item
+            for item in items
+            # Only tests which can compare tokens are run in analyzer-only
+            # mode
+            if (
+                self._analyzer_only
+                and "tokens" not in getattr(item, "fixturenames", ())
+            )
+            # Latency tests repeat their searches, so they're opt-in
+            or (
+                not self._run_latency_tests
+                and item.get_closest_marker("latency") is not None
+            )
+        ]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = [item for item in items if item not in deselected]
+        if not items:
+            return
         commonpath = os.path.commonpath([str(item.path) for item in items])
         config.stash[RankPlugin.common_path_key] = commonpath
 
+    @hookimpl()
+    def pytest_collection_finish(self, session):
+        # Fetch the results for every selected test in a few batched requests,
+        # rather than making one round trip to the cluster per test
+        if session.config.option.collectonly:
+            return
+
+        self._test_cases = [
+            item.callspec.params["test_case"]
+            for item in session.items
+            if hasattr(item, "callspec")
+            and isinstance(item.callspec.params.get("test_case"), TestCase)
+            # latency tests time their own searches
+            and not isinstance(
+                item.callspec.params["test_case"], LatencyTestCase
+            )
+            # pytest only evaluates skip and skipif marks when each test is
+            # set up, so evaluate them here to avoid searching for skipped
+            # tests
+            and evaluate_skip_marks(item) is None
+        ]
+        if self._analyzer_only:
+            self._token_checker.prefetch(
+                (test_case.search_terms, test_case.expected_ids)
+                for test_case in self._test_cases
+                if isinstance(test_case, RecallTestCase)
+            )
+            return
+        self._searcher.prefetch(
+            (test_case.search_terms, test_case.search_size)
+            for test_case in self._test_cases
+        )
+
+    @hookimpl()
+    def pytest_terminal_summary(self, terminalreporter):
+        results = []
+        for test_case in self._test_cases:
+            response = self._searcher.cached(
+                test_case.search_terms, test_case.search_size
+            )
+            if response is not None:
+                ranked_ids = [hit["_id"] for hit in response["hits"]["hits"]]
+                results.append((test_case, ranked_ids))
+
+        summary = metrics.summarise(results)
+        if summary:
+            terminalreporter.write_sep(
+                "=", f"relevance metrics: {self._content_type.value}"
+            )
+            terminalreporter.write_line(
+                f"{'':<20}{'cases':>6}{'P@k':>8}{'R@k':>8}{'MRR':>8}"
+                f"{'nDCG@k':>8}"
+            )
+            groups = sorted(summary, key=lambda group: group == "all")
+            for group in groups:
+                count, means = summary[group]
+                terminalreporter.write_line(
+                    f"{group:<20}{count:>6}"
+                    + "".join(f"{value:>8.3f}" for value in means)
+                )
+
+        if self._profile:
+            self._write_profile(terminalreporter)
+
+        if self._save_results and results:
+            self._write_results(terminalreporter)
+
+        baseline = self._latency_baseline
+        if baseline is not None and baseline.recording:
+            if baseline.measurements:
+                baseline.write()
+                terminalreporter.write_line(
+                    f"Latency baseline saved to {baseline.path}"
+                )
+
+    def _write_profile(self, terminalreporter):
+        profile = ProfileSummary()
+        for search_terms, response in self._searcher.responses().items():
+            profile.add(search_terms, response)
+        lines = profile.report()
+        if lines:
+            terminalreporter.write_sep(
+                "=", f"query profile: {self._content_type.value}"
+            )
+            for line in lines:
+                terminalreporter.write_line(line)
+
+    def _write_results(self, terminalreporter):
+        responses = self._searcher.responses()
+        test_case_ids: dict[str, list[str]] = {}
+        for test_case in self._test_cases:
+            if test_case.search_terms in responses and test_case.id:
+                test_case_ids.setdefault(test_case.search_terms, []).append(
+                    test_case.id
+                )
+
+        run_results = RunResults.from_responses(
+            index=self._index,
+            query_template=self._query_template.template,
+            responses=(
+                (search_terms, ids, responses[search_terms])
+                for search_terms, ids in test_case_ids.items()
+            ),
+        )
+        path = run_results.write()
+        terminalreporter.write_line(f"Results saved to {path}")
+
     @fixture(scope="session")
     def client(self) -> Elasticsearch:
         return self._client
@@ -74,14 +231,30 @@ class RankPlugin:
 
     @fixture()
     def stable_sort_key(self):
-        return "query.id"
+        return self._stable_sort_key
 
     @fixture()
     def render_query(self):
-        def _render_query(search_terms: str):
-            rendered = chevron.render(
-                self._query_template, {"query": search_terms}
-            )
-            return json.loads(rendered)
+        return self._query_template.render
 
-        return _render_query
+    @fixture()
+    def search(self):
+        return self._searcher.search
+
+    @fixture()
+    def measure(self):
+        return self._searcher.measure
+
+    @fixture()
+    def latency_baseline(self):
+        return self._latency_baseline
+
+    @fixture()
+    def rank(self):
+        """Finds where a document ranks, if the client can count documents"""
+        return self._searcher.rank if hasattr(self._client, "count") else None
+
+    @fixture()
+    def tokens(self):
+        """A TokenChecker in analyzer-only mode, otherwise None"""
+        return self._token_checker if self._analyzer_only else None
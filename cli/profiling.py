@@ -0,0 +1,124 @@
+import re
+from collections import defaultdict
+from typing import Any
+
+# Field names in a Lucene query's description, eg `title.english` in
+# `+(title.english:moder title.english:long)~2`
+field_name = re.compile(r"(?<![\w.])([A-Za-z_@][\w.]*):")
+
+
+def clause_label(query: dict[str, Any]) -> str:
+    """
+    Names a profiled Lucene query by its type and the fields it searches,
+    which are the same for every search built from one query template
+    """
+    fields = sorted(set(field_name.findall(query.get("description", ""))))
+    if not fields:
+        return query["type"]
+    return f"{query['type']} ({', '.join(fields)})"
+
+
+class ProfileSummary:
+    """
+    Aggregates the `profile` sections of many search responses.
+
+    Clauses are identified by their path from the root of the Lucene query
+    tree, so that the same clause of a query template is aggregated across
+    searches whatever their search terms. For each clause, the inclusive
+    time includes the time of its children, and the self time doesn't.
+    """
+
+    def __init__(self):
+        self.searches = 0
+        # total query time (including rewriting and collection) per search
+        self.search_nanos: dict[str, int] = defaultdict(int)
+        # total query time per shard, and the number of searches it ran
+        self.shard_nanos: dict[str, int] = defaultdict(int)
+        self.shard_searches: dict[str, int] = defaultdict(int)
+        # inclusive and self time per clause, and the number of times it ran
+        self.clause_nanos: dict[tuple[str, ...], int] = defaultdict(int)
+        self.clause_self_nanos: dict[tuple[str, ...], int] = defaultdict(int)
+        self.clause_count: dict[tuple[str, ...], int] = defaultdict(int)
+
+    def add(self, search_terms: str, response: dict[str, Any]):
+        if "profile" not in response:
+            return
+        self.searches += 1
+        for shard in response["profile"]["shards"]:
+            for search in shard["searches"]:
+                nanos = search.get("rewrite_time", 0) + sum(
+                    collector["time_in_nanos"]
+                    for collector in search.get("collector", [])
+                )
+                for query in search["query"]:
+                    nanos += query["time_in_nanos"]
+                    self._add_clause(query, path=())
+                self.search_nanos[search_terms] += nanos
+                self.shard_nanos[shard["id"]] += nanos
+                self.shard_searches[shard["id"]] += 1
+
+    def _add_clause(self, query: dict[str, Any], path: tuple[str, ...]):
+        path = (*path, clause_label(query))
+        children = query.get("children", [])
+        self.clause_nanos[path] += query["time_in_nanos"]
+        self.clause_self_nanos[path] += query["time_in_nanos"] - sum(
+            child["time_in_nanos"] for child in children
+        )
+        self.clause_count[path] += 1
+        for child in children:
+            self._add_clause(child, path)
+
+    def report(self, limit: int = 10) -> list[str]:
+        """
+        Returns the lines of a report of the slowest clauses (by self time),
+        shards, and searches, slowest first
+        """
+        if not self.searches:
+            return []
+        total = sum(self.search_nanos.values()) or 1
+        lines = [
+            f"{self.searches} profiled searches, "
+            f"{total / 1e6:.1f}ms of query time in total",
+            "",
+            f"{'self ms':>10}{'%':>7}{'total ms':>10}{'count':>7}  clause",
+        ]
+        clauses = sorted(
+            self.clause_self_nanos,
+            key=self.clause_self_nanos.__getitem__,
+            reverse=True,
+        )
+        for path in clauses[:limit]:
+            # Ancestors are shown by type alone, to keep lines readable
+            ancestors = [label.split(" (")[0] for label in path[:-1]]
+            lines.append(
+                f"{self.clause_self_nanos[path] / 1e6:>10.1f}"
+                f"{100 * self.clause_self_nanos[path] / total:>7.1f}"
+                f"{self.clause_nanos[path] / 1e6:>10.1f}"
+                f"{self.clause_count[path]:>7}  "
+                + " > ".join([*ancestors, path[-1]])
+            )
+
+        lines += ["", f"{'total ms':>10}{'%':>7}{'mean ms':>10}  shard"]
+        for shard in sorted(
+            self.shard_nanos, key=self.shard_nanos.__getitem__, reverse=True
+        )[:limit]:
+            nanos = self.shard_nanos[shard]
+            lines.append(
+                f"{nanos / 1e6:>10.1f}{100 * nanos / total:>7.1f}"
+                f"{nanos / self.shard_searches[shard] / 1e6:>10.1f}  {shard}"
+            )
+
+        lines += ["", f"{'total ms':>10}{'%':>7}  search terms"]
+        for search_terms in sorted(
+            self.search_nanos, key=self.search_nanos.__getitem__, reverse=True
+        )[:limit]:
+            nanos = self.search_nanos[search_terms]
+            shortened = (
+                search_terms
+                if len(search_terms) <= 60
+                else search_terms[:57] + "..."
+            )
+            lines.append(
+                f"{nanos / 1e6:>10.1f}{100 * nanos / total:>7.1f}  {shortened}"
+            )
+        return lines
@@ -19,6 +19,13 @@ def pytest_addoption(parser: pytest.Parser) -> None:
     )
 
 
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line(
+        "markers",
+        "latency: latency tests, which only run with `rank test --latency`",
+    )
+
+
 def _should_run_relevance(config: pytest.Config) -> bool:
     if config.getoption("--run-relevance"):
         return True
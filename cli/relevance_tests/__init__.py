@@ -1,3 +1,11 @@
+import importlib
+import pkgutil
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .models import TestCase
+
+
 def nth(n) -> str:
     "Return the ordinal form of a number"
     number_string = str(n)
@@ -9,3 +17,16 @@ def nth(n) -> str:
         return f"{number_string}rd"
     else:
         return f"{number_string}th"
+
+
+def collect_test_cases(content_type: str) -> list["TestCase"]:
+    """Returns the test cases from every test module for a content type"""
+    package = importlib.import_module(f"{__name__}.{content_type}")
+    test_cases: list["TestCase"] = []
+    for module_info in pkgutil.iter_modules(package.__path__):
+        if module_info.name.startswith("test_"):
+            module = importlib.import_module(
+                f"{package.__name__}.{module_info.name}"
+            )
+            test_cases += getattr(module, "test_cases", [])
+    return test_cases
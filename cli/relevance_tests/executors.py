@@ -2,21 +2,54 @@ import pytest
 
 from collections.abc import Collection
 
-from .models import RecallTestCase, PrecisionTestCase, OrderTestCase
+from elasticsearch import ApiError, TransportError
 
+from ..latency import percentile
+from .models import (
+    LatencyTestCase,
+    OrderTestCase,
+    PrecisionTestCase,
+    RecallTestCase,
+    TestCase,
+)
 
-def do_test_recall(
-    test_case: RecallTestCase, client, index, render_query, stable_sort_key
-):
+
+def fail_if_timed_out(response: dict):
+    if response.get("timed_out"):
+        pytest.fail(
+            "The search timed out, so its results are incomplete",
+            pytrace=False,
+        )
+
+
+def describe_missing_ids(test_case: TestCase, missing_ids, rank) -> str:
+    """
+    Where each missing document actually ranks, so that a failure says how
+    far off it is without the test searching for more results
+    """
+    lines = []
+    for doc_id in sorted(missing_ids):
+        try:
+            position = rank(test_case.search_terms, doc_id)
+        except (ApiError, TransportError) as error:
+            lines.append(f"{doc_id}: couldn't find its rank ({error})")
+            continue
+        if position is None:
+            lines.append(f"{doc_id}: doesn't match the query")
+        else:
+            lines.append(
+                f"{doc_id}: expected at ≤{test_case.search_size}, "
+                f"actual rank {position}"
+            )
+    return "\n".join(lines)
+
+
+def do_test_recall(test_case: RecallTestCase, search, rank=None):
     expected_ids = set(test_case.expected_ids)
     forbidden_ids = set(test_case.forbidden_ids)
-    results = client.search(
-        index=index,
-        _source=False,
-        size=max(test_case.threshold_position, len(expected_ids) + 1),
-        query=render_query(test_case.search_terms),
-        sort=[{"_score": "desc"}, {stable_sort_key: "asc"}],
-    )["hits"]["hits"]
+    response = search(test_case.search_terms, test_case.search_size)
+    fail_if_timed_out(response)
+    results = response["hits"]["hits"]
     for doc in results:
         doc_id = doc["_id"]
         try:
@@ -31,22 +64,41 @@ def do_test_recall(
     try:
         assert not expected_ids
     except AssertionError:
-        pytest.fail(
-            f"{expected_ids} not found in the search results",
-        )
+        message = f"{expected_ids} not found in the search results"
+        if rank is not None:
+            message += "\n" + describe_missing_ids(
+                test_case, expected_ids, rank
+            )
+        pytest.fail(message)
+
+
+def do_test_token_overlap(test_case: RecallTestCase, tokens):
+    """
+    Fail unless every expected document has a field which contains all of
+    the search terms' tokens. This only checks the index's analysis, not
+    where the documents rank, but it needs no searches at all.
+    """
+    failures = []
+    for doc_id in test_case.expected_ids:
+        match = tokens.best_match(test_case.search_terms, doc_id)
+        if match is None:
+            failures.append(f"{doc_id} is not in the index")
+        elif match.field is None:
+            failures.append(f"{doc_id} has no text in the searched fields")
+        elif match.missing:
+            failures.append(
+                f"{doc_id} is missing tokens {match.missing} "
+                f"(closest field: {match.field})"
+            )
+
+    if failures:
+        pytest.fail("\n".join(failures), pytrace=False)
 
 
-def do_test_precision(
-    test_case: PrecisionTestCase, client, index, render_query, stable_sort_key
-):
+def do_test_precision(test_case: PrecisionTestCase, search):
     expected_ids = test_case.expected_ids
-    response = client.search(
-        index=index,
-        query=render_query(test_case.search_terms),
-        sort=[{"_score": "desc"}, {stable_sort_key: "asc"}],
-        size=len(expected_ids),
-        _source=False,
-    )
+    response = search(test_case.search_terms, test_case.search_size)
+    fail_if_timed_out(response)
     result_ids = [result["_id"] for result in response["hits"]["hits"]]
 
     actual: Collection[str]
@@ -67,22 +119,16 @@ def do_test_precision(
         )
 
 
-def do_test_order(
-    test_case: OrderTestCase, client, index, render_query, stable_sort_key
-):
+def do_test_order(test_case: OrderTestCase, search, rank=None):
     before_ids = set(test_case.before_ids)
     after_ids = set(test_case.after_ids)
     assert not before_ids.intersection(after_ids), (
         "before and after IDs must be disjoint!"
     )
 
-    results = client.search(
-        index=index,
-        _source=False,
-        size=test_case.threshold_position,
-        query=render_query(test_case.search_terms),
-        sort=[{"_score": "desc"}, {stable_sort_key: "asc"}],
-    )["hits"]["hits"]
+    response = search(test_case.search_terms, test_case.search_size)
+    fail_if_timed_out(response)
+    results = response["hits"]["hits"]
 
     failures = []
     for doc in results:
@@ -104,8 +150,14 @@ def do_test_order(
     except AssertionError:
         description = test_case.description or ""
         description_suffix = f"\n\n{description}" if description else ""
+        ranks = (
+            "\n" + describe_missing_ids(test_case, before_ids, rank)
+            if rank is not None
+            else ""
+        )
         pytest.fail(
-            f"{before_ids} not found in search results.{description_suffix}",
+            f"{before_ids} not found in search results.{ranks}"
+            f"{description_suffix}",
             pytrace=False,
         )
 
@@ -120,3 +172,54 @@ def do_test_order(
             ],
         ]
         pytest.fail("\n".join(failure_message), pytrace=False)
+
+
+def do_test_latency(test_case: LatencyTestCase, measure, baseline=None):
+    """
+    Fail if a percentile of the search's repeated timings exceeds its
+    budget. Budgets which the test case doesn't set are taken from the
+    recorded `baseline`. While the baseline is recording, the timings are
+    stored in it instead.
+    """
+    timings = measure(
+        test_case.search_terms, test_case.size, test_case.repetitions
+    )
+    timed_out = sum(timing.timed_out for timing in timings)
+    if timed_out:
+        pytest.fail(
+            f"{timed_out} of {len(timings)} searches timed out, so their "
+            "results were incomplete",
+            pytrace=False,
+        )
+
+    p = test_case.latency_percentile
+    durations = {
+        "took": percentile([timing.took for timing in timings], p),
+        "wall time": percentile([timing.wall for timing in timings], p),
+    }
+    if baseline is not None and baseline.recording:
+        baseline.record(test_case.id, durations)
+        return
+
+    budgets = {
+        "took": test_case.max_took_ms,
+        "wall time": test_case.max_wall_ms,
+    }
+    for measurement, budget in budgets.items():
+        if budget is None and baseline is not None:
+            budgets[measurement] = baseline.budget(test_case.id, measurement)
+    if all(budget is None for budget in budgets.values()):
+        pytest.skip(
+            "There's no latency budget for this test. Record a baseline with "
+            "`rank test --record-latency-baseline`"
+        )
+
+    failures = [
+        f"The p{p:g} {measurement} of {durations[measurement]:.0f}ms over "
+        f"{len(timings)} searches exceeded the budget of {budget:.0f}ms"
+        for measurement, budget in budgets.items()
+        if budget is not None and durations[measurement] > budget
+    ]
+    if failures:
+        description = test_case.description or ""
+        pytest.fail("\n".join([description, *failures]).strip(), pytrace=False)
@@ -27,9 +27,5 @@ test_cases = [
 @pytest.mark.parametrize(
     "test_case", [test_case.param for test_case in test_cases]
 )
-def test_alternative_spellings(
-    test_case: RecallTestCase, client, index, render_query, stable_sort_key
-):
-    return do_test_recall(
-        test_case, client, index, render_query, stable_sort_key
-    )
+def test_alternative_spellings(test_case: RecallTestCase, search, rank):
+    return do_test_recall(test_case, search, rank)
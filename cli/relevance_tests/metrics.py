@@ -0,0 +1,97 @@
+import math
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import NamedTuple, Optional
+
+from .models import OrderTestCase, PrecisionTestCase, RecallTestCase, TestCase
+
+
+class Metrics(NamedTuple):
+    precision: float
+    recall: float
+    reciprocal_rank: float
+    ndcg: float
+
+
+def judgements(test_case: TestCase) -> Optional[tuple[dict[str, int], int]]:
+    """
+    Returns the graded relevance of the documents in a test case, and the
+    cutoff (k) its results should be judged at. Test cases which don't judge
+    any documents return None.
+    """
+    if isinstance(test_case, PrecisionTestCase):
+        return dict.fromkeys(test_case.expected_ids, 1), len(
+            test_case.expected_ids
+        )
+    if isinstance(test_case, RecallTestCase):
+        if not test_case.expected_ids:
+            return None
+        return (
+            dict.fromkeys(test_case.expected_ids, 1),
+            test_case.threshold_position,
+        )
+    if isinstance(test_case, OrderTestCase):
+        # Documents which should come first are more relevant than the ones
+        # which should come after them
+        return (
+            {
+                **dict.fromkeys(test_case.after_ids, 1),
+                **dict.fromkeys(test_case.before_ids, 2),
+            },
+            test_case.threshold_position,
+        )
+    return None
+
+
+def evaluate(ranked_ids: list[str], gains: dict[str, int], k: int) -> Metrics:
+    """
+    Computes precision@k, recall@k, reciprocal rank and nDCG@k for a ranked
+    list of IDs, given the graded relevance of the judged IDs
+    """
+    dcg = 0.0
+    relevant_found = 0
+    first_relevant_rank = 0
+    for rank, doc_id in enumerate(ranked_ids[:k], start=1):
+        gain = gains.get(doc_id, 0)
+        if gain:
+            relevant_found += 1
+            dcg += gain / math.log2(rank + 1)
+            first_relevant_rank = first_relevant_rank or rank
+
+    ideal_gains = sorted(gains.values(), reverse=True)[:k]
+    ideal_dcg = sum(
+        gain / math.log2(rank + 1)
+        for rank, gain in enumerate(ideal_gains, start=1)
+    )
+    return Metrics(
+        precision=relevant_found / k,
+        recall=relevant_found / len(gains),
+        reciprocal_rank=1 / first_relevant_rank if first_relevant_rank else 0,
+        ndcg=dcg / ideal_dcg if ideal_dcg else 0,
+    )
+
+
+def summarise(
+    results: Iterable[tuple[TestCase, list[str]]],
+) -> dict[str, tuple[int, Metrics]]:
+    """
+    Computes the mean of each metric across the results for each type of
+    test case, and across all of them. Returns the number of test cases and
+    their mean metrics for each type.
+    """
+    grouped: dict[str, list[Metrics]] = defaultdict(list)
+    for test_case, ranked_ids in results:
+        judged = judgements(test_case)
+        if judged is None:
+            continue
+        metrics = evaluate(ranked_ids, *judged)
+        grouped[type(test_case).__name__].append(metrics)
+        grouped["all"].append(metrics)
+
+    return {
+        group: (
+            len(metrics),
+            Metrics(*(sum(values) / len(values) for values in zip(*metrics))),
+        )
+        for group, metrics in grouped.items()
+    }
@@ -1,3 +1,4 @@
+from abc import abstractmethod
 from typing import ClassVar, List, Optional
 
 import pytest
@@ -45,6 +46,16 @@ class TestCase(BaseModel):
             else [],
         )
 
+    @property
+    @abstractmethod
+    def search_size(self) -> int:
+        """The number of search results needed to evaluate the test case"""
+
+    @property
+    def referenced_ids(self) -> list[str]:
+        """The IDs of every document the test case makes assertions about"""
+        return []
+
 
 class PrecisionTestCase(TestCase):
     expected_ids: List[str] = Field(
@@ -66,6 +77,14 @@ class PrecisionTestCase(TestCase):
     def __init__(self, **data: object) -> None:
         super().__init__(**data)
 
+    @property
+    def search_size(self) -> int:
+        return len(self.expected_ids)
+
+    @property
+    def referenced_ids(self) -> list[str]:
+        return self.expected_ids
+
     @model_validator(mode="after")
     def check_expected_ids(self):
         if len(self.expected_ids) == 0:
@@ -95,6 +114,14 @@ class RecallTestCase(TestCase):
         default=25,
     )
 
+    @property
+    def search_size(self) -> int:
+        return max(self.threshold_position, len(self.expected_ids) + 1)
+
+    @property
+    def referenced_ids(self) -> list[str]:
+        return self.expected_ids + self.forbidden_ids
+
     @model_validator(mode="after")
     def check_expected_ids(self):
         if len(self.expected_ids) != len(set(self.expected_ids)):
@@ -120,6 +147,14 @@ class OrderTestCase(TestCase):
 
     threshold_position: ClassVar[int] = 100
 
+    @property
+    def search_size(self) -> int:
+        return self.threshold_position
+
+    @property
+    def referenced_ids(self) -> list[str]:
+        return self.before_ids + self.after_ids
+
     @model_validator(mode="after")
     def check_expected_ids(self):
         if len(self.before_ids) != len(set(self.before_ids)):
@@ -135,3 +170,48 @@ class OrderTestCase(TestCase):
         if len(self.after_ids) == 0:
             raise ValueError("after_ids must not be empty")
         return self
+
+
+class LatencyTestCase(TestCase):
+    max_took_ms: Optional[float] = Field(
+        description=(
+            "The most milliseconds Elasticsearch may spend on the search "
+            "(its took), at the latency percentile"
+        ),
+        default=None,
+        gt=0,
+    )
+    max_wall_ms: Optional[float] = Field(
+        description=(
+            "The most milliseconds the search may take, as measured by the "
+            "client, at the latency percentile. If neither this nor "
+            "max_took_ms is set, budgets come from the recorded latency "
+            "baseline"
+        ),
+        default=None,
+        gt=0,
+    )
+    latency_percentile: float = Field(
+        description=(
+            "The percentile of the repeated measurements which must be within "
+            "budget. Judging a percentile rather than every measurement stops "
+            "an occasional slow search from failing the test"
+        ),
+        default=90,
+        gt=0,
+        le=100,
+    )
+    repetitions: int = Field(
+        description="The number of times the search is measured",
+        default=10,
+        ge=1,
+    )
+    size: int = Field(
+        description="The number of search results to fetch",
+        default=10,
+        ge=1,
+    )
+
+    @property
+    def search_size(self) -> int:
+        return self.size
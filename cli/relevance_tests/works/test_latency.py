@@ -0,0 +1,26 @@
+import pytest
+
+from ..models import LatencyTestCase
+from ..executors import do_test_latency
+
+# Latency tests repeat their searches, so they only run with --latency.
+# Their budgets come from a baseline recorded with --record-latency-baseline
+pytestmark = pytest.mark.latency
+
+test_cases = [
+    LatencyTestCase(
+        search_terms="Joint War Committee of the British Red Cross Society and the Order of St. John of Jerusalem in England.",
+        description="Moderately long phrase queries should be fast",
+    ),
+    LatencyTestCase(
+        search_terms="The accomplish'd ladies delight, in preserving, physick, beautifying, and cookery. : Containing I. The art of preserving and candying fruits and flowers; and the making of all sorts of conserves, syrups, and jellies. II. The physical cabinet: or, excellent receipts in physick and chirurgery; together with some beautifying waters, to adorn and add loveliness to the face and body: and also some new and excellent receipts relating to the female sex: and for the general good of families, is added the true receipt for making that famous cordial drink Daffy's elixir salutis. III. The compleat cook's guide: or, directions for dressing all sorts of flesh, fowl and fish, both in the English and French mode; with all sorts of sauces and sallets: and the making pyes, pasties, tarts, and custards, with the forms and shapes of many of them.",
+        description="Extremely long phrase queries should not time out",
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "test_case", [test_case.param for test_case in test_cases]
+)
+def test_latency(test_case: LatencyTestCase, measure, latency_baseline):
+    return do_test_latency(test_case, measure, latency_baseline)
@@ -98,9 +98,5 @@ test_cases = [
 @pytest.mark.parametrize(
     "test_case", [test_case.param for test_case in test_cases]
 )
-def test_order(
-    test_case: OrderTestCase, client, index, render_query, stable_sort_key
-):
-    return do_test_order(
-        test_case, client, index, render_query, stable_sort_key
-    )
+def test_order(test_case: OrderTestCase, search, rank):
+    return do_test_order(test_case, search, rank)
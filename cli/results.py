@@ -0,0 +1,203 @@
+import gzip
+import hashlib
+import json
+import math
+import struct
+import sys
+from array import array
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from . import results_directory
+
+# Identifies the file format, and its version
+magic = b"RANKRES1"
+
+# The typecodes of each column of result rows, in the order they're stored
+column_typecodes = {
+    # position of the row's query in `queries`
+    "query": "I",
+    # 1-based position of the document in the query's results
+    "rank": "I",
+    # position of the document's ID in `doc_ids`
+    "doc": "I",
+    "score": "f",
+}
+
+
+def template_hash(query_template: dict) -> str:
+    canonical = json.dumps(query_template, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
+
+
+class RunResults:
+    """
+    The ranked results of every search in a test run, stored in columns.
+
+    Each row is a (query, rank, doc, score) tuple. Queries and document IDs
+    are interned: rows refer to them by their position in the `queries` and
+    `doc_ids` lists, so that each ID is only stored once per run however
+    many queries return it. Rows for each query are contiguous and ordered
+    by rank.
+    """
+
+    def __init__(
+        self,
+        *,
+        index: str,
+        template_hash: str,
+        created: str,
+        queries: list[dict[str, Any]],
+        doc_ids: list[str],
+        columns: dict[str, "array[Any]"],
+    ):
+        self.index = index
+        self.template_hash = template_hash
+        self.created = created
+        self.queries = queries
+        self.doc_ids = doc_ids
+        self.columns = columns
+
+    @classmethod
+    def from_responses(
+        cls,
+        *,
+        index: str,
+        query_template: dict,
+        responses: Iterable[tuple[str, list[str], dict[str, Any]]],
+    ) -> "RunResults":
+        """
+        Builds a run from (search terms, test case IDs, search response)
+        tuples
+        """
+        queries: list[dict[str, Any]] = []
+        doc_positions: dict[str, int] = {}
+        columns: dict[str, "array[Any]"] = {
+            name: array(typecode) for name, typecode in column_typecodes.items()
+        }
+        for search_terms, test_case_ids, response in responses:
+            hits = response["hits"]["hits"]
+            queries.append(
+                {
+                    "search_terms": search_terms,
+                    "test_case_ids": test_case_ids,
+                    "took": response.get("took"),
+                    "start": len(columns["rank"]),
+                    "count": len(hits),
+                }
+            )
+            for rank, hit in enumerate(hits, start=1):
+                columns["query"].append(len(queries) - 1)
+                columns["rank"].append(rank)
+                columns["doc"].append(
+                    doc_positions.setdefault(hit["_id"], len(doc_positions))
+                )
+                columns["score"].append(_score(hit))
+
+        return cls(
+            index=index,
+            template_hash=template_hash(query_template),
+            # Runs are named after when they were created, so this is precise
+            # enough for scripted runs to be told apart
+            created=datetime.now(timezone.utc).isoformat(
+                timespec="microseconds"
+            ),
+            queries=queries,
+            doc_ids=list(doc_positions),
+            columns=columns,
+        )
+
+    def ranked_ids(self, search_terms: str) -> Optional[list[str]]:
+        """The ranked document IDs for a set of search terms, if it was run"""
+        for query in self.queries:
+            if query["search_terms"] == search_terms:
+                docs = self.columns["doc"][
+                    query["start"] : query["start"] + query["count"]
+                ]
+                return [self.doc_ids[doc] for doc in docs]
+        return None
+
+    def path(self, directory: Path = results_directory) -> Path:
+        created = self.created.replace(":", "").replace("+0000", "Z")
+        return (
+            directory / self.index / self.template_hash / f"{created}.rank.gz"
+        )
+
+    def write(self, directory: Path = results_directory) -> Path:
+        header = json.dumps(
+            {
+                "index": self.index,
+                "template_hash": self.template_hash,
+                "created": self.created,
+                "byteorder": sys.byteorder,
+                "rows": len(self.columns["rank"]),
+                "queries": self.queries,
+                "doc_ids": self.doc_ids,
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+
+        path = self.path(directory)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Open the file exclusively, so an earlier run is never overwritten
+        with (
+            open(path, "xb") as raw,
+            gzip.GzipFile(fileobj=raw, mode="wb") as f,
+        ):
+            f.write(magic)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for name in column_typecodes:
+                f.write(self.columns[name].tobytes())
+        return path
+
+    @classmethod
+    def read(cls, path: Path) -> "RunResults":
+        with gzip.open(path, "rb") as f:
+            if f.read(len(magic)) != magic:
+                raise ValueError(f"{path} is not a rank results file")
+            (header_length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_length))
+            columns: dict[str, "array[Any]"] = {}
+            for name, typecode in column_typecodes.items():
+                column = array(typecode)
+                column.frombytes(f.read(header["rows"] * column.itemsize))
+                if header["byteorder"] != sys.byteorder:
+                    column.byteswap()
+                columns[name] = column
+
+        return cls(
+            index=header["index"],
+            template_hash=header["template_hash"],
+            created=header["created"],
+            queries=header["queries"],
+            doc_ids=header["doc_ids"],
+            columns=columns,
+        )
+
+
+def find_runs(
+    index: Optional[str] = None,
+    query_template: Optional[dict] = None,
+    directory: Path = results_directory,
+) -> list[Path]:
+    """
+    Returns the paths of stored runs, oldest first, optionally restricted to
+    an index and/or query template
+    """
+    index_pattern = index or "*"
+    hash_pattern = template_hash(query_template) if query_template else "*"
+    return sorted(
+        directory.glob(f"{index_pattern}/{hash_pattern}/*.rank.gz"),
+        key=lambda path: path.name,
+    )
+
+
+def _score(hit: dict[str, Any]) -> float:
+    score = hit.get("_score")
+    if score is None and hit.get("sort"):
+        # when results are sorted, the score is the first sort value
+        score = hit["sort"][0]
+    return math.nan if score is None else float(score)
@@ -0,0 +1,270 @@
+import struct
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Any, NamedTuple, Optional
+
+from elasticsearch import ApiError, TransportError
+
+
+class Timing(NamedTuple):
+    # the time Elasticsearch spent on the search, in milliseconds
+    took: float
+    # the time the client waited for the response, in milliseconds
+    wall: float
+    timed_out: bool
+
+
+class Searcher:
+    """
+    Runs the searches that the relevance test executors depend on.
+
+    Each distinct set of search terms is only searched for once per run, at
+    the largest size that any test needs. Tests which need fewer results are
+    given a slice of that response, which is identical to a smaller search
+    because results are always sorted with a stable tiebreak.
+
+    Results can be fetched up front for a whole test run with `prefetch`,
+    which batches the searches into chunked `_msearch` requests and sends up
+    to `concurrency` of them at once. Any search which wasn't prefetched (or
+    whose prefetch failed) is run individually when it's needed, so errors
+    are still reported against the right test.
+
+    With `profile`, every search asks Elasticsearch for a breakdown of where
+    its time was spent. With `timeout`, Elasticsearch stops searching after
+    that long and returns partial results marked `timed_out`, rather than
+    keeping the client waiting.
+    """
+
+    def __init__(
+        self,
+        *,
+        client,
+        index: str,
+        render_query: Callable[[str], dict],
+        stable_sort_key: str,
+        batch_size: int = 50,
+        concurrency: int = 1,
+        profile: bool = False,
+        timeout: Optional[str] = None,
+    ):
+        self._client = client
+        self._index = index
+        self._render_query = render_query
+        self._stable_sort_key = stable_sort_key
+        self._batch_size = batch_size
+        self._concurrency = concurrency
+        self._profile = profile
+        self._timeout = timeout
+        # The largest number of results needed for each set of search terms
+        self._sizes: dict[str, int] = {}
+        # The responses for each set of search terms, with the size they
+        # were fetched at
+        self._responses: dict[str, tuple[int, dict[str, Any]]] = {}
+
+    def _body(self, search_terms: str, size: int) -> dict[str, Any]:
+        body = {
+            "query": self._render_query(search_terms),
+            "sort": [{"_score": "desc"}, {self._stable_sort_key: "asc"}],
+            "size": size,
+            "_source": False,
+        }
+        if self._profile:
+            body["profile"] = True
+        if self._timeout is not None:
+            body["timeout"] = self._timeout
+        return body
+
+    def _is_cached(self, search_terms: str, size: int) -> bool:
+        return (
+            search_terms in self._responses
+            and self._responses[search_terms][0] >= size
+        )
+
+    def search(self, search_terms: str, size: int) -> dict[str, Any]:
+        """Return the first `size` search results for a set of search terms"""
+        if not self._is_cached(search_terms, size):
+            size_to_fetch = max(size, self._sizes.get(search_terms, 0))
+            response = self._client.search(
+                index=self._index, **self._body(search_terms, size_to_fetch)
+            )
+            self._responses[search_terms] = (size_to_fetch, dict(response))
+
+        return self._slice(search_terms, size)
+
+    def measure(
+        self, search_terms: str, size: int, repetitions: int, warmup: int = 1
+    ) -> list[Timing]:
+        """
+        Time repeated searches for a set of search terms. The searches
+        bypass both this searcher's cache and the shard request cache, and
+        aren't profiled, so that they're timed like a real user's search.
+        """
+        body = {
+            **self._body(search_terms, size),
+            "profile": False,
+            "request_cache": False,
+        }
+        timings = []
+        for repetition in range(warmup + repetitions):
+            start = perf_counter()
+            response = self._client.search(index=self._index, **body)
+            wall = (perf_counter() - start) * 1000
+            if repetition >= warmup:
+                timings.append(
+                    Timing(
+                        took=response["took"],
+                        wall=wall,
+                        timed_out=bool(response.get("timed_out")),
+                    )
+                )
+        return timings
+
+    def rank(self, search_terms: str, doc_id: str) -> Optional[int]:
+        """
+        The position of a document in the results for a set of search terms,
+        or None if it doesn't match them.
+
+        Rather than fetching every result down to the document, this finds
+        its score with a search filtered to its ID, then counts the documents
+        which come before it: those which score higher, and those which
+        score the same but come first in the stable sort.
+        """
+        query = self._render_query(search_terms)
+        response = self._client.search(
+            index=self._index,
+            query={
+                "bool": {
+                    "must": [query],
+                    "filter": [{"ids": {"values": [doc_id]}}],
+                }
+            },
+            sort=[{"_score": "desc"}, {self._stable_sort_key: "asc"}],
+            size=1,
+            _source=False,
+        )
+        hits = response["hits"]["hits"]
+        if not hits:
+            return None
+        score, sort_key = hits[0]["sort"]
+        higher_score = _next_score(score)
+        position = self._count(query, higher_score) + 1
+        if sort_key is not None:
+            tied_before = {
+                "bool": {
+                    "must": [query],
+                    "filter": [
+                        {"range": {self._stable_sort_key: {"lt": sort_key}}}
+                    ],
+                }
+            }
+            position += self._count(tied_before, score) - self._count(
+                tied_before, higher_score
+            )
+        return position
+
+    def _count(self, query: dict[str, Any], min_score: float) -> int:
+        """The number of documents matching a query with at least min_score"""
+        response = self._client.count(
+            index=self._index, query=query, min_score=min_score
+        )
+        return response["count"]
+
+    def cached(self, search_terms: str, size: int) -> Optional[dict[str, Any]]:
+        """
+        Return the first `size` search results for a set of search terms if
+        they've already been fetched, without searching for them
+        """
+        if not self._is_cached(search_terms, size):
+            return None
+        return self._slice(search_terms, size)
+
+    def responses(self) -> dict[str, dict[str, Any]]:
+        """Every response fetched so far, by search terms"""
+        return {
+            search_terms: response
+            for search_terms, (_, response) in self._responses.items()
+        }
+
+    def _slice(self, search_terms: str, size: int) -> dict[str, Any]:
+        response = self._responses[search_terms][1]
+        return {
+            **response,
+            "hits": {
+                **response["hits"],
+                "hits": response["hits"]["hits"][:size],
+            },
+        }
+
+    def prefetch(self, searches: Iterable[tuple[str, int]]) -> None:
+        """
+        Fetch the responses for many (search_terms, size) pairs in chunks of
+        `batch_size` searches per `_msearch` request. If batching is disabled
+        but `concurrency` is greater than 1, the searches are still fetched up
+        front, as individual requests.
+        """
+        for search_terms, size in searches:
+            self._sizes[search_terms] = max(
+                size, self._sizes.get(search_terms, 0)
+            )
+        pending = [
+            (search_terms, size)
+            for search_terms, size in self._sizes.items()
+            if not self._is_cached(search_terms, size)
+        ]
+
+        if self._batch_size > 0:
+            fetch = self._msearch
+            chunk_size = self._batch_size
+        elif self._concurrency > 1:
+            fetch = self._search_each
+            chunk_size = 1
+        else:
+            return
+
+        chunks = [
+            pending[start : start + chunk_size]
+            for start in range(0, len(pending), chunk_size)
+        ]
+        if self._concurrency > 1:
+            with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+                # The client is shared between threads; its connection pool
+                # is thread-safe
+                list(executor.map(fetch, chunks))
+        else:
+            for chunk in chunks:
+                fetch(chunk)
+
+    def _search_each(self, keys: list[tuple[str, int]]) -> None:
+        for key in keys:
+            try:
+                self.search(*key)
+            except (ApiError, TransportError):
+                pass
+
+    def _msearch(self, keys: list[tuple[str, int]]) -> None:
+        searches: list[dict[str, Any]] = []
+        for search_terms, size in keys:
+            searches.append({"index": self._index})
+            searches.append(self._body(search_terms, size))
+
+        try:
+            responses = self._client.msearch(searches=searches)["responses"]
+        except (ApiError, TransportError):
+            # Leave these searches to be retried individually by the tests
+            # which need them, so that failures surface where they belong
+            return
+
+        for (search_terms, size), response in zip(keys, responses):
+            if "error" not in response:
+                self._responses[search_terms] = (size, response)
+
+
+def _next_score(score: float) -> float:
+    """
+    The smallest score higher than `score`. Elasticsearch's scores are 32-bit
+    floats, so this is the next 32-bit float up.
+    """
+    (bits,) = struct.unpack("<I", struct.pack("<f", score))
+    (next_score,) = struct.unpack("<f", struct.pack("<I", bits + 1))
+    return next_score
@@ -0,0 +1,584 @@
+"""
+Text analysis for the local search engine, built from the analysis
+settings of a saved index config.
+
+Only the tokenizers, token filters and character filters that our indices
+use most are implemented. Anything else is skipped (and listed in
+`Analysis.unsupported`), so a local index can always be built, even if
+some of its terms differ from the ones Elasticsearch would produce.
+"""
+
+import re
+import unicodedata
+from collections.abc import Callable
+from functools import lru_cache
+from typing import Any
+
+# A token's term and position. Positions can skip numbers (eg where a stop
+# word was removed), and several tokens can share a position (eg shingles).
+Token = tuple[str, int]
+
+# Lucene's default English stop words
+english_stop_words = frozenset(
+    "a an and are as at be but by for if in into is it no not of on or such "
+    "that the their then there these they this to was will with".split()
+)
+
+# The articles removed by the elision filter by default
+default_articles = frozenset(
+    "l m t qu n s j d c jusqu quoiqu lorsqu puisqu".split()
+)
+
+# Approximates the standard tokenizer's Unicode word boundaries: runs of
+# letters and digits, joined by apostrophes or full stops inside a word
+standard_token = re.compile(r"\w+(?:[.'’]\w+)*")
+letter_token = re.compile(r"[^\W\d_]+")
+
+
+class Analyzer:
+    def __init__(
+        self,
+        char_filters: list[Callable[[str], str]],
+        tokenizer: Callable[[str], list[str]],
+        filters: list[Callable[[list[Token]], list[Token]]],
+    ):
+        self.char_filters = char_filters
+        self.tokenizer = tokenizer
+        self.filters = filters
+
+    def analyze(self, text: str) -> list[Token]:
+        for char_filter in self.char_filters:
+            text = char_filter(text)
+        tokens = [
+            (term, position)
+            for position, term in enumerate(self.tokenizer(text))
+        ]
+        for token_filter in self.filters:
+            tokens = token_filter(tokens)
+        return tokens
+
+    def terms(self, text: str) -> list[str]:
+        return [term for term, _ in self.analyze(text)]
+
+
+class Analysis:
+    """The analyzers and normalizers defined in an index's settings"""
+
+    def __init__(self, settings: dict[str, Any]):
+        index_settings = settings.get("index", settings)
+        analysis = index_settings.get("analysis", settings.get("analysis", {}))
+        self.unsupported: set[str] = set()
+        self._tokenizers = analysis.get("tokenizer", {})
+        self._filters = analysis.get("filter", {})
+        self._char_filters = analysis.get("char_filter", {})
+        self.analyzers = {
+            name: self._build_analyzer(name, definition)
+            for name, definition in analysis.get("analyzer", {}).items()
+        }
+        self.normalizers = {
+            name: self._build_analyzer(
+                name, {**definition, "tokenizer": "keyword"}
+            )
+            for name, definition in analysis.get("normalizer", {}).items()
+        }
+
+    def analyzer(self, name: str = "standard") -> Analyzer:
+        if name not in self.analyzers:
+            self.analyzers[name] = self._builtin_analyzer(name)
+        return self.analyzers[name]
+
+    def normalizer(self, name: str | None) -> Analyzer:
+        if name is None:
+            return Analyzer([], keyword_tokenizer, [])
+        if name == "lowercase":
+            return Analyzer([], keyword_tokenizer, [lowercase])
+        if name not in self.normalizers:
+            self.unsupported.add(f"normalizer {name}")
+            return Analyzer([], keyword_tokenizer, [])
+        return self.normalizers[name]
+
+    def _builtin_analyzer(self, name: str) -> Analyzer:
+        if name == "keyword":
+            return Analyzer([], keyword_tokenizer, [])
+        if name == "whitespace":
+            return Analyzer([], str.split, [])
+        if name == "simple":
+            return Analyzer([], letter_token.findall, [lowercase])
+        if name == "stop":
+            return Analyzer(
+                [], letter_token.findall, [lowercase, stop(english_stop_words)]
+            )
+        if name == "english":
+            return Analyzer(
+                [],
+                standard_token.findall,
+                [
+                    english_possessive,
+                    lowercase,
+                    stop(english_stop_words),
+                    stem(porter_stem),
+                ],
+            )
+        if name != "standard":
+            self.unsupported.add(f"analyzer {name}")
+        return Analyzer([], standard_token.findall, [lowercase])
+
+    def _build_analyzer(
+        self, name: str, definition: dict[str, Any]
+    ) -> Analyzer:
+        if definition.get("type", "custom") != "custom":
+            return self._builtin_analyzer(definition["type"])
+        return Analyzer(
+            [
+                self._build_char_filter(char_filter)
+                for char_filter in _as_list(definition.get("char_filter"))
+            ],
+            self._build_tokenizer(definition.get("tokenizer", "standard")),
+            [
+                self._build_filter(token_filter)
+                for token_filter in _as_list(definition.get("filter"))
+            ],
+        )
+
+    def _build_tokenizer(
+        self, tokenizer: str | dict
+    ) -> Callable[[str], list[str]]:
+        definition = (
+            self._tokenizers.get(tokenizer, {"type": tokenizer})
+            if isinstance(tokenizer, str)
+            else tokenizer
+        )
+        kind = definition["type"]
+        if kind == "keyword":
+            return keyword_tokenizer
+        if kind == "whitespace":
+            return str.split
+        if kind in ("letter", "lowercase"):
+            return letter_token.findall
+        if kind == "pattern":
+            pattern = re.compile(definition.get("pattern", r"\W+"))
+            return lambda text: [term for term in pattern.split(text) if term]
+        if kind not in ("standard", "classic", "icu_tokenizer"):
+            self.unsupported.add(f"tokenizer {kind}")
+        return standard_token.findall
+
+    def _build_filter(
+        self, token_filter: str | dict
+    ) -> Callable[[list[Token]], list[Token]]:
+        definition = (
+            self._filters.get(token_filter, {"type": token_filter})
+            if isinstance(token_filter, str)
+            else token_filter
+        )
+        kind = definition["type"]
+        if kind == "lowercase":
+            return lowercase
+        if kind == "uppercase":
+            return map_terms(str.upper)
+        if kind in ("asciifolding", "icu_folding"):
+            return ascii_folding(definition.get("preserve_original", False))
+        if kind == "stop":
+            return stop(_stop_words(definition.get("stopwords", "_english_")))
+        if kind in ("stemmer", "snowball", "porter_stem", "kstem"):
+            language = definition.get(
+                "language", definition.get("name", "english")
+            )
+            if kind in ("porter_stem", "kstem") or language in (
+                "english",
+                "porter",
+                "light_english",
+                "porter2",
+                "lovins",
+            ):
+                return stem(porter_stem)
+            if language == "minimal_english":
+                return stem(minimal_english_stem)
+            if language == "possessive_english":
+                return english_possessive
+        if kind == "elision":
+            articles = definition.get("articles")
+            return elision(
+                frozenset(articles) if articles else default_articles
+            )
+        if kind == "unique":
+            return unique
+        if kind == "trim":
+            return map_terms(str.strip)
+        if kind == "length":
+            minimum = definition.get("min", 0)
+            maximum = definition.get("max", float("inf"))
+            return lambda tokens: [
+                token for token in tokens if minimum <= len(token[0]) <= maximum
+            ]
+        if kind == "truncate":
+            length = definition.get("length", 10)
+            return map_terms(lambda term: term[:length])
+        if kind == "shingle":
+            return shingle(
+                min_size=definition.get("min_shingle_size", 2),
+                max_size=definition.get("max_shingle_size", 2),
+                output_unigrams=definition.get("output_unigrams", True),
+                separator=definition.get("token_separator", " "),
+            )
+        self.unsupported.add(f"filter {kind}")
+        return lambda tokens: tokens
+
+    def _build_char_filter(
+        self, char_filter: str | dict
+    ) -> Callable[[str], str]:
+        definition = (
+            self._char_filters.get(char_filter, {"type": char_filter})
+            if isinstance(char_filter, str)
+            else char_filter
+        )
+        kind = definition["type"]
+        if kind == "html_strip":
+            return lambda text: re.sub(r"<[^>]*>", " ", text)
+        if kind == "mapping":
+            mappings = []
+            for mapping in definition.get("mappings", []):
+                source, _, target = mapping.partition("=>")
+                mappings.append((source.strip(), target.strip()))
+
+            def apply_mappings(text: str) -> str:
+                for source, target in mappings:
+                    text = text.replace(source, target)
+                return text
+
+            return apply_mappings
+        if kind == "pattern_replace":
+            pattern = re.compile(definition["pattern"])
+            # Java regex replacements refer to groups as $1, Python as \1
+            replacement = re.sub(
+                r"\$(\d+)", r"\\\1", definition.get("replacement", "")
+            )
+            return lambda text: pattern.sub(replacement, text)
+        self.unsupported.add(f"char_filter {kind}")
+        return lambda text: text
+
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _stop_words(stopwords: str | list[str]) -> frozenset[str]:
+    if isinstance(stopwords, list):
+        return frozenset(stopwords)
+    if stopwords == "_english_":
+        return english_stop_words
+    return frozenset()
+
+
+def keyword_tokenizer(text: str) -> list[str]:
+    return [text]
+
+
+def map_terms(
+    function: Callable[[str], str],
+) -> Callable[[list[Token]], list[Token]]:
+    return lambda tokens: [
+        (function(term), position) for term, position in tokens
+    ]
+
+
+lowercase = map_terms(str.lower)
+
+
+def fold_to_ascii(term: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", term)
+    return "".join(
+        character
+        for character in decomposed
+        if not unicodedata.combining(character)
+    )
+
+
+def ascii_folding(
+    preserve_original: bool,
+) -> Callable[[list[Token]], list[Token]]:
+    def fold(tokens: list[Token]) -> list[Token]:
+        folded = []
+        for term, position in tokens:
+            folded_term = fold_to_ascii(term)
+            folded.append((folded_term, position))
+            if preserve_original and folded_term != term:
+                folded.append((term, position))
+        return folded
+
+    return fold
+
+
+def stop(words: frozenset[str]) -> Callable[[list[Token]], list[Token]]:
+    return lambda tokens: [token for token in tokens if token[0] not in words]
+
+
+def stem(
+    stemmer: Callable[[str], str],
+) -> Callable[[list[Token]], list[Token]]:
+    return map_terms(stemmer)
+
+
+def english_possessive(tokens: list[Token]) -> list[Token]:
+    return [
+        (re.sub(r"['’][sS]$", "", term), position) for term, position in tokens
+    ]
+
+
+def elision(articles: frozenset[str]) -> Callable[[list[Token]], list[Token]]:
+    def remove_articles(tokens: list[Token]) -> list[Token]:
+        elided = []
+        for term, position in tokens:
+            article, apostrophe, rest = term.replace("’", "'").partition("'")
+            if apostrophe and article.lower() in articles:
+                term = rest
+            elided.append((term, position))
+        return elided
+
+    return remove_articles
+
+
+def unique(tokens: list[Token]) -> list[Token]:
+    seen = set()
+    kept = []
+    for term, position in tokens:
+        if term not in seen:
+            seen.add(term)
+            kept.append((term, position))
+    return kept
+
+
+def shingle(
+    min_size: int, max_size: int, output_unigrams: bool, separator: str
+) -> Callable[[list[Token]], list[Token]]:
+    def make_shingles(tokens: list[Token]) -> list[Token]:
+        shingles = list(tokens) if output_unigrams else []
+        for start, (_, position) in enumerate(tokens):
+            for size in range(min_size, max_size + 1):
+                if start + size <= len(tokens):
+                    terms = [term for term, _ in tokens[start : start + size]]
+                    shingles.append((separator.join(terms), position))
+        return sorted(shingles, key=lambda token: token[1])
+
+    return make_shingles
+
+
+def minimal_english_stem(term: str) -> str:
+    """Lucene's EnglishMinimalStemmer, which only removes plurals"""
+    if len(term) < 3 or term[-1] != "s":
+        return term
+    if term.endswith("ies") and not term.endswith(("eies", "aies")):
+        return term[:-3] + "y"
+    if term.endswith("es") and not term.endswith(("aes", "ees", "oes")):
+        return term[:-1]
+    if not term.endswith(("us", "ss")):
+        return term[:-1]
+    return term
+
+
+@lru_cache(maxsize=100_000)
+def porter_stem(term: str) -> str:
+    """The original Porter stemming algorithm, as used by Lucene"""
+    if len(term) <= 2:
+        return term
+    return _PorterStemmer(term).stem()
+
+
+class _PorterStemmer:
+    # A direct translation of Martin Porter's reference implementation. `b`
+    # holds the word being stemmed, `k` the index of its last character, and
+    # `j` a general offset into it.
+    def __init__(self, word: str):
+        self.b = word
+        self.k = len(word) - 1
+        self.j = 0
+
+    def cons(self, i: int) -> bool:
+        """Whether the ith character is a consonant"""
+        if self.b[i] in "aeiou":
+            return False
+        if self.b[i] == "y":
+            return i == 0 or not self.cons(i - 1)
+        return True
+
+    def m(self) -> int:
+        """The number of consonant-vowel sequences between 0 and j"""
+        n = 0
+        i = 0
+        while True:
+            if i > self.j:
+                return n
+            if not self.cons(i):
+                break
+            i += 1
+        i += 1
+        while True:
+            while True:
+                if i > self.j:
+                    return n
+                if self.cons(i):
+                    break
+                i += 1
+            i += 1
+            n += 1
+            while True:
+                if i > self.j:
+                    return n
+                if not self.cons(i):
+                    break
+                i += 1
+            i += 1
+
+    def vowel_in_stem(self) -> bool:
+        return any(not self.cons(i) for i in range(self.j + 1))
+
+    def double_consonant(self, j: int) -> bool:
+        return j >= 1 and self.b[j] == self.b[j - 1] and self.cons(j)
+
+    def cvc(self, i: int) -> bool:
+        """Whether i-2, i-1, i are consonant, vowel, consonant (not w, x or y)"""
+        if (
+            i < 2
+            or not self.cons(i)
+            or self.cons(i - 1)
+            or not self.cons(i - 2)
+        ):
+            return False
+        return self.b[i] not in "wxy"
+
+    def ends(self, suffix: str) -> bool:
+        length = len(suffix)
+        if length > self.k + 1:
+            return False
+        if self.b[self.k - length + 1 : self.k + 1] != suffix:
+            return False
+        self.j = self.k - length
+        return True
+
+    def set_to(self, suffix: str):
+        self.b = self.b[: self.j + 1] + suffix + self.b[self.k + 1 :]
+        self.k = self.j + len(suffix)
+
+    def replace(self, suffix: str):
+        if self.m() > 0:
+            self.set_to(suffix)
+
+    def step1ab(self):
+        if self.b[self.k] == "s":
+            if self.ends("sses"):
+                self.k -= 2
+            elif self.ends("ies"):
+                self.set_to("i")
+            elif self.b[self.k - 1] != "s":
+                self.k -= 1
+        if self.ends("eed"):
+            if self.m() > 0:
+                self.k -= 1
+        elif (self.ends("ed") or self.ends("ing")) and self.vowel_in_stem():
+            self.k = self.j
+            if self.ends("at"):
+                self.set_to("ate")
+            elif self.ends("bl"):
+                self.set_to("ble")
+            elif self.ends("iz"):
+                self.set_to("ize")
+            elif self.double_consonant(self.k):
+                self.k -= 1
+                if self.b[self.k] in "lsz":
+                    self.k += 1
+            elif self.m() == 1 and self.cvc(self.k):
+                self.set_to("e")
+
+    def step1c(self):
+        if self.ends("y") and self.vowel_in_stem():
+            self.b = self.b[: self.k] + "i" + self.b[self.k + 1 :]
+
+    def replace_first(self, rules: list[tuple[str, str]]):
+        for suffix, replacement in rules:
+            if self.ends(suffix):
+                self.replace(replacement)
+                return
+
+    def step2(self):
+        self.replace_first(
+            {
+                "a": [("ational", "ate"), ("tional", "tion")],
+                "c": [("enci", "ence"), ("anci", "ance")],
+                "e": [("izer", "ize")],
+                "l": [
+                    ("bli", "ble"),
+                    ("alli", "al"),
+                    ("entli", "ent"),
+                    ("eli", "e"),
+                    ("ousli", "ous"),
+                ],
+                "o": [("ization", "ize"), ("ation", "ate"), ("ator", "ate")],
+                "s": [
+                    ("alism", "al"),
+                    ("iveness", "ive"),
+                    ("fulness", "ful"),
+                    ("ousness", "ous"),
+                ],
+                "t": [("aliti", "al"), ("iviti", "ive"), ("biliti", "ble")],
+                "g": [("logi", "log")],
+            }.get(self.b[self.k - 1], [])
+        )
+
+    def step3(self):
+        self.replace_first(
+            {
+                "e": [("icate", "ic"), ("ative", ""), ("alize", "al")],
+                "i": [("iciti", "ic")],
+                "l": [("ical", "ic"), ("ful", "")],
+                "s": [("ness", "")],
+            }.get(self.b[self.k], [])
+        )
+
+    def step4(self):
+        suffixes = {
+            "a": ["al"],
+            "c": ["ance", "ence"],
+            "e": ["er"],
+            "i": ["ic"],
+            "l": ["able", "ible"],
+            "n": ["ant", "ement", "ment", "ent"],
+            "o": ["ion", "ou"],
+            "s": ["ism"],
+            "t": ["ate", "iti"],
+            "u": ["ous"],
+            "v": ["ive"],
+            "z": ["ize"],
+        }.get(self.b[self.k - 1], [])
+        for suffix in suffixes:
+            if self.ends(suffix):
+                if suffix == "ion" and (
+                    self.j < 0 or self.b[self.j] not in "st"
+                ):
+                    continue
+                if self.m() > 1:
+                    self.k = self.j
+                return
+
+    def step5(self):
+        self.j = self.k
+        if self.b[self.k] == "e":
+            a = self.m()
+            if a > 1 or (a == 1 and not self.cvc(self.k - 1)):
+                self.k -= 1
+        if (
+            self.b[self.k] == "l"
+            and self.double_consonant(self.k)
+            and self.m() > 1
+        ):
+            self.k -= 1
+
+    def stem(self) -> str:
+        self.step1ab()
+        if self.k > 0:
+            self.step1c()
+            self.step2()
+            self.step3()
+            self.step4()
+            self.step5()
+        return self.b[: self.k + 1]
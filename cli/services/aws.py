@@ -1,20 +1,29 @@
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Union, List
+
 import boto3
+from botocore.exceptions import ClientError
+
+from . import cache
+
+# Assumed-role credentials are reused until they're this close to expiring
+credentials_expiry_margin = timedelta(minutes=5)
+
+# How long secret values are reused for before they're fetched again
+secrets_ttl = timedelta(hours=1)
+
+# The maximum number of secrets which can be fetched in one batch request
+secrets_batch_size = 20
 
 
 def get_session(role_arn: str) -> boto3.session.Session:
     if role_arn:
-        sts_client = boto3.client("sts")
-        assumed_role = sts_client.assume_role(
-            RoleArn=role_arn,
-            RoleSessionName="rank-cli",
-        )
+        credentials = get_role_credentials(role_arn)
         session = boto3.session.Session(
-            aws_access_key_id=assumed_role["Credentials"]["AccessKeyId"],
-            aws_secret_access_key=assumed_role["Credentials"][
-                "SecretAccessKey"
-            ],
-            aws_session_token=assumed_role["Credentials"]["SessionToken"],
+            aws_access_key_id=credentials["AccessKeyId"],
+            aws_secret_access_key=credentials["SecretAccessKey"],
+            aws_session_token=credentials["SessionToken"],
             region_name="eu-west-1",
         )
         return session
@@ -22,6 +31,33 @@ def get_session(role_arn: str) -> boto3.session.Session:
         return boto3.session.Session(region_name="eu-west-1")
 
 
+def get_role_credentials(role_arn: str) -> dict:
+    """
+    Returns credentials for the role, reusing ones cached by a previous
+    invocation until shortly before they expire
+    """
+    cached_credentials = cache.read("credentials")
+    credentials = cached_credentials.get(role_arn)
+    if credentials is not None:
+        expiration = datetime.fromisoformat(credentials["Expiration"])
+        if expiration - datetime.now(timezone.utc) > credentials_expiry_margin:
+            return credentials
+
+    sts_client = boto3.client("sts")
+    assumed_role = sts_client.assume_role(
+        RoleArn=role_arn,
+        RoleSessionName="rank-cli",
+    )
+    credentials = {
+        "AccessKeyId": assumed_role["Credentials"]["AccessKeyId"],
+        "SecretAccessKey": assumed_role["Credentials"]["SecretAccessKey"],
+        "SessionToken": assumed_role["Credentials"]["SessionToken"],
+        "Expiration": assumed_role["Credentials"]["Expiration"].isoformat(),
+    }
+    cache.write("credentials", {**cached_credentials, role_arn: credentials})
+    return credentials
+
+
 def get_secrets(
     session: boto3.session.Session,
     secret_ids: Union[str, List[str]],
@@ -30,10 +66,56 @@ def get_secrets(
     if isinstance(secret_ids, str):
         secret_ids = [secret_ids]
 
+    now = time.time()
+    cached_secrets = {
+        name: secret
+        for name, secret in cache.read("secrets").items()
+        if secret["expires"] > now
+    }
+
     secrets = {}
-    client = session.client("secretsmanager")
+    missing_names = []
     for secret_id in secret_ids:
-        response = client.get_secret_value(SecretId=secret_prefix + secret_id)
-        secrets[secret_id] = response["SecretString"]
+        name = secret_prefix + secret_id
+        if name in cached_secrets:
+            secrets[secret_id] = cached_secrets[name]["value"]
+        else:
+            missing_names.append(name)
+
+    if missing_names:
+        fetched = _fetch_secrets(session, missing_names)
+        expires = now + secrets_ttl.total_seconds()
+        for name, value in fetched.items():
+            cached_secrets[name] = {"value": value, "expires": expires}
+        cache.write("secrets", cached_secrets)
+        for secret_id in secret_ids:
+            name = secret_prefix + secret_id
+            if name in fetched:
+                secrets[secret_id] = fetched[name]
 
     return secrets
+
+
+def _fetch_secrets(
+    session: boto3.session.Session, names: List[str]
+) -> dict[str, str]:
+    client = session.client("secretsmanager")
+    secrets: dict[str, str] = {}
+    for start in range(0, len(names), secrets_batch_size):
+        batch = names[start : start + secrets_batch_size]
+        try:
+            secret_values = client.batch_get_secret_value(SecretIdList=batch)[
+                "SecretValues"
+            ]
+        except ClientError:
+            # Batch requests need their own permission, which not every role
+            # has. Anything missing from the batch is fetched individually,
+            # which also raises the underlying error for unreadable secrets.
+            secret_values = []
+        for secret in secret_values:
+            secrets[secret["Name"]] = secret["SecretString"]
+        for name in batch:
+            if name not in secrets:
+                response = client.get_secret_value(SecretId=name)
+                secrets[name] = response["SecretString"]
+    return secrets
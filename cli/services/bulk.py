@@ -0,0 +1,200 @@
+import json
+import random
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Optional, cast
+
+from elasticsearch import ApiError, Elasticsearch, TransportError
+
+
+@dataclass
+class BulkStats:
+    """The outcome of loading documents with `_bulk` requests"""
+
+    indexed: int = 0
+    failed: int = 0
+    # the number of times a document was rejected (429) and sent again
+    retried: int = 0
+    # the number of bytes sent, including retries
+    bytes: int = 0
+    # the number of failed documents by error type
+    errors: Counter = field(default_factory=Counter)
+
+    def merge(self, other: "BulkStats"):
+        self.indexed += other.indexed
+        self.failed += other.failed
+        self.retried += other.retried
+        self.bytes += other.bytes
+        self.errors.update(other.errors)
+
+
+def bulk_actions(
+    index: str, documents: Iterable[dict[str, Any]]
+) -> Iterator[bytes]:
+    """The action and source lines of a `_bulk` request for each document"""
+    for document in documents:
+        action = {"index": {"_index": index, "_id": document["_id"]}}
+        yield (
+            json.dumps(action)
+            + "\n"
+            + json.dumps(document.get("_source", {}), ensure_ascii=False)
+            + "\n"
+        ).encode("utf-8")
+
+
+def batches_by_size(
+    actions: Iterable[bytes], max_bytes: int
+) -> Iterator[list[bytes]]:
+    """
+    Groups actions into batches of at most `max_bytes`. Documents vary a lot
+    in size, so batches of a fixed size in bytes keep requests closer to the
+    size a cluster handles best than batches of a fixed number of documents.
+    An action which is bigger than `max_bytes` is sent on its own.
+    """
+    batch: list[bytes] = []
+    size = 0
+    for action in actions:
+        if batch and size + len(action) > max_bytes:
+            yield batch
+            batch, size = [], 0
+        batch.append(action)
+        size += len(action)
+    if batch:
+        yield batch
+
+
+def send_batch(
+    client: Elasticsearch,
+    batch: list[bytes],
+    max_retries: int = 8,
+    backoff: float = 1.0,
+    max_backoff: float = 60.0,
+    sleep: Callable[[float], None] = time.sleep,
+) -> BulkStats:
+    """
+    Sends a batch of actions in a `_bulk` request. When the cluster is too
+    busy (429), either for the whole request or for some of its documents,
+    or the connection fails or times out, the affected documents are sent
+    again after an exponential backoff with jitter. Other failures, including requests which fail outright, are
+    counted by error type rather than retried or raised.
+    """
+    stats = BulkStats()
+    attempt = 0
+    while batch:
+        body = b"".join(batch)
+        stats.bytes += len(body)
+        retry: list[bytes] = []
+        try:
+            # The client sends pre-serialised NDJSON as it is
+            response = client.bulk(operations=cast(Any, body))
+        except ApiError as error:
+            if error.meta.status == 429 and attempt < max_retries:
+                retry = batch
+            else:
+                # The whole request failed (eg it was too big, or still
+                # rejected after every retry), so every document in it did
+                stats.failed += len(batch)
+                stats.errors[_request_error_type(error)] += len(batch)
+        except TransportError as error:
+            # The connection failed or timed out. That's usually transient,
+            # and indexing documents by ID again is harmless even if some of
+            # the request was applied, so it's retried like a rejection
+            if attempt < max_retries:
+                retry = batch
+            else:
+                stats.failed += len(batch)
+                stats.errors[type(error).__name__] += len(batch)
+        else:
+            for item, action in zip(response["items"], batch):
+                result = next(iter(item.values()))
+                if result["status"] < 300:
+                    stats.indexed += 1
+                elif result["status"] == 429 and attempt < max_retries:
+                    retry.append(action)
+                else:
+                    stats.failed += 1
+                    error_type = result.get("error", {}).get("type", "unknown")
+                    stats.errors[error_type] += 1
+        if retry:
+            stats.retried += len(retry)
+            delay = min(max_backoff, backoff * 2**attempt)
+            sleep(delay * random.uniform(0.5, 1.0))
+            attempt += 1
+        batch = retry
+    return stats
+
+
+def _request_error_type(error: ApiError) -> str:
+    """The type of error in a failed request's body, or its status code"""
+    if isinstance(error.body, dict) and isinstance(
+        error.body.get("error"), dict
+    ):
+        return error.body["error"].get("type", str(error.meta.status))
+    return str(error.meta.status)
+
+
+def load_documents(
+    client: Elasticsearch,
+    index: str,
+    documents: Iterable[dict[str, Any]],
+    concurrency: int = 4,
+    max_bytes: int = 5_000_000,
+    max_retries: int = 8,
+    on_batch: Optional[Callable[[BulkStats], None]] = None,
+) -> BulkStats:
+    """
+    Indexes documents with up to `concurrency` `_bulk` requests in flight at
+    once. Documents are read lazily, and only a couple of batches per worker
+    are held in memory, however many documents there are.
+    """
+    stats = BulkStats()
+    in_flight: set[Future] = set()
+
+    def collect(futures: set[Future]):
+        for future in futures:
+            batch_stats = future.result()
+            stats.merge(batch_stats)
+            if on_batch is not None:
+                on_batch(batch_stats)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for batch in batches_by_size(bulk_actions(index, documents), max_bytes):
+            if len(in_flight) >= 2 * concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(
+                executor.submit(send_batch, client, batch, max_retries)
+            )
+        collect(in_flight)
+    return stats
+
+
+@contextmanager
+def bulk_indexing_settings(client: Elasticsearch, index: str):
+    """
+    Turns off refreshes and replicas while documents are loaded into an
+    index, which makes indexing much cheaper, then restores the previous
+    settings (even if the load fails) and refreshes the index
+    """
+    settings = client.indices.get_settings(index=index, flat_settings=True)[
+        index
+    ]["settings"]
+    # Settings which weren't set explicitly are restored to their defaults
+    # by setting them to null
+    previous = {
+        key: settings.get(f"index.{key}")
+        for key in ["refresh_interval", "number_of_replicas"]
+    }
+    client.indices.put_settings(
+        index=index,
+        settings={"index": {"refresh_interval": "-1", "number_of_replicas": 0}},
+    )
+    try:
+        yield
+    finally:
+        client.indices.put_settings(index=index, settings={"index": previous})
+        client.indices.refresh(index=index)
@@ -0,0 +1,38 @@
+import json
+import os
+import tempfile
+from typing import Any
+
+from .. import cache_directory
+
+
+def read(name: str) -> dict[str, Any]:
+    """
+    Read a named cache file from the cache directory. A missing or corrupt
+    cache is treated as empty.
+    """
+    path = cache_directory / f"{name}.json"
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            contents = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return contents if isinstance(contents, dict) else {}
+
+
+def write(name: str, contents: dict[str, Any]) -> None:
+    """
+    Atomically replace a named cache file. Files are only readable by their
+    owner, as some caches hold credentials.
+    """
+    cache_directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(
+        dir=cache_directory, prefix=f".{name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as f:
+            json.dump(contents, f)
+        os.replace(temporary_path, cache_directory / f"{name}.json")
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
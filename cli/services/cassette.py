@@ -0,0 +1,124 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Any
+
+
+class CassetteMissError(LookupError):
+    pass
+
+
+class Cassette:
+    """
+    A directory of recorded search requests and their responses.
+
+    Each response is stored in its own file, named after a hash of the index
+    and request body (query, size, sort, etc) which produced it. A manifest
+    records the index and query template used for the recording, so that
+    they can be reused when the cassette is replayed.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.responses_directory = self.directory / "responses"
+        self.manifest_path = self.directory / "manifest.json"
+
+    @staticmethod
+    def key(index: str, body: dict[str, Any]) -> str:
+        request = json.dumps(
+            {"index": index, **body}, sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def read(self, index: str, body: dict[str, Any]) -> dict[str, Any]:
+        path = self.responses_directory / f"{self.key(index, body)}.json"
+        if not path.exists():
+            raise CassetteMissError(
+                f"No recorded response in {self.directory} for this search "
+                f"against {index}. Record it again with `rank test --record`"
+            )
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["response"]
+
+    def write(
+        self, index: str, body: dict[str, Any], response: dict[str, Any]
+    ) -> None:
+        self.responses_directory.mkdir(parents=True, exist_ok=True)
+        path = self.responses_directory / f"{self.key(index, body)}.json"
+        recorded = {
+            "request": {"index": index, **body},
+            "response": {
+                key: response[key]
+                for key in ["took", "timed_out", "hits", "profile"]
+                if key in response
+            },
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(recorded, f, ensure_ascii=False)
+
+    @property
+    def manifest(self) -> dict[str, Any]:
+        if not self.manifest_path.exists():
+            raise FileNotFoundError(
+                f"{self.directory} does not contain a recording. You can "
+                "create one by running `rank test --record`"
+            )
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write_manifest(self, index: str, query_template: dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"index": index, "query_template": query_template}, f, indent=2
+            )
+
+
+class RecordingClient:
+    """
+    Wraps an Elasticsearch client, recording every search response it
+    returns to a cassette
+    """
+
+    def __init__(self, client, cassette: Cassette):
+        self._client = client
+        self._cassette = cassette
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+    def search(self, index: str, **body: Any) -> dict[str, Any]:
+        response = dict(self._client.search(index=index, **body))
+        self._cassette.write(index, body, response)
+        return response
+
+    def msearch(self, searches: list[dict[str, Any]]) -> dict[str, Any]:
+        response = dict(self._client.msearch(searches=searches))
+        for header, body, item in zip(
+            searches[::2], searches[1::2], response["responses"]
+        ):
+            if "error" not in item:
+                self._cassette.write(header["index"], body, item)
+        return response
+
+
+class ReplayClient:
+    """
+    Serves search responses from a cassette, in place of an Elasticsearch
+    client. Searches which weren't recorded raise a `CassetteMissError`.
+    """
+
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+
+    def search(self, index: str, **body: Any) -> dict[str, Any]:
+        return self._cassette.read(index, body)
+
+    def msearch(self, searches: list[dict[str, Any]]) -> dict[str, Any]:
+        responses: list[dict[str, Any]] = []
+        for header, body in zip(searches[::2], searches[1::2]):
+            try:
+                responses.append(self._cassette.read(header["index"], body))
+            except CassetteMissError as error:
+                responses.append({"error": {"reason": str(error)}})
+        return {"responses": responses}
@@ -0,0 +1,196 @@
+"""
+Corpora of documents exported from an index, for offline work.
+
+A corpus is a directory of gzipped NDJSON shards, each line of which is a
+`{"_id": ..., "_source": ...}` object, plus a manifest describing the
+export. Exports are split into slices, each of which writes its own shards
+and records a checkpoint whenever it finishes one, so an interrupted export
+can pick up where it left off.
+"""
+
+import gzip
+import json
+import os
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from elasticsearch import Elasticsearch
+
+from .elasticsearch import scan_with_pit
+
+shard_suffixes = (".ndjson", ".ndjson.gz")
+
+
+def read_corpus(path: Path) -> Iterator[dict[str, Any]]:
+    """
+    Yields the documents in a corpus: an NDJSON file (optionally gzipped) of
+    `{"_id": ..., "_source": ...}` objects, or a directory of them
+    """
+    path = Path(path)
+    paths = (
+        sorted(
+            file
+            for file in path.iterdir()
+            if file.name.endswith(shard_suffixes)
+        )
+        if path.is_dir()
+        else [path]
+    )
+    for file in paths:
+        opener = gzip.open if file.name.endswith(".gz") else open
+        with opener(file, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def read_manifest(directory: Path) -> Optional[dict[str, Any]]:
+    path = directory / "manifest.json"
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def corpus_size(path: Path) -> Optional[int]:
+    """The number of documents in an exported corpus, if it's known"""
+    path = Path(path)
+    if not path.is_dir() or read_manifest(path) is None:
+        return None
+    return sum(
+        SliceCheckpoint.read(path, int(checkpoint.stem.split("-")[1])).documents
+        for checkpoint in path.glob("slice-*.json")
+    )
+
+
+def write_manifest(directory: Path, manifest: dict[str, Any]):
+    directory.mkdir(parents=True, exist_ok=True)
+    _write_json_atomically(directory / "manifest.json", manifest)
+
+
+def _write_json_atomically(path: Path, data: Any):
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(temporary_path, path)
+
+
+@dataclass
+class SliceCheckpoint:
+    """How far through its documents a slice of an export has got"""
+
+    slice_number: int
+    # the sort values of the last document in the last finished shard
+    search_after: Optional[list[Any]] = None
+    documents: int = 0
+    shards: int = 0
+    # the compressed size of the finished shards
+    bytes: int = 0
+    done: bool = False
+
+    @staticmethod
+    def path(directory: Path, slice_number: int) -> Path:
+        return directory / f"slice-{slice_number:03d}.json"
+
+    @classmethod
+    def read(cls, directory: Path, slice_number: int) -> "SliceCheckpoint":
+        path = cls.path(directory, slice_number)
+        if not path.exists():
+            return cls(slice_number)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def write(self, directory: Path):
+        _write_json_atomically(
+            self.path(directory, self.slice_number), asdict(self)
+        )
+
+
+def export_slice(
+    client: Elasticsearch,
+    index: str,
+    pit_id: str,
+    query: dict[str, Any],
+    sort_field: str,
+    directory: Path,
+    slice_number: int,
+    source: Union[bool, dict[str, Any]] = True,
+    page_size: int = 1000,
+    shard_size: int = 50_000,
+    keep_alive: str = "10m",
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> SliceCheckpoint:
+    """
+    Writes the documents matching a slice's query to shards of `shard_size`
+    documents, continuing from the slice's last checkpoint.
+
+    Shards are written under a temporary name, and only renamed once
+    they're complete, so a shard from an interrupted export is never read
+    as part of the corpus. Only one page of documents is held in memory at
+    once. `on_progress` is called with the number of documents and
+    compressed bytes written since it was last called.
+    """
+    checkpoint = SliceCheckpoint.read(directory, slice_number)
+    if checkpoint.done:
+        return checkpoint
+    for partial in directory.glob(f"part-{slice_number:03d}-*.partial"):
+        partial.unlink()
+
+    shard: Optional[gzip.GzipFile] = None
+    shard_path = directory
+    documents_in_shard = 0
+    last_sort: Optional[list[Any]] = None
+
+    def finish_shard():
+        nonlocal shard, documents_in_shard
+        assert shard is not None
+        shard.close()
+        final_path = shard_path.with_name(shard_path.stem)
+        os.replace(shard_path, final_path)
+        size = final_path.stat().st_size
+        checkpoint.search_after = last_sort
+        checkpoint.documents += documents_in_shard
+        checkpoint.shards += 1
+        checkpoint.bytes += size
+        checkpoint.write(directory)
+        if on_progress is not None:
+            on_progress(0, size)
+        shard = None
+        documents_in_shard = 0
+
+    for hits in scan_with_pit(
+        client,
+        index=index,
+        query=query,
+        source=source,
+        page_size=page_size,
+        keep_alive=keep_alive,
+        sort=[{sort_field: "asc"}],
+        search_after=checkpoint.search_after,
+        pit_id=pit_id,
+    ):
+        for hit in hits:
+            if shard is None:
+                shard_path = (
+                    directory / f"part-{slice_number:03d}-"
+                    f"{checkpoint.shards:05d}.ndjson.gz.partial"
+                )
+                shard = gzip.GzipFile(shard_path, "wb")
+            document = {"_id": hit["_id"], "_source": hit.get("_source", {})}
+            shard.write(
+                (json.dumps(document, ensure_ascii=False) + "\n").encode()
+            )
+            documents_in_shard += 1
+            last_sort = hit["sort"]
+            if documents_in_shard >= shard_size:
+                finish_shard()
+        if on_progress is not None:
+            on_progress(len(hits), 0)
+
+    if shard is not None:
+        finish_shard()
+    checkpoint.done = True
+    checkpoint.write(directory)
+    return checkpoint
@@ -1,9 +1,18 @@
-from time import sleep
-from typing import Any
+import random
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+from typing import Any, Optional, Union
 
 import typer
 
-from elasticsearch import Elasticsearch
+from elasticsearch import (
+    ApiError,
+    AuthenticationException,
+    AuthorizationException,
+    Elasticsearch,
+    TransportError,
+)
 
 from .aws import get_secrets
 from .. import (
@@ -21,6 +30,21 @@ common_es_client_config: dict[str, Any] = {
     "max_retries": 3,
 }
 
+# The number of connections the client keeps open to each node by default.
+# Requests wait for a free connection, so commands which run more requests
+# at once than this ask for more with context.meta["concurrency"].
+default_connections_per_node = 10
+
+
+def _client_config(context: typer.Context) -> dict[str, Any]:
+    return {
+        **common_es_client_config,
+        "connections_per_node": max(
+            default_connections_per_node,
+            context.meta.get("concurrency", 1),
+        ),
+    }
+
 
 def pipeline_client(
     context: typer.Context, pipeline_date: str
@@ -40,7 +64,7 @@ def pipeline_client(
     client = Elasticsearch(
         f"{secrets['protocol']}://{secrets['public_host']}:{secrets['port']}",
         basic_auth=(secrets["es_username"], secrets["es_password"]),
-        **common_es_client_config,
+        **_client_config(context),
     )
     wait_for_client(client)
     return client
@@ -56,7 +80,7 @@ def rank_client(context: typer.Context) -> Elasticsearch:
     client = Elasticsearch(
         cloud_id=secrets["ES_RANK_CLOUD_ID"],
         basic_auth=(secrets["ES_RANK_USER"], secrets["ES_RANK_PASSWORD"]),
-        **common_es_client_config,
+        **_client_config(context),
     )
     wait_for_client(client)
     return client
@@ -79,19 +103,121 @@ def reporting_client(context: typer.Context) -> Elasticsearch:
             secrets["read_only/es_username"],
             secrets["read_only/es_password"],
         ),
-        **common_es_client_config,
+        **_client_config(context),
     )
     wait_for_client(reporting_es_client)
     return reporting_es_client
 
 
-def wait_for_client(client: Elasticsearch):
+class ClusterAuthenticationError(RuntimeError):
+    pass
+
+
+class ClusterUnavailableError(RuntimeError):
+    pass
+
+
+def wait_for_client(
+    client: Elasticsearch,
+    deadline: float = 60,
+    initial_backoff: float = 0.5,
+    max_backoff: float = 10,
+):
+    """
+    Wait until the cluster responds, retrying with jittered exponential
+    backoff for up to `deadline` seconds.
+
+    Raises a ClusterAuthenticationError straight away if the cluster rejects
+    the client's credentials, or a ClusterUnavailableError if it can't be
+    reached before the deadline.
+    """
+    give_up_at = monotonic() + deadline
+    backoff = initial_backoff
     while True:
         try:
-            client.ping()
-            break
-        except Exception:
-            sleep(3)
+            client.options(
+                max_retries=0, request_timeout=max(1, give_up_at - monotonic())
+            ).info()
+            return
+        except AuthenticationException as error:
+            raise ClusterAuthenticationError(
+                "The cluster rejected the client's credentials. Check the "
+                "secrets it was configured with."
+            ) from error
+        except AuthorizationException:
+            # The credentials are valid but can't read cluster info, which
+            # is enough to know the cluster is up
+            return
+        except (ApiError, TransportError) as error:
+            remaining = give_up_at - monotonic()
+            if remaining <= 0:
+                raise ClusterUnavailableError(
+                    f"The cluster didn't respond within {deadline} seconds"
+                ) from error
+            sleep(min(random.uniform(0, backoff), remaining))
+            backoff = min(backoff * 2, max_backoff)
+
+
+def warm_connections(client: Elasticsearch, connections: int):
+    """
+    Open several keep-alive connections to the cluster at once, so that
+    concurrent requests don't each pay for a TLS handshake
+    """
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        list(executor.map(lambda _: client.ping(), range(connections)))
+
+
+def scan_with_pit(
+    client: Elasticsearch,
+    index: str,
+    query: dict[str, Any],
+    source: Union[bool, dict[str, Any]] = False,
+    page_size: int = 5000,
+    keep_alive: str = "5m",
+    sort: Optional[list[dict[str, Any]]] = None,
+    search_after: Optional[list[Any]] = None,
+    pit_id: Optional[str] = None,
+) -> Iterator[list[dict[str, Any]]]:
+    """
+    Yields every document matching a query, a page at a time.
+
+    Pages are read from a point in time with `search_after`, so the results
+    are consistent even if the index changes while they're read, and each
+    page costs the same however deep into the results it is. The point in
+    time is closed when the iteration finishes or is abandoned.
+
+    To read several slices of an index from one point in time, open it
+    separately and pass its `pit_id`; it's left open for the caller to
+    close. A scan can be resumed from the `sort` values of the last hit it
+    yielded with `search_after`, as long as the sort is on fields which
+    don't depend on the point in time (unlike the default, `_shard_doc`).
+    """
+    owns_pit = pit_id is None
+    if pit_id is None:
+        pit_id = client.open_point_in_time(index=index, keep_alive=keep_alive)[
+            "id"
+        ]
+    try:
+        while True:
+            response = client.search(
+                pit={"id": pit_id, "keep_alive": keep_alive},
+                query=query,
+                # _shard_doc is the cheapest sort order to page through
+                sort=sort or [{"_shard_doc": "asc"}],
+                search_after=search_after,
+                size=page_size,
+                source=source,
+                track_total_hits=False,
+            )
+            pit_id = response.get("pit_id", pit_id)
+            hits = response["hits"]["hits"]
+            if not hits:
+                return
+            yield hits
+            search_after = hits[-1]["sort"]
+    finally:
+        if owns_pit:
+            client.close_point_in_time(id=pit_id)
 
 
 def _get_index_name(
@@ -0,0 +1,807 @@
+"""
+An in-process search engine, which can stand in for an Elasticsearch client
+when running relevance tests against a corpus of exported documents.
+
+Documents are indexed according to a saved index config (the mappings and
+the analysis settings), into an inverted index which is scored with BM25,
+like Lucene. Only the subset of the query DSL used by our query templates
+is supported: `bool`, `match`, `multi_match`, `match_phrase`, `term`,
+`terms`, `range`, `ids`, `exists`, `dis_max`, `constant_score`, `nested`
+and `match_all`. Other queries raise an `UnsupportedQueryError`.
+
+Scores are close to Elasticsearch's but not identical: Elasticsearch
+calculates term statistics per shard and stores field lengths lossily, and
+some analysis steps are approximated (see `analysis.py`). Tests which
+depend on small differences in score may rank differently.
+"""
+
+import fnmatch
+import math
+import operator
+import statistics
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from time import perf_counter
+from typing import Any, Optional
+
+from .analysis import Analysis, Analyzer
+
+# Lucene's default BM25 parameters
+k1 = 1.2
+b = 0.75
+
+# The gap left between the positions of the values of a multi-valued field,
+# so that phrases don't match across them
+position_increment_gap = 100
+
+range_comparisons = {
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+# How a nested query combines the scores of a document's matching objects
+nested_score_modes: dict[str, Callable[[list[float]], float]] = {
+    "avg": statistics.fmean,
+    "max": max,
+    "min": min,
+    "sum": math.fsum,
+    "none": lambda scores: 0.0,
+}
+
+# Field types which are indexed as exact values, rather than analyzed text
+exact_types = {
+    "keyword",
+    "constant_keyword",
+    "boolean",
+    "date",
+    "long",
+    "integer",
+    "short",
+    "byte",
+    "double",
+    "float",
+}
+
+Scores = dict[int, float]
+
+
+class UnsupportedQueryError(ValueError):
+    pass
+
+
+class FieldIndex:
+    """The postings and field lengths of one indexed field"""
+
+    def __init__(
+        self,
+        source_path: list[str],
+        analyzer: Analyzer,
+        search_analyzer: Analyzer,
+        exact: bool = False,
+    ):
+        self.source_path = source_path
+        self.analyzer = analyzer
+        self.search_analyzer = search_analyzer
+        # Exact fields aren't normalised by length, like keywords in Lucene
+        self.exact = exact
+        # the positions of each term in each document
+        self.postings: dict[str, dict[int, list[int]]] = defaultdict(dict)
+        # the number of tokens in each document with a value for the field
+        self.lengths: dict[int, int] = {}
+        self.total_length = 0
+
+    def add(self, doc: int, values: list[str]):
+        position = 0
+        for value in values:
+            tokens = self.analyzer.analyze(value)
+            for term, token_position in tokens:
+                self.postings[term].setdefault(doc, []).append(
+                    position + token_position
+                )
+            if tokens:
+                position += tokens[-1][1] + position_increment_gap
+            self.lengths[doc] = self.lengths.get(doc, 0) + len(tokens)
+            self.total_length += len(tokens)
+
+    def idf(self, term: str) -> float:
+        doc_freq = len(self.postings.get(term, {}))
+        doc_count = len(self.lengths)
+        return math.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def term_frequency_score(self, doc: int, freq: float) -> float:
+        if self.exact:
+            return freq / (freq + k1)
+        average_length = self.total_length / len(self.lengths)
+        norm = k1 * (1 - b + b * self.lengths[doc] / average_length)
+        return freq / (freq + norm)
+
+    def term_scores(self, term: str, boost: float = 1.0) -> Scores:
+        postings = self.postings.get(term)
+        if not postings:
+            return {}
+        weight = self.idf(term) * boost
+        return {
+            doc: weight * self.term_frequency_score(doc, len(positions))
+            for doc, positions in postings.items()
+        }
+
+
+def minimum_should_match(optional_clauses: int, spec: Any) -> int:
+    """
+    The number of optional clauses which must match, given a
+    `minimum_should_match` parameter like `2`, `-1`, `75%` or `3<90%`
+    """
+    spec = str(spec).strip()
+    if "<" in spec:
+        conditions = sorted(
+            (int(threshold), value)
+            for threshold, value in (
+                condition.split("<") for condition in spec.split()
+            )
+        )
+        required = optional_clauses
+        for threshold, value in conditions:
+            if optional_clauses > threshold:
+                required = minimum_should_match(optional_clauses, value)
+        return required
+    if spec.endswith("%"):
+        count = int(optional_clauses * float(spec[:-1]) / 100)
+    else:
+        count = int(spec)
+    if count < 0:
+        count += optional_clauses
+    return min(max(count, 0), optional_clauses)
+
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def source_values(source: Any, path: list[str]) -> list[Any]:
+    """The values at a dotted path in a document, flattening any arrays"""
+    if isinstance(source, list):
+        return [value for item in source for value in source_values(item, path)]
+    if not path:
+        return [] if source is None else [source]
+    if not isinstance(source, dict):
+        return []
+    if path[0] in source:
+        return source_values(source[path[0]], path[1:])
+    # Sources can also use dotted keys for nested properties
+    for length in range(2, len(path) + 1):
+        key = ".".join(path[:length])
+        if key in source:
+            return source_values(source[key], path[length:])
+    return []
+
+
+def _nest(path: str, value: dict[str, Any]) -> dict[str, Any]:
+    """A nested object, under its full path like it is in its parent"""
+    for key in reversed(path.split(".")):
+        value = {key: value}
+    return value
+
+
+def _exact_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+class LocalIndex:
+    """
+    An inverted index of documents, searchable with a subset of the
+    Elasticsearch query DSL
+    """
+
+    def __init__(self, config: dict[str, Any]):
+        self.settings = config.get("settings", {})
+        self.analysis = Analysis(self.settings)
+        self.fields: dict[str, FieldIndex] = {}
+        self.copy_to: dict[str, list[str]] = defaultdict(list)
+        # Each nested field's objects are indexed separately, like the hidden
+        # documents Elasticsearch makes for them, along with the parent
+        # document of each object
+        self.nested: dict[str, LocalIndex] = {}
+        self.nested_parents: dict[str, list[int]] = {}
+        self._add_fields(config.get("mappings", {}).get("properties", {}))
+        self.ids: list[str] = []
+        self.sources: list[dict[str, Any]] = []
+        self.docs_by_id: dict[str, int] = {}
+
+    def _add_fields(self, properties: dict[str, Any], prefix: str = ""):
+        for name, mapping in properties.items():
+            path = f"{prefix}{name}"
+            if mapping.get("type") == "nested":
+                nested = LocalIndex({"settings": self.settings})
+                nested._add_fields(mapping.get("properties", {}), f"{path}.")
+                self.nested[path] = nested
+                self.nested_parents[path] = []
+            if "properties" in mapping:
+                self._add_fields(mapping["properties"], prefix=f"{path}.")
+                continue
+            source_path = path.split(".")
+            self._add_field(path, source_path, mapping)
+            for subfield, sub_mapping in mapping.get("fields", {}).items():
+                self._add_field(f"{path}.{subfield}", source_path, sub_mapping)
+            for target in _as_list(mapping.get("copy_to")):
+                self.copy_to[target].append(path)
+
+    def _add_field(
+        self, path: str, source_path: list[str], mapping: dict[str, Any]
+    ):
+        field_type = mapping.get("type", "object")
+        if mapping.get("index") is False:
+            return
+        if field_type in ("text", "match_only_text", "search_as_you_type"):
+            analyzer = self.analysis.analyzer(
+                mapping.get("analyzer", "standard")
+            )
+            search_analyzer = self.analysis.analyzer(
+                mapping.get(
+                    "search_analyzer",
+                    mapping.get("analyzer", "standard"),
+                )
+            )
+            self.fields[path] = FieldIndex(
+                source_path, analyzer, search_analyzer
+            )
+        elif field_type in exact_types:
+            normalizer = self.analysis.normalizer(mapping.get("normalizer"))
+            self.fields[path] = FieldIndex(
+                source_path, normalizer, normalizer, exact=True
+            )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, document_id: str, source: dict[str, Any]):
+        doc = len(self.ids)
+        self.ids.append(document_id)
+        self.sources.append(source)
+        self.docs_by_id[document_id] = doc
+        for path, field in self.fields.items():
+            values = source_values(source, field.source_path)
+            for copied_from in self.copy_to.get(path, []):
+                values += source_values(source, copied_from.split("."))
+            if values:
+                field.add(doc, [_exact_value(value) for value in values])
+        for path, nested in self.nested.items():
+            for value in source_values(source, path.split(".")):
+                if isinstance(value, dict):
+                    nested.add(document_id, _nest(path, value))
+                    self.nested_parents[path].append(doc)
+
+    def _field_boosts(self, fields: list[str]) -> list[tuple[str, float]]:
+        boosts = []
+        for field in fields:
+            name, _, boost = field.partition("^")
+            for path in fnmatch.filter(self.fields, name):
+                boosts.append((path, float(boost) if boost else 1.0))
+        return boosts
+
+    def evaluate(self, query: dict[str, Any]) -> Scores:
+        """The score of every document which matches a query"""
+        if len(query) != 1:
+            raise UnsupportedQueryError(f"Malformed query: {query}")
+        ((kind, params),) = query.items()
+        method = getattr(self, f"_{kind}_query", None)
+        if method is None:
+            raise UnsupportedQueryError(
+                f"The {kind} query isn't supported by the local search engine"
+            )
+        return method(params)
+
+    def _match_all_query(self, params: dict[str, Any]) -> Scores:
+        boost = params.get("boost", 1.0)
+        return {doc: boost for doc in range(len(self.ids))}
+
+    def _match_none_query(self, params: dict[str, Any]) -> Scores:
+        return {}
+
+    def _ids_query(self, params: dict[str, Any]) -> Scores:
+        boost = params.get("boost", 1.0)
+        return {
+            self.docs_by_id[document_id]: boost
+            for document_id in params["values"]
+            if document_id in self.docs_by_id
+        }
+
+    def _exists_query(self, params: dict[str, Any]) -> Scores:
+        boost = params.get("boost", 1.0)
+        return {
+            doc: boost
+            for path, _ in self._field_boosts([params["field"]])
+            for doc in self.fields[path].lengths
+        }
+
+    def _term_query(self, params: dict[str, Any]) -> Scores:
+        ((field, value),) = params.items()
+        if isinstance(value, dict):
+            value = value["value"]
+            boost = params[field].get("boost", 1.0)
+        else:
+            boost = 1.0
+        return self._terms_query({field: [value], "boost": boost})
+
+    def _terms_query(self, params: dict[str, Any]) -> Scores:
+        # Term-level queries match exact values, and are constant scoring
+        boost = params.get("boost", 1.0)
+        ((field, values),) = (
+            (key, value) for key, value in params.items() if key != "boost"
+        )
+        if field == "_id":
+            return self._ids_query({"values": values, "boost": boost})
+        index = self.fields.get(field)
+        if index is None:
+            return {}
+        return {
+            doc: boost
+            for value in values
+            for doc in index.postings.get(_exact_value(value), {})
+        }
+
+    def _range_query(self, params: dict[str, Any]) -> Scores:
+        # Ranges are compared with the source values, rather than indexed
+        ((field, bounds),) = params.items()
+        boost = bounds.get("boost", 1.0)
+        index = self.fields.get(field)
+        path = index.source_path if index else field.split(".")
+        comparisons = [
+            (compare, bounds[key])
+            for key, compare in range_comparisons.items()
+            if bounds.get(key) is not None
+        ]
+        scores: Scores = {}
+        for doc, source in enumerate(self.sources):
+            for value in source_values(source, path):
+                try:
+                    if all(
+                        compare(value, bound) for compare, bound in comparisons
+                    ):
+                        scores[doc] = boost
+                        break
+                except TypeError:
+                    raise UnsupportedQueryError(
+                        f"Can't compare {value!r} in {field} with the bounds "
+                        f"of a range query: {bounds}"
+                    )
+        return scores
+
+    def _match_query(self, params: dict[str, Any]) -> Scores:
+        ((field, options),) = params.items()
+        if not isinstance(options, dict):
+            options = {"query": options}
+        index = self.fields.get(field)
+        if index is None:
+            return {}
+        boost = options.get("boost", 1.0)
+        terms = index.search_analyzer.terms(str(options["query"]))
+        return self._combine_terms(
+            [index.term_scores(term, boost) for term in terms],
+            operator=options.get("operator", "or"),
+            spec=options.get("minimum_should_match"),
+        )
+
+    def _combine_terms(
+        self, term_scores: list[Scores], operator: str, spec: Any
+    ) -> Scores:
+        """Sum the scores of the terms of a match query, if enough match"""
+        if not term_scores:
+            return {}
+        if operator.lower() == "and":
+            required = len(term_scores)
+        elif spec is not None:
+            required = max(1, minimum_should_match(len(term_scores), spec))
+        else:
+            required = 1
+        totals: Scores = defaultdict(float)
+        matches: dict[int, int] = defaultdict(int)
+        for scores in term_scores:
+            for doc, score in scores.items():
+                totals[doc] += score
+                matches[doc] += 1
+        return {
+            doc: score
+            for doc, score in totals.items()
+            if matches[doc] >= required
+        }
+
+    def _match_phrase_query(self, params: dict[str, Any]) -> Scores:
+        ((field, options),) = params.items()
+        if not isinstance(options, dict):
+            options = {"query": options}
+        index = self.fields.get(field)
+        if index is None:
+            return {}
+        return self._phrase_scores(
+            index,
+            str(options["query"]),
+            slop=options.get("slop", 0),
+            boost=options.get("boost", 1.0),
+        )
+
+    def _phrase_scores(
+        self, index: FieldIndex, text: str, slop: int, boost: float
+    ) -> Scores:
+        tokens = index.search_analyzer.analyze(text)
+        if not tokens:
+            return {}
+        # Tokens at the same position (eg synonyms) are alternatives
+        alternatives: dict[int, list[str]] = defaultdict(list)
+        for term, position in tokens:
+            alternatives[position - tokens[0][1]].append(term)
+        offsets = sorted(alternatives)
+
+        candidates: Optional[set[int]] = None
+        for offset in offsets:
+            docs = {
+                doc
+                for term in alternatives[offset]
+                for doc in index.postings.get(term, {})
+            }
+            candidates = docs if candidates is None else candidates & docs
+        if not candidates:
+            return {}
+
+        weight = boost * sum(
+            max(index.idf(term) for term in alternatives[offset])
+            for offset in offsets
+        )
+        scores: Scores = {}
+        for doc in candidates:
+            positions = [
+                set().union(
+                    *(
+                        index.postings[term].get(doc, [])
+                        for term in alternatives[offset]
+                        if term in index.postings
+                    )
+                )
+                for offset in offsets
+            ]
+            # Sloppy phrases are approximated by allowing each term to be up
+            # to `slop` positions from where it would be in an exact phrase
+            freq = sum(
+                all(
+                    any(
+                        start + offset + shift in term_positions
+                        for shift in range(-slop, slop + 1)
+                    )
+                    for offset, term_positions in zip(
+                        offsets[1:], positions[1:]
+                    )
+                )
+                for start in positions[0]
+            )
+            if freq:
+                scores[doc] = weight * index.term_frequency_score(doc, freq)
+        return scores
+
+    def _multi_match_query(self, params: dict[str, Any]) -> Scores:
+        text = str(params["query"])
+        match_type = params.get("type", "best_fields")
+        boost = params.get("boost", 1.0)
+        operator = params.get("operator", "or")
+        spec = params.get("minimum_should_match")
+        fields = self._field_boosts(params.get("fields", ["*"]))
+
+        per_field: list[Scores]
+        if match_type in ("phrase", "phrase_prefix"):
+            per_field = [
+                self._phrase_scores(
+                    self.fields[path],
+                    text,
+                    slop=params.get("slop", 0),
+                    boost=field_boost,
+                )
+                for path, field_boost in fields
+            ]
+        elif match_type == "cross_fields":
+            # Fields are searched as if they were one big field, so each term
+            # only needs to match in one of them. Fields with different
+            # analyzers produce different terms, so they're grouped by
+            # analyzer, and the best group wins.
+            groups: dict[int, list[tuple[str, float]]] = defaultdict(list)
+            for path, field_boost in fields:
+                groups[id(self.fields[path].search_analyzer)].append(
+                    (path, field_boost)
+                )
+            per_field = []
+            for group in groups.values():
+                analyzer = self.fields[group[0][0]].search_analyzer
+                term_scores = []
+                for term in analyzer.terms(text):
+                    best: Scores = {}
+                    for path, field_boost in group:
+                        for doc, score in (
+                            self.fields[path].term_scores(term, field_boost)
+                        ).items():
+                            best[doc] = max(score, best.get(doc, 0.0))
+                    term_scores.append(best)
+                per_field.append(
+                    self._combine_terms(term_scores, operator, spec)
+                )
+        else:
+            per_field = [
+                self._combine_terms(
+                    [
+                        self.fields[path].term_scores(term, field_boost)
+                        for term in self.fields[path].search_analyzer.terms(
+                            text
+                        )
+                    ],
+                    operator,
+                    spec,
+                )
+                for path, field_boost in fields
+            ]
+
+        if match_type == "most_fields":
+            combined = self._sum(per_field)
+        else:
+            combined = self._dis_max(
+                per_field, tie_breaker=params.get("tie_breaker", 0.0)
+            )
+        return {doc: score * boost for doc, score in combined.items()}
+
+    @staticmethod
+    def _sum(all_scores: list[Scores]) -> Scores:
+        totals: Scores = defaultdict(float)
+        for scores in all_scores:
+            for doc, score in scores.items():
+                totals[doc] += score
+        return dict(totals)
+
+    @staticmethod
+    def _dis_max(all_scores: list[Scores], tie_breaker: float) -> Scores:
+        best: Scores = {}
+        totals: Scores = defaultdict(float)
+        for scores in all_scores:
+            for doc, score in scores.items():
+                best[doc] = max(score, best.get(doc, 0.0))
+                totals[doc] += score
+        return {
+            doc: score + tie_breaker * (totals[doc] - score)
+            for doc, score in best.items()
+        }
+
+    def _dis_max_query(self, params: dict[str, Any]) -> Scores:
+        combined = self._dis_max(
+            [self.evaluate(query) for query in params["queries"]],
+            tie_breaker=params.get("tie_breaker", 0.0),
+        )
+        boost = params.get("boost", 1.0)
+        return {doc: score * boost for doc, score in combined.items()}
+
+    def _constant_score_query(self, params: dict[str, Any]) -> Scores:
+        boost = params.get("boost", 1.0)
+        return {doc: boost for doc in self.evaluate(params["filter"])}
+
+    def _nested_query(self, params: dict[str, Any]) -> Scores:
+        # The query matches each nested object on its own, and the scores of
+        # a document's matching objects are combined by the score mode
+        path = params["path"]
+        nested = self.nested.get(path)
+        if nested is None:
+            if params.get("ignore_unmapped"):
+                return {}
+            raise UnsupportedQueryError(f"{path} isn't a nested field")
+        parents = self.nested_parents[path]
+        object_scores: dict[int, list[float]] = defaultdict(list)
+        for obj, score in nested.evaluate(params["query"]).items():
+            object_scores[parents[obj]].append(score)
+        score_mode = params.get("score_mode", "avg")
+        combine = nested_score_modes.get(score_mode)
+        if combine is None:
+            raise UnsupportedQueryError(f"Unknown score mode: {score_mode}")
+        boost = params.get("boost", 1.0)
+        return {
+            doc: combine(scores) * boost
+            for doc, scores in object_scores.items()
+        }
+
+    def _bool_query(self, params: dict[str, Any]) -> Scores:
+        must = _as_list(params.get("must"))
+        should = _as_list(params.get("should"))
+        filters = _as_list(params.get("filter"))
+        must_not = _as_list(params.get("must_not"))
+
+        matches: Optional[Scores] = None
+        for query in must:
+            scores = self.evaluate(query)
+            matches = (
+                scores
+                if matches is None
+                else {
+                    doc: score + scores[doc]
+                    for doc, score in matches.items()
+                    if doc in scores
+                }
+            )
+        for query in filters:
+            scores = self.evaluate(query)
+            matches = (
+                dict.fromkeys(scores, 0.0)
+                if matches is None
+                else {
+                    doc: score
+                    for doc, score in matches.items()
+                    if doc in scores
+                }
+            )
+
+        should_scores = [self.evaluate(query) for query in should]
+        if "minimum_should_match" in params:
+            required = minimum_should_match(
+                len(should), params["minimum_should_match"]
+            )
+        else:
+            required = 0 if must or filters else 1
+        if matches is None:
+            if should:
+                # A bool query of should clauses alone matches nothing unless
+                # at least one of them does
+                required = max(required, 1)
+                matches = {
+                    doc: 0.0 for scores in should_scores for doc in scores
+                }
+            else:
+                matches = self._match_all_query({"boost": 0.0})
+
+        if should_scores:
+            scored = {}
+            for doc, score in matches.items():
+                matched = [
+                    scores[doc] for scores in should_scores if doc in scores
+                ]
+                if len(matched) >= required:
+                    scored[doc] = score + sum(matched)
+            matches = scored
+
+        for query in must_not:
+            for doc in self.evaluate(query):
+                matches.pop(doc, None)
+
+        boost = params.get("boost", 1.0)
+        return {doc: score * boost for doc, score in matches.items()}
+
+    def _sort_value(self, doc: int, field: str) -> Any:
+        if field == "_id":
+            return self.ids[doc]
+        index = self.fields.get(field)
+        path = index.source_path if index else field.split(".")
+        values = source_values(self.sources[doc], path)
+        return min(values) if values else None
+
+    def search(
+        self,
+        query: Optional[dict[str, Any]] = None,
+        size: int = 10,
+        from_: int = 0,
+        sort: Optional[list[Any]] = None,
+    ) -> tuple[int, list[tuple[int, float, list[Any]]]]:
+        """
+        Returns the number of matching documents, and the requested page of
+        them as (doc, score, sort values), in order
+        """
+        scores = self.evaluate(query or {"match_all": {}})
+        docs = sorted(scores)
+        sort_fields: list[tuple[str, str]] = []
+        for clause in sort or [{"_score": "desc"}]:
+            if isinstance(clause, str):
+                clause = {clause: "desc" if clause == "_score" else "asc"}
+            ((field, order),) = clause.items()
+            if isinstance(order, dict):
+                order = order.get("order", "asc")
+            sort_fields.append((field, order))
+
+        # Sort by each field in turn, from the least significant, relying on
+        # the sort being stable. Missing values sort last.
+        for field, order in reversed(sort_fields):
+            reverse = order == "desc"
+            if field == "_score":
+                docs.sort(key=scores.__getitem__, reverse=reverse)
+            else:
+                values = {doc: self._sort_value(doc, field) for doc in docs}
+                docs.sort(
+                    key=lambda doc: (
+                        (values[doc] is None) != reverse,
+                        values[doc] if values[doc] is not None else "",
+                    ),
+                    reverse=reverse,
+                )
+
+        page = [
+            (
+                doc,
+                scores[doc],
+                [
+                    scores[doc]
+                    if field == "_score"
+                    else self._sort_value(doc, field)
+                    for field, _ in sort_fields
+                ],
+            )
+            for doc in docs[from_ : from_ + size]
+        ]
+        return len(docs), page
+
+
+def build_local_index(
+    config: dict[str, Any], documents: Iterable[dict[str, Any]]
+) -> LocalIndex:
+    index = LocalIndex(config)
+    for document in documents:
+        index.add(document["_id"], document.get("_source", {}))
+    return index
+
+
+class LocalSearchClient:
+    """
+    Serves searches from a `LocalIndex`, in place of an Elasticsearch
+    client. Every search is run against the local index, whatever index
+    name it asks for.
+    """
+
+    def __init__(self, index: LocalIndex):
+        self._index = index
+
+    def search(self, index: str, **body: Any) -> dict[str, Any]:
+        start = perf_counter()
+        total, page = self._index.search(
+            query=body.get("query"),
+            size=body.get("size", 10),
+            from_=body.get("from_", body.get("from", 0)),
+            sort=body.get("sort"),
+        )
+        include_source = body.get("_source", body.get("source", True))
+        hits = []
+        for doc, score, sort_values in page:
+            hit: dict[str, Any] = {
+                "_index": index,
+                "_id": self._index.ids[doc],
+                "_score": score,
+            }
+            if include_source is not False:
+                hit["_source"] = self._index.sources[doc]
+            if "sort" in body:
+                hit["sort"] = sort_values
+            hits.append(hit)
+        return {
+            "took": round((perf_counter() - start) * 1000),
+            "timed_out": False,
+            "hits": {
+                "total": {"value": total, "relation": "eq"},
+                "max_score": max((hit["_score"] for hit in hits), default=None),
+                "hits": hits,
+            },
+        }
+
+    def count(
+        self,
+        index: str,
+        query: Optional[dict[str, Any]] = None,
+        min_score: Optional[float] = None,
+    ) -> dict[str, Any]:
+        scores = self._index.evaluate(query or {"match_all": {}})
+        if min_score is None:
+            return {"count": len(scores)}
+        return {
+            "count": sum(1 for score in scores.values() if score >= min_score)
+        }
+
+    def msearch(self, searches: list[dict[str, Any]]) -> dict[str, Any]:
+        responses: list[dict[str, Any]] = []
+        for header, body in zip(searches[::2], searches[1::2]):
+            try:
+                responses.append(self.search(index=header["index"], **body))
+            except UnsupportedQueryError as error:
+                responses.append(
+                    {"error": {"reason": str(error)}, "status": 400}
+                )
+        return {"responses": responses}
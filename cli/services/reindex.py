@@ -0,0 +1,198 @@
+import hashlib
+import json
+from typing import Any, NamedTuple, Optional
+
+from elasticsearch import Elasticsearch
+
+
+def sample_slice_boundaries(
+    client: Elasticsearch,
+    index: str,
+    field: str,
+    slices: int,
+    sample_size: int = 2000,
+) -> list[Any]:
+    """
+    Returns the values of a field which split an index into `slices` ranges
+    of roughly equal numbers of documents, estimated from a random sample
+    """
+    response = client.search(
+        index=index,
+        query={
+            "function_score": {
+                "query": {"exists": {"field": field}},
+                "random_score": {"seed": 0, "field": "_seq_no"},
+            }
+        },
+        docvalue_fields=[{"field": field}],
+        source=False,
+        size=sample_size,
+    )
+    values = sorted(
+        hit["fields"][field][0]
+        for hit in response["hits"]["hits"]
+        if hit.get("fields", {}).get(field)
+    )
+    if not values:
+        return []
+    boundaries = [values[len(values) * i // slices] for i in range(1, slices)]
+    # Repeated values would make empty slices
+    return sorted(set(boundaries))
+
+
+def slice_queries(field: str, boundaries: list[Any]) -> list[dict[str, Any]]:
+    """
+    Returns a query for each of the ranges of a field between the
+    boundaries. Between them, the queries match every document exactly
+    once, including documents without the field, which go in the first
+    slice.
+    """
+    lower_bounds: list[Optional[Any]] = [None, *boundaries]
+    upper_bounds: list[Optional[Any]] = [*boundaries, None]
+    queries: list[dict[str, Any]] = []
+    for lower, upper in zip(lower_bounds, upper_bounds):
+        bounds: dict[str, Any] = {}
+        if lower is not None:
+            bounds["gte"] = lower
+        if upper is not None:
+            bounds["lt"] = upper
+        if not bounds:
+            queries.append({"match_all": {}})
+        elif lower is None:
+            queries.append(
+                {
+                    "bool": {
+                        "should": [
+                            {"range": {field: bounds}},
+                            {
+                                "bool": {
+                                    "must_not": {"exists": {"field": field}}
+                                }
+                            },
+                        ]
+                    }
+                }
+            )
+        else:
+            queries.append({"range": {field: bounds}})
+    return queries
+
+
+class SearchLoad(NamedTuple):
+    # the mean time taken by searches since the last sample
+    latency_ms: float
+    # the number of searches waiting for a search thread right now
+    queue: int
+    # the number of searches rejected since the last sample
+    rejected: int
+
+
+class SearchLoadMonitor:
+    """
+    Measures how busy a cluster is serving searches, from its node stats.
+    Each sample covers the time since the previous one.
+    """
+
+    def __init__(self, client: Elasticsearch):
+        self._client = client
+        self._previous = self._totals()
+
+    def _totals(self) -> tuple[int, int, int, int]:
+        nodes = self._client.nodes.stats(
+            metric="indices,thread_pool", index_metric="search"
+        )["nodes"]
+        query_total = query_time = rejected = queue = 0
+        for node in nodes.values():
+            search = node["indices"]["search"]
+            query_total += search["query_total"]
+            query_time += search["query_time_in_millis"]
+            thread_pool = node["thread_pool"]["search"]
+            rejected += thread_pool["rejected"]
+            queue += thread_pool["queue"]
+        return query_total, query_time, rejected, queue
+
+    def sample(self) -> SearchLoad:
+        totals = self._totals()
+        queries = totals[0] - self._previous[0]
+        query_time = totals[1] - self._previous[1]
+        rejected = totals[2] - self._previous[2]
+        self._previous = totals
+        return SearchLoad(
+            latency_ms=query_time / queries if queries > 0 else 0.0,
+            queue=totals[3],
+            rejected=max(0, rejected),
+        )
+
+
+class AdaptiveThrottle:
+    """
+    Chooses a rate for background work on a cluster from how busy its
+    searches are. The rate is cut sharply as soon as searches slow down,
+    queue or are rejected, and raised gradually while they're healthy
+    (multiplicative increase, multiplicative decrease).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float,
+        max_rate: float,
+        max_latency_ms: float,
+        max_queue: int,
+        increase: float = 1.25,
+        decrease: float = 0.5,
+    ):
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_latency_ms = max_latency_ms
+        self.max_queue = max_queue
+        self.increase = increase
+        self.decrease = decrease
+
+    def update(self, load: SearchLoad) -> float:
+        if (
+            load.latency_ms > self.max_latency_ms
+            or load.queue > self.max_queue
+            or load.rejected > 0
+        ):
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+        else:
+            self.rate = min(self.max_rate, self.rate * self.increase)
+        return self.rate
+
+
+def config_marker(name: str, config: dict[str, Any]) -> str:
+    """
+    A marker for documents updated with an index config: its name and a
+    hash of its contents. Editing the config changes the marker, so
+    documents updated with an earlier version aren't skipped.
+    """
+    digest = hashlib.sha256(
+        json.dumps(config, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return f"{name}-{digest[:12]}"
+
+
+def resumable_update(
+    query: Optional[dict[str, Any]], marker_field: str, marker: str
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """
+    Returns the query and script for an update by query which marks every
+    document it updates, and only matches documents which aren't marked yet.
+    If the update is stopped part way through, running it again with the
+    same marker carries on with the documents it hadn't reached.
+    """
+    return (
+        {
+            "bool": {
+                "filter": [query or {"match_all": {}}],
+                "must_not": [{"term": {marker_field: marker}}],
+            }
+        },
+        {
+            "source": "ctx._source[params.field] = params.marker",
+            "lang": "painless",
+            "params": {"field": marker_field, "marker": marker},
+        },
+    )
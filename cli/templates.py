@@ -0,0 +1,110 @@
+import json
+import re
+from collections.abc import Callable
+from typing import Any, Optional
+
+import chevron
+
+# Matches the mustache tags which insert the search terms into a template:
+# {{query}}, {{{query}}} and {{& query}}
+query_tag = re.compile(r"\{\{\{\s*query\s*\}\}\}|\{\{&?\s*query\s*\}\}")
+
+Renderer = Callable[[str], Any]
+
+
+class QueryTemplate:
+    """
+    A search template, compiled once so that it can be rendered cheaply for
+    many sets of search terms.
+
+    Rather than rendering the whole template as text and parsing the result
+    as JSON for every search, the template is parsed once and the positions
+    of the `{{query}}` tags are recorded. Rendering builds new containers
+    along the paths to those positions, and shares every other part of the
+    template, so the rendered queries should be treated as read-only.
+
+    Search terms are inserted as JSON string values, so they never need
+    escaping. This matches the way Elasticsearch renders search templates
+    for the catalogue API. Templates which use any other mustache tags fall
+    back to a full render with chevron.
+    """
+
+    def __init__(self, template: dict):
+        self.template = template
+        try:
+            self._renderer = _compile(template)
+        except ValueError:
+            self._renderer = self._render_with_chevron
+            self._template_string = json.dumps(template)
+
+    def render(self, search_terms: str) -> dict:
+        if self._renderer is None:
+            return self.template
+        return self._renderer(search_terms)
+
+    def _render_with_chevron(self, search_terms: str) -> dict:
+        rendered = chevron.render(
+            self._template_string, {"query": search_terms}
+        )
+        return json.loads(rendered)
+
+
+def _compile(node: Any) -> Optional[Renderer]:
+    """
+    Returns a function which renders `node` for some search terms, or None if
+    `node` doesn't contain any query tags and can be reused as it is
+    """
+    if isinstance(node, str):
+        return _compile_string(node)
+    if isinstance(node, dict):
+        return _compile_dict(node)
+    if isinstance(node, list):
+        return _compile_list(node)
+    return None
+
+
+def _compile_string(node: str) -> Optional[Renderer]:
+    literals = query_tag.split(node)
+    if any("{{" in literal for literal in literals):
+        raise ValueError(f"Unsupported mustache tag in {node!r}")
+    if len(literals) == 1:
+        return None
+    return lambda search_terms: search_terms.join(literals)
+
+
+def _compile_dict(node: dict) -> Optional[Renderer]:
+    if any("{{" in key for key in node):
+        raise ValueError(f"Unsupported mustache tag in {list(node)!r}")
+    renderers = [
+        (key, renderer)
+        for key, value in node.items()
+        if (renderer := _compile(value)) is not None
+    ]
+    if not renderers:
+        return None
+
+    def render(search_terms: str) -> dict:
+        rendered = dict(node)
+        for key, renderer in renderers:
+            rendered[key] = renderer(search_terms)
+        return rendered
+
+    return render
+
+
+def _compile_list(node: list) -> Optional[Renderer]:
+    renderers = [
+        (i, renderer)
+        for i, value in enumerate(node)
+        if (renderer := _compile(value)) is not None
+    ]
+    if not renderers:
+        return None
+
+    def render(search_terms: str) -> list:
+        rendered = list(node)
+        for i, renderer in renderers:
+            rendered[i] = renderer(search_terms)
+        return rendered
+
+    return render
@@ -0,0 +1,275 @@
+import fnmatch
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from .services.local_search import source_values
+
+text_types = ("text", "match_only_text", "search_as_you_type")
+match_queries = (
+    "match",
+    "match_phrase",
+    "match_phrase_prefix",
+    "match_bool_prefix",
+)
+multi_field_queries = ("multi_match", "query_string", "simple_query_string")
+
+# Elasticsearch analyses an array of texts as one stream, leaving a gap of
+# one character between the offsets of consecutive texts
+offset_gap = 1
+
+
+@dataclass(frozen=True)
+class TextField:
+    """An analysed field, and where its values come from in a document"""
+
+    source_paths: tuple[str, ...]
+    # None means the index's default analyzer
+    analyzer: Optional[str] = None
+    search_analyzer: Optional[str] = None
+
+
+@dataclass
+class TokenMatch:
+    """How close a document's field comes to containing some search terms"""
+
+    field: Optional[str]
+    # the search terms' tokens which aren't among the field's tokens
+    missing: list[str]
+
+
+def query_fields(query: Any) -> list[str]:
+    """The names of the fields which a query searches, without boosts"""
+    fields: list[str] = []
+    if isinstance(query, list):
+        for item in query:
+            fields += query_fields(item)
+    elif isinstance(query, dict):
+        for key, value in query.items():
+            if key in multi_field_queries and isinstance(value, dict):
+                fields += value.get("fields", [])
+            elif key in match_queries and isinstance(value, dict):
+                fields += list(value)
+            else:
+                fields += query_fields(value)
+    return list(dict.fromkeys(name.partition("^")[0] for name in fields))
+
+
+def text_fields(
+    properties: dict[str, Any], prefix: str = ""
+) -> dict[str, TextField]:
+    """The analysed fields in an index's mappings, including subfields"""
+    mappings: dict[str, tuple[str, dict[str, Any]]] = {}
+    copied_from: dict[str, list[str]] = defaultdict(list)
+
+    def collect(properties: dict[str, Any], prefix: str):
+        for name, mapping in properties.items():
+            path = f"{prefix}{name}"
+            if "properties" in mapping:
+                collect(mapping["properties"], f"{path}.")
+                continue
+            mappings[path] = (path, mapping)
+            for subfield, sub_mapping in mapping.get("fields", {}).items():
+                mappings[f"{path}.{subfield}"] = (path, sub_mapping)
+            copy_to = mapping.get("copy_to", [])
+            for target in copy_to if isinstance(copy_to, list) else [copy_to]:
+                copied_from[target].append(path)
+
+    collect(properties, prefix)
+    fields = {}
+    for name, (source_path, mapping) in mappings.items():
+        if mapping.get("type") not in text_types:
+            continue
+        analyzer = mapping.get("analyzer")
+        fields[name] = TextField(
+            # Subfields take the values copied to their parent field too
+            source_paths=(source_path, *copied_from.get(source_path, [])),
+            analyzer=analyzer,
+            search_analyzer=mapping.get("search_analyzer", analyzer),
+        )
+    return fields
+
+
+def _java_length(text: str) -> int:
+    """The length of a string in UTF-16 code units, as Elasticsearch counts"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+class TokenChecker:
+    """
+    Checks whether documents could match some search terms by comparing
+    tokens, without searching.
+
+    The search terms are analysed with the search analyzer of each field the
+    query searches, and the values of those fields in the expected documents
+    are analysed with the fields' index analyzers, using the cluster's
+    `_analyze` API. That's enough to validate a change to the index's
+    analysis (folding, stemming and so on) in a fraction of the time a full
+    search takes, though it says nothing about where a document would rank.
+
+    Texts are analysed in batched requests, and each analyzer's tokens for a
+    text are cached for the rest of the run. `prefetch` analyses everything
+    a test run needs up front, with one `_mget` for the expected documents
+    and a few `_analyze` requests per analyzer.
+    """
+
+    def __init__(
+        self,
+        *,
+        client,
+        index: str,
+        render_query: Callable[[str], dict],
+        max_request_chars: int = 10_000,
+    ):
+        self._client = client
+        self._index = index
+        self._render_query = render_query
+        self._max_request_chars = max_request_chars
+        self._fields: Optional[dict[str, TextField]] = None
+        # The source of each document, or None if it's not in the index
+        self._sources: dict[str, Optional[dict[str, Any]]] = {}
+        self._tokens: dict[tuple[Optional[str], str], list[str]] = {}
+
+    @property
+    def fields(self) -> dict[str, TextField]:
+        """The analysed fields which the query searches"""
+        if self._fields is None:
+            response = self._client.indices.get_mapping(index=self._index)
+            # The index may be an alias, so take whichever index it points to
+            mappings = next(iter(response.values()))["mappings"]
+            all_fields = text_fields(mappings.get("properties", {}))
+            names = query_fields(self._render_query("search terms"))
+            self._fields = {
+                name: all_fields[name]
+                for name in all_fields
+                if any(fnmatch.fnmatchcase(name, pattern) for pattern in names)
+            }
+        return self._fields
+
+    def prefetch(self, test_cases: Iterable[tuple[str, list[str]]]):
+        """
+        Analyses the search terms and expected documents of many test cases,
+        given as pairs of search terms and expected IDs
+        """
+        test_cases = list(test_cases)
+        self._fetch_sources(
+            {
+                doc_id
+                for _, expected_ids in test_cases
+                for doc_id in expected_ids
+            }
+        )
+        texts: dict[Optional[str], set[str]] = defaultdict(set)
+        for search_terms, expected_ids in test_cases:
+            for text_field in self.fields.values():
+                texts[text_field.search_analyzer].add(search_terms)
+                for doc_id in expected_ids:
+                    texts[text_field.analyzer].update(
+                        self._values(doc_id, text_field)
+                    )
+        for analyzer, analyzer_texts in texts.items():
+            self._analyze(analyzer, analyzer_texts)
+
+    def tokens(self, analyzer: Optional[str], text: str) -> list[str]:
+        self._analyze(analyzer, [text])
+        return self._tokens[(analyzer, text)]
+
+    def best_match(
+        self, search_terms: str, doc_id: str
+    ) -> Optional[TokenMatch]:
+        """
+        The field whose tokens for a document contain the most of the search
+        terms' tokens, or None if the document isn't in the index
+        """
+        self._fetch_sources([doc_id])
+        if self._sources[doc_id] is None:
+            return None
+        best = TokenMatch(field=None, missing=search_terms.split())
+        for name, text_field in self.fields.items():
+            search_tokens = self.tokens(
+                text_field.search_analyzer, search_terms
+            )
+            if not search_tokens:
+                continue
+            doc_tokens = {
+                token
+                for value in self._values(doc_id, text_field)
+                for token in self.tokens(text_field.analyzer, value)
+            }
+            missing = [
+                token
+                for token in dict.fromkeys(search_tokens)
+                if token not in doc_tokens
+            ]
+            if best.field is None or len(missing) < len(best.missing):
+                best = TokenMatch(field=name, missing=missing)
+            if not missing:
+                break
+        return best
+
+    def _fetch_sources(self, ids: Iterable[str]):
+        missing = sorted(
+            doc_id for doc_id in ids if doc_id not in self._sources
+        )
+        if not missing:
+            return
+        paths = sorted(
+            {path for f in self.fields.values() for path in f.source_paths}
+        )
+        response = self._client.mget(
+            index=self._index, ids=missing, source_includes=paths
+        )
+        for doc in response["docs"]:
+            self._sources[doc["_id"]] = (
+                doc.get("_source", {}) if doc.get("found") else None
+            )
+
+    def _values(self, doc_id: str, text_field: TextField) -> list[str]:
+        source = self._sources.get(doc_id)
+        if source is None:
+            return []
+        return [
+            str(value)
+            for path in text_field.source_paths
+            for value in source_values(source, path.split("."))
+        ]
+
+    def _analyze(self, analyzer: Optional[str], texts: Iterable[str]):
+        pending = sorted(
+            {text for text in texts if (analyzer, text) not in self._tokens}
+        )
+        batch: list[str] = []
+        size = 0
+        for text in pending:
+            if not text:
+                self._tokens[(analyzer, text)] = []
+                continue
+            if batch and size + len(text) > self._max_request_chars:
+                self._analyze_batch(analyzer, batch)
+                batch, size = [], 0
+            batch.append(text)
+            size += len(text)
+        if batch:
+            self._analyze_batch(analyzer, batch)
+
+    def _analyze_batch(self, analyzer: Optional[str], texts: list[str]):
+        kwargs = {} if analyzer is None else {"analyzer": analyzer}
+        response = self._client.indices.analyze(
+            index=self._index, text=texts, **kwargs
+        )
+        # Each token is matched back to the text it came from by its offset
+        ends = []
+        offset = 0
+        for text in texts:
+            offset += _java_length(text)
+            ends.append(offset)
+            offset += offset_gap
+        results: list[list[str]] = [[] for _ in texts]
+        i = 0
+        for token in response["tokens"]:
+            while i < len(ends) - 1 and token["start_offset"] > ends[i]:
+                i += 1
+            results[i].append(token["token"])
+        for text, tokens in zip(texts, results):
+            self._tokens[(analyzer, text)] = tokens
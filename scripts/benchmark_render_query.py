@@ -0,0 +1,71 @@
+"""
+Compare the cost of rendering a search template for a single set of search
+terms: a full chevron render followed by `json.loads` (the old approach),
+against a precompiled `cli.templates.QueryTemplate`.
+
+    uv run python scripts/benchmark_render_query.py --query <path or API URL>
+"""
+
+import json
+import os
+import timeit
+from urllib.parse import urlparse
+
+import chevron
+import typer
+
+from cli import ContentType, get_pipeline_search_template, production_api_url
+from cli.templates import QueryTemplate
+
+
+def main(
+    query: str = typer.Option(
+        default=production_api_url,
+        help="The query to benchmark: a local file path or a URL of catalogue API search templates",
+    ),
+    content_type: ContentType = typer.Option(
+        default=ContentType.works,
+        help="The content type of the query, when fetching it from an API",
+    ),
+    search_terms: str = typer.Option(
+        default="the anatomy of melancholy",
+        help="The search terms to render the template with",
+    ),
+    number: int = typer.Option(
+        default=2000,
+        help="The number of renders to time, per repeat",
+    ),
+):
+    if str(urlparse(query).scheme).startswith("http"):
+        template_string = get_pipeline_search_template(
+            api_url=query, content_type=content_type
+        )["query"]
+    elif os.path.isfile(query):
+        with open(query, "r", encoding="utf-8") as f:
+            template_string = f.read()
+    else:
+        raise typer.BadParameter(f"{query} is not a file or a URL")
+
+    template = json.loads(template_string)
+    template_json = json.dumps(template)
+    query_template = QueryTemplate(template)
+
+    def render_with_chevron():
+        return json.loads(
+            chevron.render(template_json, {"query": search_terms})
+        )
+
+    def render_compiled():
+        return query_template.render(search_terms)
+
+    typer.echo(f"Template size: {len(template_json)} bytes")
+    for name, render in [
+        ("chevron + json.loads", render_with_chevron),
+        ("QueryTemplate.render", render_compiled),
+    ]:
+        best = min(timeit.repeat(render, number=number, repeat=5))
+        typer.echo(f"{name:>22}: {best / number * 1e6:9.1f} µs per query")
+
+
+if __name__ == "__main__":
+    typer.run(main)
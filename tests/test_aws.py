@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from cli.services import aws, cache
+
+
+class _FakeSecretsManager:
+    def __init__(self, secrets: dict[str, str]):
+        self.secrets = secrets
+        self.requests: list[list[str]] = []
+
+    def batch_get_secret_value(self, SecretIdList: list[str]) -> dict[str, Any]:
+        self.requests.append(SecretIdList)
+        return {
+            "SecretValues": [
+                {"Name": name, "SecretString": self.secrets[name]}
+                for name in SecretIdList
+            ]
+        }
+
+
+class _FakeSession:
+    def __init__(self, secretsmanager: _FakeSecretsManager):
+        self.secretsmanager = secretsmanager
+
+    def client(self, service_name: str) -> _FakeSecretsManager:
+        assert service_name == "secretsmanager"
+        return self.secretsmanager
+
+
+class _FakeSTS:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def assume_role(self, RoleArn: str, RoleSessionName: str) -> dict:
+        self.calls += 1
+        return {
+            "Credentials": {
+                "AccessKeyId": f"key-{self.calls}",
+                "SecretAccessKey": "secret",
+                "SessionToken": "token",
+                "Expiration": datetime.now(timezone.utc) + timedelta(hours=1),
+            }
+        }
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(cache, "cache_directory", tmp_path)
+    return tmp_path
+
+
+def test_secrets_are_fetched_in_one_batch_and_then_cached(
+    cache_directory: Path,
+) -> None:
+    secretsmanager = _FakeSecretsManager(
+        {"elasticsearch/rank/USER": "rank", "elasticsearch/rank/PASS": "pw"}
+    )
+    session: Any = _FakeSession(secretsmanager)
+
+    for _ in range(2):
+        secrets = aws.get_secrets(
+            session=session,
+            secret_prefix="elasticsearch/rank/",
+            secret_ids=["USER", "PASS"],
+        )
+        assert secrets == {"USER": "rank", "PASS": "pw"}
+
+    assert secretsmanager.requests == [
+        ["elasticsearch/rank/USER", "elasticsearch/rank/PASS"]
+    ]
+    assert (cache_directory / "secrets.json").stat().st_mode & 0o077 == 0
+
+
+def test_expired_secrets_are_fetched_again(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    secretsmanager = _FakeSecretsManager({"reporting/es_host": "host"})
+    session: Any = _FakeSession(secretsmanager)
+
+    monkeypatch.setattr(aws, "secrets_ttl", timedelta(seconds=-1))
+    aws.get_secrets(session=session, secret_ids="reporting/es_host")
+    aws.get_secrets(session=session, secret_ids="reporting/es_host")
+
+    assert len(secretsmanager.requests) == 2
+
+
+def test_role_credentials_are_reused_until_they_expire(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    sts = _FakeSTS()
+    monkeypatch.setattr(aws.boto3, "client", lambda service_name: sts)
+
+    first = aws.get_role_credentials("arn:aws:iam::0:role/developer")
+    second = aws.get_role_credentials("arn:aws:iam::0:role/developer")
+    assert first == second
+    assert sts.calls == 1
+
+    monkeypatch.setattr(aws, "credentials_expiry_margin", timedelta(hours=2))
+    third = aws.get_role_credentials("arn:aws:iam::0:role/developer")
+    assert third["AccessKeyId"] == "key-2"
@@ -0,0 +1,202 @@
+import json
+from typing import Any
+
+import pytest
+from elasticsearch import ApiError, ConnectionTimeout
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+
+from cli.services.bulk import (
+    batches_by_size,
+    bulk_actions,
+    bulk_indexing_settings,
+    load_documents,
+    send_batch,
+)
+
+
+def api_error(status, body=None):
+    meta = ApiResponseMeta(
+        status=status,
+        http_version="1.1",
+        headers=HttpHeaders(),
+        duration=0,
+        node=NodeConfig("http", "localhost", 9200),
+    )
+    return ApiError("error", meta=meta, body=body or {})
+
+
+class _FakeBulkClient:
+    """
+    Indexes documents, rejecting each ID in `busy` once, and failing each ID
+    in `invalid`. With `reject_requests`, the first requests are rejected
+    outright.
+    """
+
+    def __init__(
+        self,
+        busy=(),
+        invalid=(),
+        reject_requests=0,
+        request_error=None,
+        timeouts=0,
+    ):
+        self.busy = set(busy)
+        self.invalid = set(invalid)
+        self.reject_requests = reject_requests
+        self.request_error = request_error
+        self.timeouts = timeouts
+        self.indexed: list[str] = []
+
+    def bulk(self, operations: bytes):
+        if self.request_error is not None:
+            raise self.request_error
+        if self.timeouts:
+            self.timeouts -= 1
+            raise ConnectionTimeout("timed out")
+        if self.reject_requests:
+            self.reject_requests -= 1
+            raise api_error(429)
+        lines = operations.decode().splitlines()
+        items = []
+        for action in lines[::2]:
+            document_id = json.loads(action)["index"]["_id"]
+            if document_id in self.busy:
+                self.busy.remove(document_id)
+                status = {"status": 429, "error": {"type": "es_rejected"}}
+            elif document_id in self.invalid:
+                status = {"status": 400, "error": {"type": "mapper_parsing"}}
+            else:
+                self.indexed.append(document_id)
+                status = {"status": 201}
+            items.append({"index": status})
+        return {"errors": True, "items": items}
+
+
+def actions(ids):
+    return list(bulk_actions("works", [{"_id": i, "_source": {}} for i in ids]))
+
+
+def test_batches_are_limited_by_size_in_bytes():
+    batches = list(
+        batches_by_size([b"x" * 40, b"x" * 40, b"x" * 200, b"x"], 100)
+    )
+    assert [[len(action) for action in batch] for batch in batches] == [
+        [40, 40],
+        [200],
+        [1],
+    ]
+
+
+def test_rejected_documents_are_retried_with_backoff():
+    client: Any = _FakeBulkClient(busy={"b"}, invalid={"c"})
+    delays: list[float] = []
+
+    stats = send_batch(client, actions("abcd"), sleep=delays.append)
+
+    assert sorted(client.indexed) == ["a", "b", "d"]
+    assert (stats.indexed, stats.failed, stats.retried) == (3, 1, 1)
+    assert stats.errors == {"mapper_parsing": 1}
+    assert len(delays) == 1
+
+
+def test_rejected_requests_are_retried_until_the_limit():
+    client: Any = _FakeBulkClient(reject_requests=2)
+    delays: list[float] = []
+    stats = send_batch(client, actions("ab"), sleep=delays.append)
+    assert stats.indexed == 2
+    # the backoff doubles, with jitter
+    assert 0.5 <= delays[0] <= 1 and 1 <= delays[1] <= 2
+
+    client = _FakeBulkClient(reject_requests=3)
+    stats = send_batch(
+        client, actions("ab"), max_retries=2, sleep=delays.append
+    )
+    assert (stats.indexed, stats.failed) == (0, 2)
+    assert stats.errors == {"429": 2}
+
+
+def test_failed_requests_count_every_document_as_failed():
+    error = api_error(413)
+    client: Any = _FakeBulkClient(request_error=error)
+    delays: list[float] = []
+
+    stats = send_batch(client, actions("abc"), sleep=delays.append)
+
+    assert (stats.indexed, stats.failed, stats.retried) == (0, 3, 0)
+    assert stats.errors == {"413": 3}
+    assert delays == []
+
+    client.request_error = api_error(
+        400, {"error": {"type": "illegal_argument_exception"}}
+    )
+    stats = load_documents(
+        client, "works", [{"_id": "a", "_source": {}}], concurrency=1
+    )
+    assert stats.errors == {"illegal_argument_exception": 1}
+
+
+def test_loads_every_document_in_parallel():
+    client: Any = _FakeBulkClient()
+    documents = [{"_id": str(i), "_source": {"n": i}} for i in range(500)]
+    batches: list = []
+
+    stats = load_documents(
+        client,
+        "works",
+        iter(documents),
+        concurrency=3,
+        max_bytes=1000,
+        on_batch=batches.append,
+    )
+
+    assert stats.indexed == 500
+    assert sorted(client.indexed, key=int) == [str(i) for i in range(500)]
+    assert len(batches) > 10
+
+
+def test_connection_errors_are_retried_then_counted():
+    client: Any = _FakeBulkClient(timeouts=1)
+    delays: list[float] = []
+    stats = send_batch(client, actions("ab"), sleep=delays.append)
+    assert (stats.indexed, stats.retried) == (2, 2)
+    assert len(delays) == 1
+
+    client = _FakeBulkClient(timeouts=3)
+    stats = send_batch(
+        client, actions("ab"), max_retries=2, sleep=delays.append
+    )
+    assert (stats.indexed, stats.failed) == (0, 2)
+    assert stats.errors == {"ConnectionTimeout": 2}
+
+
+class _FakeIndices:
+    def __init__(self):
+        self.settings = {"index.number_of_replicas": "1"}
+        self.calls: list = []
+
+    def get_settings(self, index, flat_settings):
+        return {index: {"settings": self.settings}}
+
+    def put_settings(self, index, settings):
+        self.calls.append(settings["index"])
+
+    def refresh(self, index):
+        self.calls.append("refresh")
+
+
+class _FakeSettingsClient:
+    def __init__(self):
+        self.indices = _FakeIndices()
+
+
+def test_indexing_settings_are_restored_after_a_failure():
+    client: Any = _FakeSettingsClient()
+    with pytest.raises(RuntimeError):
+        with bulk_indexing_settings(client, "works"):
+            raise RuntimeError()
+
+    assert client.indices.calls == [
+        {"refresh_interval": "-1", "number_of_replicas": 0},
+        {"refresh_interval": None, "number_of_replicas": "1"},
+        "refresh",
+    ]
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from cli.services.cassette import (
+    Cassette,
+    CassetteMissError,
+    RecordingClient,
+    ReplayClient,
+)
+
+
+class _FakeClient:
+    def search(self, index: str, **body: Any) -> dict[str, Any]:
+        return {
+            "took": 5,
+            "timed_out": False,
+            "_shards": {"total": 1},
+            "hits": {"hits": [{"_id": body["query"]["ids"]["values"][0]}]},
+        }
+
+    def msearch(self, searches: list[dict[str, Any]]) -> dict[str, Any]:
+        return {
+            "responses": [
+                self.search(**header, **body)
+                for header, body in zip(searches[::2], searches[1::2])
+            ]
+        }
+
+
+def _body(doc_id: str) -> dict[str, Any]:
+    return {"query": {"ids": {"values": [doc_id]}}, "size": 1}
+
+
+def test_recorded_searches_can_be_replayed(tmp_path: Path) -> None:
+    recording = RecordingClient(_FakeClient(), Cassette(tmp_path))
+    recording.search(index="works", **_body("a"))
+    recording.msearch(
+        searches=[
+            {"index": "works"},
+            _body("b"),
+            {"index": "works"},
+            _body("c"),
+        ]
+    )
+
+    replay = ReplayClient(Cassette(tmp_path))
+
+    assert replay.search(index="works", **_body("a")) == {
+        "took": 5,
+        "timed_out": False,
+        "hits": {"hits": [{"_id": "a"}]},
+    }
+    responses = replay.msearch(
+        searches=[
+            {"index": "works"},
+            _body("c"),
+            {"index": "works"},
+            _body("d"),
+        ]
+    )["responses"]
+    assert responses[0]["hits"]["hits"] == [{"_id": "c"}]
+    assert "error" in responses[1]
+
+
+def test_replaying_an_unrecorded_search_raises(tmp_path: Path) -> None:
+    replay = ReplayClient(Cassette(tmp_path))
+
+    with pytest.raises(CassetteMissError):
+        replay.search(index="images", **_body("a"))
+
+
+def test_manifest_round_trips(tmp_path: Path) -> None:
+    cassette = Cassette(tmp_path / "cassette")
+    cassette.write_manifest(
+        index="works-indexed-2025-10-02",
+        query_template={"match": {"title": "{{query}}"}},
+    )
+
+    assert Cassette(tmp_path / "cassette").manifest == {
+        "index": "works-indexed-2025-10-02",
+        "query_template": {"match": {"title": "{{query}}"}},
+    }
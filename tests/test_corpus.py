@@ -0,0 +1,109 @@
+import gzip
+import json
+from typing import Any
+
+import pytest
+
+from cli.services.corpus import SliceCheckpoint, export_slice, read_corpus
+
+
+class _FakeClient:
+    """Serves documents sorted by `query.id`, failing after `fail_after` pages"""
+
+    def __init__(self, ids: list[str], fail_after: int = -1):
+        self.documents = sorted(ids)
+        self.fail_after = fail_after
+        self.pages = 0
+
+    def search(self, search_after: Any, size: int, **kwargs: Any):
+        if self.pages == self.fail_after:
+            raise ConnectionError("interrupted")
+        self.pages += 1
+        remaining = [
+            document
+            for document in self.documents
+            if search_after is None or document > search_after[0]
+        ]
+        hits = [
+            {
+                "_id": document,
+                "_source": {"query": {"id": document}},
+                "sort": [document],
+            }
+            for document in remaining[:size]
+        ]
+        return {"hits": {"hits": hits}}
+
+
+def export(client, directory, **kwargs):
+    return export_slice(
+        client,
+        index="works",
+        pit_id="pit",
+        query={"match_all": {}},
+        sort_field="query.id",
+        directory=directory,
+        slice_number=0,
+        page_size=2,
+        shard_size=3,
+        **kwargs,
+    )
+
+
+def test_exports_documents_to_gzipped_shards(tmp_path):
+    ids = [f"doc-{i}" for i in range(7)]
+    progress = []
+
+    checkpoint = export(
+        _FakeClient(ids),
+        tmp_path,
+        on_progress=lambda documents, size: progress.append(documents),
+    )
+
+    assert sorted(path.name for path in tmp_path.glob("*.gz")) == [
+        "part-000-00000.ndjson.gz",
+        "part-000-00001.ndjson.gz",
+        "part-000-00002.ndjson.gz",
+    ]
+    assert [document["_id"] for document in read_corpus(tmp_path)] == ids
+    assert (checkpoint.documents, checkpoint.shards, checkpoint.done) == (
+        7,
+        3,
+        True,
+    )
+    assert checkpoint.bytes == sum(
+        path.stat().st_size for path in tmp_path.glob("*.gz")
+    )
+    assert sum(progress) == 7
+
+
+def test_resumes_from_the_last_finished_shard(tmp_path):
+    ids = [f"doc-{i}" for i in range(7)]
+
+    # The third page is lost part way through the second shard
+    with pytest.raises(ConnectionError):
+        export(_FakeClient(ids, fail_after=2), tmp_path)
+    assert SliceCheckpoint.read(tmp_path, 0).documents == 3
+    assert list(tmp_path.glob("*.partial"))
+
+    export(_FakeClient(ids), tmp_path)
+
+    assert not list(tmp_path.glob("*.partial"))
+    assert [document["_id"] for document in read_corpus(tmp_path)] == ids
+
+
+def test_finished_slices_are_not_exported_again(tmp_path):
+    export(_FakeClient(["a", "b"]), tmp_path)
+    client = _FakeClient(["a", "b"])
+
+    assert export(client, tmp_path).documents == 2
+    assert client.pages == 0
+
+
+def test_read_corpus_reads_a_single_file(tmp_path):
+    path = tmp_path / "works.ndjson.gz"
+    with gzip.open(path, "wt") as f:
+        for document_id in ["a", "b"]:
+            f.write(json.dumps({"_id": document_id, "_source": {}}) + "\n")
+
+    assert [document["_id"] for document in read_corpus(path)] == ["a", "b"]
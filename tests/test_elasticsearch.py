@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+from elastic_transport import (
+    ApiResponseMeta,
+    ConnectionError,
+    HttpHeaders,
+    NodeConfig,
+)
+from elasticsearch import AuthenticationException
+
+from cli.services import elasticsearch
+from cli.services.elasticsearch import (
+    ClusterAuthenticationError,
+    ClusterUnavailableError,
+    wait_for_client,
+)
+
+
+class _FakeClient:
+    def __init__(self, outcomes: list[Exception | None]):
+        self.outcomes = outcomes
+        self.attempts = 0
+
+    def options(self, **kwargs: Any) -> _FakeClient:
+        return self
+
+    def info(self) -> dict:
+        outcome = self.outcomes[min(self.attempts, len(self.outcomes) - 1)]
+        self.attempts += 1
+        if outcome is not None:
+            raise outcome
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def no_sleeping(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    sleeps: list[float] = []
+    monkeypatch.setattr(elasticsearch, "sleep", sleeps.append)
+    return sleeps
+
+
+def test_waits_with_backoff_until_the_cluster_responds(
+    no_sleeping: list[float],
+) -> None:
+    client: Any = _FakeClient(
+        [ConnectionError("refused"), ConnectionError("refused"), None]
+    )
+
+    wait_for_client(client, initial_backoff=1, max_backoff=10)
+
+    assert client.attempts == 3
+    assert len(no_sleeping) == 2
+    assert 0 <= no_sleeping[0] <= 1
+    assert 0 <= no_sleeping[1] <= 2
+
+
+def test_authentication_failures_are_not_retried() -> None:
+    meta = ApiResponseMeta(
+        status=401,
+        http_version="1.1",
+        headers=HttpHeaders(),
+        duration=0,
+        node=NodeConfig("https", "localhost", 9200),
+    )
+    client: Any = _FakeClient(
+        [AuthenticationException("unauthorized", meta, {})]
+    )
+
+    with pytest.raises(ClusterAuthenticationError):
+        wait_for_client(client)
+    assert client.attempts == 1
+
+
+def test_gives_up_after_the_deadline() -> None:
+    client: Any = _FakeClient([ConnectionError("refused")])
+
+    with pytest.raises(ClusterUnavailableError):
+        wait_for_client(client, deadline=0)
+
+
+class _FakePitClient:
+    def __init__(self, documents: list[str]):
+        self.documents = documents
+        self.closed: list[str] = []
+
+    def open_point_in_time(self, index: str, keep_alive: str) -> dict:
+        return {"id": "pit-0"}
+
+    def search(self, pit: dict, search_after: Any, size: int, **kwargs: Any):
+        start = 0 if search_after is None else search_after[0] + 1
+        hits = [
+            {"_id": document, "sort": [position]}
+            for position, document in enumerate(self.documents)
+        ][start : start + size]
+        # Elasticsearch may return a new ID for the point in time
+        return {"pit_id": f"pit-{start}", "hits": {"hits": hits}}
+
+    def close_point_in_time(self, id: str) -> None:
+        self.closed.append(id)
+
+
+def test_scan_with_pit_pages_through_every_document() -> None:
+    client: Any = _FakePitClient([f"doc-{i}" for i in range(5)])
+
+    pages = list(
+        elasticsearch.scan_with_pit(
+            client, index="works", query={"match_all": {}}, page_size=2
+        )
+    )
+
+    assert [[hit["_id"] for hit in page] for page in pages] == [
+        ["doc-0", "doc-1"],
+        ["doc-2", "doc-3"],
+        ["doc-4"],
+    ]
+    assert client.closed == ["pit-5"]
+
+
+def test_scan_with_pit_closes_abandoned_points_in_time() -> None:
+    client: Any = _FakePitClient([f"doc-{i}" for i in range(5)])
+
+    for _ in elasticsearch.scan_with_pit(
+        client, index="works", query={"match_all": {}}, page_size=2
+    ):
+        break
+
+    assert client.closed == ["pit-0"]
+
+
+def test_scan_with_pit_can_resume_in_a_shared_point_in_time() -> None:
+    client: Any = _FakePitClient([f"doc-{i}" for i in range(5)])
+
+    pages = list(
+        elasticsearch.scan_with_pit(
+            client,
+            index="works",
+            query={"match_all": {}},
+            page_size=2,
+            search_after=[2],
+            pit_id="shared",
+        )
+    )
+
+    assert [[hit["_id"] for hit in page] for page in pages] == [
+        ["doc-3", "doc-4"]
+    ]
+    assert client.closed == []
@@ -0,0 +1,106 @@
+import pytest
+
+from cli.relevance_tests.executors import (
+    do_test_latency,
+    do_test_order,
+    do_test_recall,
+)
+from cli.relevance_tests.models import (
+    LatencyTestCase,
+    OrderTestCase,
+    RecallTestCase,
+)
+from cli.latency import LatencyBaseline
+from cli.searcher import Timing
+
+
+def measure_with(*timings):
+    def measure(search_terms, size, repetitions):
+        return [timings[i % len(timings)] for i in range(repetitions)]
+
+    return measure
+
+
+def test_latency_is_judged_at_a_percentile():
+    test_case = LatencyTestCase(
+        search_terms="cholera", max_took_ms=100, repetitions=10
+    )
+    # one slow search in ten is within the p90 budget
+    timings = [Timing(took=50, wall=60, timed_out=False)] * 9 + [
+        Timing(took=500, wall=510, timed_out=False)
+    ]
+    do_test_latency(test_case, measure_with(*timings))
+
+    with pytest.raises(pytest.fail.Exception, match="p90 took of 500ms"):
+        do_test_latency(
+            test_case, measure_with(Timing(took=500, wall=510, timed_out=False))
+        )
+
+
+def test_latency_tests_fail_when_searches_time_out():
+    test_case = LatencyTestCase(search_terms="cholera", max_wall_ms=1000)
+    with pytest.raises(pytest.fail.Exception, match="timed out"):
+        do_test_latency(
+            test_case, measure_with(Timing(took=5, wall=10, timed_out=True))
+        )
+
+
+def test_latency_budgets_come_from_the_recorded_baseline(tmp_path):
+    test_case = LatencyTestCase(search_terms="cholera")
+    measure = measure_with(Timing(took=100, wall=120, timed_out=False))
+
+    with pytest.raises(pytest.skip.Exception, match="no latency budget"):
+        do_test_latency(test_case, measure)
+
+    path = tmp_path / "latency_baseline.json"
+    recording = LatencyBaseline(path, recording=True)
+    do_test_latency(test_case, measure, recording)
+    recording.write()
+
+    baseline = LatencyBaseline(path, headroom=1.5)
+    assert baseline.budget("cholera", "took") == 150
+    do_test_latency(test_case, measure, baseline)
+    with pytest.raises(pytest.fail.Exception, match="budget of 150ms"):
+        do_test_latency(
+            test_case,
+            measure_with(Timing(took=200, wall=220, timed_out=False)),
+            baseline,
+        )
+
+
+def test_relevance_tests_fail_when_searches_time_out():
+    test_case = RecallTestCase(search_terms="cholera", expected_ids=["a"])
+
+    def search(search_terms, size, timed_out=False):
+        return {"timed_out": timed_out, "hits": {"hits": [{"_id": "a"}]}}
+
+    do_test_recall(test_case, search)
+    with pytest.raises(pytest.fail.Exception, match="timed out"):
+        do_test_recall(
+            test_case,
+            lambda search_terms, size: search(search_terms, size, True),
+        )
+
+
+def test_failures_report_the_rank_of_missing_documents():
+    def search(search_terms, size):
+        return {"hits": {"hits": [{"_id": f"other-{i}"} for i in range(size)]}}
+
+    ranks = {"far": 312, "unmatched": None}
+
+    def rank(search_terms, doc_id):
+        return ranks[doc_id]
+
+    recall = RecallTestCase(
+        search_terms="cholera", expected_ids=["far", "unmatched"]
+    )
+    with pytest.raises(pytest.fail.Exception) as error:
+        do_test_recall(recall, search, rank)
+    assert "far: expected at ≤25, actual rank 312" in str(error.value)
+    assert "unmatched: doesn't match the query" in str(error.value)
+
+    order = OrderTestCase(
+        search_terms="cholera", before_ids=["far"], after_ids=["x"]
+    )
+    with pytest.raises(pytest.fail.Exception, match="actual rank 312"):
+        do_test_order(order, search, rank)
@@ -0,0 +1,63 @@
+import math
+import statistics
+
+from cli.latency import (
+    LatencyHistogram,
+    paired_permutation_test,
+    percentile,
+)
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 90) == 90
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([3.0], 50) == 3.0
+
+
+def test_percentile_of_nothing_is_nan():
+    assert math.isnan(percentile([], 50))
+
+
+def test_permutation_test_detects_a_consistent_difference():
+    assert paired_permutation_test([1.0 + i / 10 for i in range(20)]) < 0.01
+
+
+def test_permutation_test_does_not_detect_noise():
+    differences = [1.0, -1.0, 2.0, -2.0, 0.5, -0.5, 3.0, -3.0]
+    assert paired_permutation_test(differences) > 0.5
+    assert paired_permutation_test([0.0, 0.0]) == 1.0
+
+
+def test_permutation_test_tests_the_given_statistic():
+    # Most terms are consistently slower, but two outliers are much faster
+    differences = [1.0 + i / 10 for i in range(30)] + [-300.0, -300.0]
+    assert statistics.median(differences) > 0 > statistics.fmean(differences)
+
+    assert paired_permutation_test(differences) > 0.3
+    assert (
+        paired_permutation_test(differences, statistic=statistics.median) < 0.01
+    )
+
+
+def test_histogram_records_values_to_the_given_precision():
+    histogram = LatencyHistogram(significant_figures=3)
+    for value in range(1, 100_001):
+        histogram.record(value)
+
+    assert histogram.total == 100_000
+    assert histogram.min == 1
+    assert histogram.max == 100_000
+    assert histogram.mean == 50_000.5
+    for p in [50, 90, 99, 99.9]:
+        exact = percentile(range(1, 100_001), p)
+        assert abs(histogram.value_at_percentile(p) - exact) / exact < 0.001
+    assert histogram.value_at_percentile(100) == 100_000
+    # a few kilobytes, rather than one count per value
+    assert len(histogram.counts) < 10_000
+
+
+def test_empty_histogram_percentiles_are_nan():
+    assert math.isnan(LatencyHistogram().value_at_percentile(50))
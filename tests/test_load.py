@@ -0,0 +1,104 @@
+import json
+import time
+
+import pytest
+
+from elasticsearch import ApiError, ConnectionTimeout
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+
+from cli.commands.load import LoadReport, run_load, write_report
+
+
+def api_error(status):
+    meta = ApiResponseMeta(
+        status=status,
+        http_version="1.1",
+        headers=HttpHeaders(),
+        duration=0,
+        node=NodeConfig("http", "localhost", 9200),
+    )
+    return ApiError("error", meta=meta, body={})
+
+
+def test_sends_searches_at_the_target_rate():
+    sent = []
+
+    def search(search_terms):
+        sent.append(search_terms)
+        return {"took": 1, "timed_out": False}
+
+    report = run_load(
+        search, ["a", "b", "c"], qps=50, duration=0.5, concurrency=2
+    )
+
+    assert report.sent == len(sent) == 25
+    assert sent[:4] == ["a", "b", "c", "a"]
+    assert report.outcomes["ok"] == 25
+    assert report.histogram.total == 25
+
+
+def test_slow_searches_are_measured_from_when_they_were_due():
+    def search(search_terms):
+        time.sleep(0.1)
+        return {"took": 100}
+
+    # One worker can only manage 10 searches a second, so later searches
+    # queue behind earlier ones rather than being sent late
+    report = run_load(search, ["a"], qps=40, duration=0.25, concurrency=1)
+
+    assert report.sent == 10
+    assert report.max_outstanding > 1
+    assert report.histogram.max > 0.5 * 1_000_000
+
+
+def test_counts_failed_searches_by_outcome():
+    responses = iter(
+        [
+            {"timed_out": True},
+            api_error(429),
+            api_error(500),
+            ConnectionTimeout("timed out"),
+            {"timed_out": False},
+            KeyError("unexpected"),
+        ]
+    )
+
+    def search(search_terms):
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    report = run_load(search, ["a"], qps=50, duration=0.12, concurrency=1)
+
+    # unexpected exceptions are counted as errors too
+    assert dict(report.outcomes) == {
+        "ok": 1,
+        "timed out": 2,
+        "rejected": 1,
+        "error": 2,
+    }
+    assert report.histogram.total == 1
+
+
+def test_needs_search_terms():
+    with pytest.raises(ValueError):
+        run_load(lambda search_terms: {}, [], qps=1, duration=1, concurrency=1)
+
+
+def test_reports_from_the_same_second_are_all_kept(tmp_path):
+    paths = {
+        write_report(
+            LoadReport(),
+            index="works",
+            query_template={},
+            settings={},
+            directory=tmp_path,
+        )
+        for _ in range(3)
+    }
+
+    assert len(paths) == 3
+    assert all(
+        json.loads(path.read_text())["index"] == "works" for path in paths
+    )
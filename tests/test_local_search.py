@@ -0,0 +1,332 @@
+from typing import Any
+
+import pytest
+
+from cli.searcher import Searcher
+from cli.services.analysis import Analysis, porter_stem
+from cli.services.local_search import (
+    LocalSearchClient,
+    UnsupportedQueryError,
+    build_local_index,
+    minimum_should_match,
+)
+
+config: dict[str, Any] = {
+    "settings": {
+        "index": {
+            "analysis": {
+                "analyzer": {
+                    "english": {
+                        "tokenizer": "standard",
+                        "filter": ["lowercase", "asciifolding", "stemmer"],
+                    }
+                },
+                "filter": {
+                    "stemmer": {"type": "stemmer", "language": "english"}
+                },
+                "normalizer": {
+                    "lowercase_normalizer": {"filter": ["lowercase"]}
+                },
+            }
+        }
+    },
+    "mappings": {
+        "properties": {
+            "query": {
+                "properties": {
+                    "id": {"type": "keyword"},
+                    "title": {
+                        "type": "text",
+                        "fields": {
+                            "english": {"type": "text", "analyzer": "english"}
+                        },
+                    },
+                    "contributors": {
+                        "type": "keyword",
+                        "normalizer": "lowercase_normalizer",
+                    },
+                }
+            }
+        }
+    },
+}
+
+documents = [
+    {"_id": "a", "_source": {"query": {"id": "a", "title": "Cholera maps"}}},
+    {
+        "_id": "b",
+        "_source": {
+            "query": {
+                "id": "b",
+                "title": "A map of cholera in London, with notes on cholera",
+                "contributors": ["Snow, John"],
+            }
+        },
+    },
+    {"_id": "c", "_source": {"query": {"id": "c", "title": "Café society"}}},
+    {"_id": "d", "_source": {"query": {"id": "d", "title": "Maps of London"}}},
+]
+
+
+@pytest.fixture
+def index():
+    return build_local_index(config, documents)
+
+
+def ids(index, query, **kwargs):
+    _, page = index.search(query, **kwargs)
+    return [index.ids[doc] for doc, _, _ in page]
+
+
+def test_analyzers_are_built_from_the_index_config():
+    analysis = Analysis(config["settings"])
+    assert analysis.analyzer("english").terms("Cafés and Running") == [
+        "cafe",
+        "and",
+        "run",
+    ]
+    assert analysis.analyzer("standard").terms("Cafés, U.S.A.") == [
+        "cafés",
+        "u.s.a",
+    ]
+    assert analysis.unsupported == set()
+
+
+def test_unsupported_analysis_is_skipped_and_reported():
+    analysis = Analysis(
+        {"analysis": {"analyzer": {"x": {"filter": ["lowercase", "phonetic"]}}}}
+    )
+    assert analysis.analyzer("x").terms("Hello World") == ["hello", "world"]
+    assert analysis.unsupported == {"filter phonetic"}
+
+
+def test_porter_stemmer():
+    assert [
+        porter_stem(word)
+        for word in ["caresses", "ponies", "relational", "hopping", "maps"]
+    ] == ["caress", "poni", "relat", "hop", "map"]
+
+
+def test_minimum_should_match():
+    assert minimum_should_match(4, 2) == 2
+    assert minimum_should_match(4, "-1") == 3
+    assert minimum_should_match(4, "75%") == 3
+    assert minimum_should_match(4, "-25%") == 3
+    assert minimum_should_match(2, "2<75%") == 2
+    assert minimum_should_match(4, "2<75%") == 3
+
+
+def test_match_scores_with_bm25(index):
+    # the more frequent term in a shorter field scores higher, and the rarer
+    # term is worth more than the commoner one
+    assert ids(index, {"match": {"query.title": "cholera"}}) == ["a", "b"]
+    assert ids(index, {"match": {"query.title": "london cholera"}}) == [
+        "b",
+        "a",
+        "d",
+    ]
+    # idf = ln(2), and the field is shorter than the average of 4.25 terms
+    _, page = index.search({"match": {"query.title": "cholera"}})
+    assert page[0][1] == pytest.approx(0.4022, abs=1e-4)
+
+
+def test_match_operators(index):
+    assert ids(
+        index,
+        {"match": {"query.title": {"query": "map cholera", "operator": "and"}}},
+    ) == ["b"]
+    assert ids(
+        index,
+        {
+            "match": {
+                "query.title.english": {
+                    "query": "map cholera",
+                    "minimum_should_match": "100%",
+                }
+            }
+        },
+    ) == ["a", "b"]
+
+
+def test_multi_match_uses_field_boosts(index):
+    query = {
+        "multi_match": {
+            "query": "cafe",
+            "fields": ["query.title", "query.title.english^2"],
+        }
+    }
+    assert ids(index, query) == ["c"]
+    assert ids(
+        index,
+        {
+            "multi_match": {
+                "query": "cholera maps",
+                "fields": ["query.title*"],
+                "type": "cross_fields",
+                "operator": "and",
+            }
+        },
+    ) == ["a", "b"]
+
+
+def test_match_phrase_respects_positions(index):
+    assert ids(index, {"match_phrase": {"query.title": "cholera maps"}}) == [
+        "a"
+    ]
+    assert ids(index, {"match_phrase": {"query.title": "maps cholera"}}) == []
+    assert ids(index, {"match_phrase": {"query.title": "cholera london"}}) == []
+    assert ids(
+        index,
+        {
+            "match_phrase": {
+                "query.title": {"query": "cholera london", "slop": 1}
+            }
+        },
+    ) == ["b"]
+
+
+def test_term_level_queries(index):
+    assert ids(index, {"terms": {"query.contributors": ["snow, john"]}}) == [
+        "b"
+    ]
+    assert ids(index, {"term": {"query.id": {"value": "c"}}}) == ["c"]
+    assert ids(index, {"ids": {"values": ["d", "missing"]}}) == ["d"]
+    assert ids(index, {"range": {"query.id": {"gt": "a", "lte": "c"}}}) == [
+        "b",
+        "c",
+    ]
+
+
+def test_bool_queries(index):
+    query = {
+        "bool": {
+            "should": [{"match": {"query.title": "maps"}}],
+            "filter": [{"match": {"query.title": "london"}}],
+            "must_not": [{"ids": {"values": ["b"]}}],
+        }
+    }
+    assert ids(index, query) == ["d"]
+    assert ids(
+        index,
+        {
+            "bool": {
+                "should": [
+                    {"match": {"query.title": "maps"}},
+                    {"match": {"query.title": "london"}},
+                ],
+                "minimum_should_match": 2,
+            }
+        },
+    ) == ["d"]
+
+
+def test_nested_queries_match_each_object_separately():
+    nested_config = {
+        "mappings": {
+            "properties": {
+                "contributors": {
+                    "type": "nested",
+                    "properties": {
+                        "name": {"type": "keyword"},
+                        "role": {"type": "keyword"},
+                    },
+                }
+            }
+        }
+    }
+    index = build_local_index(
+        nested_config,
+        [
+            {
+                "_id": "a",
+                "_source": {
+                    "contributors": [
+                        {"name": "Snow", "role": "printer"},
+                        {"name": "Farr", "role": "author"},
+                    ]
+                },
+            },
+            {
+                "_id": "b",
+                "_source": {"contributors": {"name": "Snow", "role": "author"}},
+            },
+        ],
+    )
+
+    def nested(*clauses, **params):
+        return {
+            "nested": {
+                "path": "contributors",
+                "query": {"bool": {"must": list(clauses)}},
+                **params,
+            }
+        }
+
+    snow = {"term": {"contributors.name": "Snow"}}
+    author = {"term": {"contributors.role": "author"}}
+    assert ids(index, nested(snow, author)) == ["b"]
+    assert ids(index, nested(author)) == ["a", "b"]
+    assert ids(index, {"bool": {"must": [nested(snow), nested(author)]}}) == [
+        "a",
+        "b",
+    ]
+    assert ids(index, nested(snow, score_mode="none")) == ["a", "b"]
+    assert index.evaluate(nested(snow, score_mode="none")) == {0: 0, 1: 0}
+    with pytest.raises(UnsupportedQueryError):
+        index.search({"nested": {"path": "title", "query": snow}})
+
+
+def test_unsupported_queries_raise(index):
+    with pytest.raises(UnsupportedQueryError):
+        index.search({"fuzzy": {"query.title": "colera"}})
+    with pytest.raises(UnsupportedQueryError):
+        index.search({"range": {"query.id": {"gte": 1}}})
+
+
+def test_client_serves_the_searcher(index):
+    searcher = Searcher(
+        client=LocalSearchClient(index),
+        index="works",
+        render_query=lambda terms: {"match_all": {}},
+        stable_sort_key="query.id",
+    )
+    searcher.prefetch([("anything", 3)])
+    response = searcher.search("anything", 3)
+
+    # equal scores are ordered by the stable sort key
+    assert [hit["_id"] for hit in response["hits"]["hits"]] == ["a", "b", "c"]
+    assert response["hits"]["hits"][0]["sort"] == [1.0, "a"]
+    assert response["hits"]["total"]["value"] == 4
+
+
+@pytest.mark.parametrize(
+    "query",
+    [{"match_all": {}}, {"match": {"query.title.english": "cholera maps"}}],
+)
+def test_searcher_finds_the_rank_of_any_document(index, query):
+    searcher = Searcher(
+        client=LocalSearchClient(index),
+        index="works",
+        render_query=lambda terms: query,
+        stable_sort_key="query.id",
+    )
+    response = searcher.search("anything", 4)
+
+    for position, hit in enumerate(response["hits"]["hits"], start=1):
+        assert searcher.rank("anything", hit["_id"]) == position
+    if len(response["hits"]["hits"]) < 4:
+        assert searcher.rank("anything", "c") is None
+
+
+def test_msearch_reports_unsupported_queries_per_search(index):
+    client = LocalSearchClient(index)
+    responses = client.msearch(
+        searches=[
+            {"index": "works"},
+            {"query": {"ids": {"values": ["a"]}}},
+            {"index": "works"},
+            {"query": {"fuzzy": {"query.title": "colera"}}},
+        ]
+    )["responses"]
+    assert responses[0]["hits"]["hits"][0]["_id"] == "a"
+    assert "error" in responses[1]
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from cli.relevance_tests.metrics import evaluate, summarise
+from cli.relevance_tests.models import (
+    OrderTestCase,
+    PrecisionTestCase,
+    RecallTestCase,
+)
+
+
+def test_evaluate_binary_relevance() -> None:
+    metrics = evaluate(["x", "a", "y", "b"], {"a": 1, "b": 1, "c": 1}, k=4)
+
+    assert metrics.precision == 0.5
+    assert metrics.recall == pytest.approx(2 / 3)
+    assert metrics.reciprocal_rank == 0.5
+    ideal = 1 + 1 / math.log2(3) + 1 / math.log2(4)
+    assert metrics.ndcg == pytest.approx(
+        (1 / math.log2(3) + 1 / math.log2(5)) / ideal
+    )
+
+
+def test_evaluate_ignores_results_beyond_the_cutoff() -> None:
+    metrics = evaluate(["x", "y", "a"], {"a": 1}, k=2)
+
+    assert metrics == (0, 0, 0, 0)
+
+
+def test_summarise_averages_by_test_case_type() -> None:
+    summary = summarise(
+        [
+            (PrecisionTestCase(search_terms="a", expected_ids=["a"]), ["a"]),
+            (PrecisionTestCase(search_terms="b", expected_ids=["b"]), ["x"]),
+            (
+                RecallTestCase(
+                    search_terms="c", expected_ids=["c"], threshold_position=2
+                ),
+                ["x", "c"],
+            ),
+            (
+                OrderTestCase(
+                    search_terms="d", before_ids=["d"], after_ids=["e"]
+                ),
+                ["d", "e"],
+            ),
+        ]
+    )
+
+    count, precision = summary["PrecisionTestCase"]
+    assert count == 2
+    assert precision.precision == 0.5
+    assert summary["RecallTestCase"][1].reciprocal_rank == 0.5
+    assert summary["OrderTestCase"][1].ndcg == 1
+    assert summary["all"][0] == 4
@@ -1,24 +1,44 @@
 from __future__ import annotations
 
+from pathlib import Path
 from typing import Any
 
 import pytest
+import requests
 
-from cli import ContentType, get_pipeline_search_template
+import cli
+from cli import ContentType, get_pipeline_search_template, get_search_templates
+from cli.services import cache
 
 
 class _FakeResponse:
-    def __init__(self, payload: dict[str, Any]):
+    def __init__(
+        self,
+        payload: dict[str, Any],
+        status_code: int = 200,
+        headers: dict[str, str] | None = None,
+    ):
         self._payload = payload
+        self.status_code = status_code
+        self.headers = headers or {}
 
     def json(self) -> dict[str, Any]:
         return self._payload
 
+    def raise_for_status(self) -> None:
+        pass
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cache, "cache_directory", tmp_path)
+    monkeypatch.setattr(cli, "_search_templates", {})
+
 
 def test_get_pipeline_search_template_extracts_index_date(
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
-    def fake_get(url: str, timeout: int) -> _FakeResponse:  # noqa: ARG001
+    def fake_get(url: str, timeout: int, headers: dict) -> _FakeResponse:  # noqa: ARG001
         return _FakeResponse(
             {
                 "templates": [
@@ -46,7 +66,7 @@ def test_get_pipeline_search_template_extracts_index_date(
 def test_get_pipeline_search_template_raises_on_unexpected_index_format(
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
-    def fake_get(url: str, timeout: int) -> _FakeResponse:  # noqa: ARG001
+    def fake_get(url: str, timeout: int, headers: dict) -> _FakeResponse:  # noqa: ARG001
         return _FakeResponse(
             {
                 "templates": [
@@ -66,3 +86,75 @@ def test_get_pipeline_search_template_raises_on_unexpected_index_format(
             api_url="https://example.invalid/catalogue/v2",
             content_type=ContentType.works,
         )
+
+
+templates = {
+    "templates": [
+        {
+            "index": "works-indexed-2025-10-02",
+            "pipeline": "2025-10-02",
+            "query": "{}",
+        }
+    ]
+}
+
+
+def test_search_templates_are_fetched_once_per_process(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    requested_urls = []
+
+    def fake_get(url: str, timeout: int, headers: dict) -> _FakeResponse:  # noqa: ARG001
+        requested_urls.append(url)
+        return _FakeResponse(templates)
+
+    monkeypatch.setattr("cli.requests.get", fake_get)
+
+    for _ in range(3):
+        get_search_templates("https://example.invalid/catalogue/v2")
+
+    assert len(requested_urls) == 1
+
+
+def test_expired_search_templates_are_revalidated(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    sent_headers = []
+
+    def fake_get(url: str, timeout: int, headers: dict) -> _FakeResponse:  # noqa: ARG001
+        sent_headers.append(headers)
+        if headers.get("If-None-Match") == '"v1"':
+            return _FakeResponse({}, status_code=304)
+        return _FakeResponse(templates, headers={"ETag": '"v1"'})
+
+    monkeypatch.setattr("cli.requests.get", fake_get)
+    monkeypatch.setattr(cli, "search_templates_ttl", 0)
+
+    first = get_search_templates("https://example.invalid/catalogue/v2")
+    monkeypatch.setattr(cli, "_search_templates", {})
+    second = get_search_templates("https://example.invalid/catalogue/v2")
+
+    assert first == second == templates["templates"]
+    assert sent_headers == [{}, {"If-None-Match": '"v1"'}]
+
+
+def test_expired_search_templates_are_used_when_offline(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        "cli.requests.get",
+        lambda url, timeout, headers: _FakeResponse(templates),  # noqa: ARG005
+    )
+    get_search_templates("https://example.invalid/catalogue/v2")
+
+    def unreachable(url: str, timeout: int, headers: dict) -> _FakeResponse:  # noqa: ARG001
+        raise requests.ConnectionError("offline")
+
+    monkeypatch.setattr("cli.requests.get", unreachable)
+    monkeypatch.setattr(cli, "search_templates_ttl", 0)
+    monkeypatch.setattr(cli, "_search_templates", {})
+
+    assert (
+        get_search_templates("https://example.invalid/catalogue/v2")
+        == templates["templates"]
+    )
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from cli import ContentType
+from cli.plugin import RankPlugin
+from cli.relevance_tests import models
+
+test_module = """
+import pytest
+
+from cli.relevance_tests.models import RecallTestCase
+
+
+@pytest.mark.parametrize(
+    "test_case",
+    [
+        RecallTestCase(search_terms="run", expected_ids=["a"]).param,
+        pytest.param(
+            RecallTestCase(search_terms="skipped", expected_ids=["a"]),
+            marks=pytest.mark.skip,
+        ),
+        pytest.param(
+            RecallTestCase(search_terms="skipped if", expected_ids=["a"]),
+            marks=pytest.mark.skipif(True, reason="not today"),
+        ),
+        pytest.param(
+            RecallTestCase(search_terms="not skipped", expected_ids=["a"]),
+            marks=pytest.mark.skipif(False, reason="not today"),
+        ),
+    ],
+)
+def test_recall(test_case, search):
+    search(test_case.search_terms, test_case.search_size)
+
+
+@pytest.mark.latency
+def test_latency(search):
+    search("latency", 10)
+"""
+
+
+class _FakeClient:
+    def __init__(self):
+        self.searched: list[str] = []
+
+    def _response(self, body):
+        self.searched.append(body["query"]["match"]["title"])
+        return {"took": 1, "hits": {"hits": []}}
+
+    def search(self, index, **body):
+        return self._response(body)
+
+    def msearch(self, searches):
+        return {"responses": [self._response(body) for body in searches[1::2]]}
+
+
+def test_search_size_must_be_defined_by_each_kind_of_test_case():
+    with pytest.raises(TypeError):
+        models.TestCase(search_terms="cholera")  # type: ignore[abstract]
+
+
+def test_skipped_and_latency_tests_are_not_run(tmp_path):
+    (tmp_path / "test_example.py").write_text(test_module)
+    client: Any = _FakeClient()
+    context: Any = SimpleNamespace(
+        meta={
+            "client": client,
+            "index": "works",
+            "content_type": ContentType.works,
+            "query_template": {"match": {"title": "{{query}}"}},
+            "save_results": False,
+            "profile": False,
+            "batch_size": 50,
+            "concurrency": 1,
+            "search_timeout": "1s",
+            "analyzer_only": False,
+            "latency": False,
+            "latency_baseline": None,
+        }
+    )
+
+    pytest.main(
+        ["-q", "-p", "no:cacheprovider", str(tmp_path)],
+        plugins=[RankPlugin(context=context)],
+    )
+
+    assert sorted(client.searched) == ["not skipped", "run"]
@@ -0,0 +1,92 @@
+from cli.profiling import ProfileSummary, clause_label
+
+
+def query(type, description, time_in_nanos, children=()):
+    return {
+        "type": type,
+        "description": description,
+        "time_in_nanos": time_in_nanos,
+        "children": list(children),
+    }
+
+
+def response(title_terms, title_nanos):
+    return {
+        "profile": {
+            "shards": [
+                {
+                    "id": f"[node][works][{shard}]",
+                    "searches": [
+                        {
+                            "rewrite_time": 100,
+                            "collector": [{"time_in_nanos": 400}],
+                            "query": [
+                                query(
+                                    "BooleanQuery",
+                                    f"title:{title_terms} "
+                                    "contributors.agent.label:smith",
+                                    title_nanos + 3000,
+                                    [
+                                        query(
+                                            "TermQuery",
+                                            f"title:{title_terms}",
+                                            title_nanos,
+                                        ),
+                                        query(
+                                            "ToParentBlockJoinQuery",
+                                            "ToParentBlockJoinQuery "
+                                            "(contributors.agent.label:smith)",
+                                            2000,
+                                        ),
+                                    ],
+                                )
+                            ],
+                        }
+                    ],
+                }
+                for shard in range(2)
+            ]
+        }
+    }
+
+
+def test_clauses_are_labelled_by_type_and_fields():
+    assert (
+        clause_label(query("BooleanQuery", "+title.english:foo^2.0 +id:x", 0))
+        == "BooleanQuery (id, title.english)"
+    )
+    assert clause_label(query("MatchAllDocsQuery", "*:*", 0)) == (
+        "MatchAllDocsQuery"
+    )
+
+
+def test_timings_are_aggregated_by_clause_across_searches():
+    profile = ProfileSummary()
+    profile.add("foo", response("foo", 5000))
+    profile.add("bar", response("bar", 1000))
+    profile.add("unprofiled", {"hits": {"hits": []}})
+
+    root = ("BooleanQuery (contributors.agent.label, title)",)
+    title = (*root, "TermQuery (title)")
+    assert profile.searches == 2
+    assert profile.clause_nanos[title] == 2 * (5000 + 1000)
+    assert profile.clause_self_nanos[root] == 4 * 1000
+    assert profile.clause_count[title] == 4
+    assert profile.shard_searches == {
+        "[node][works][0]": 2,
+        "[node][works][1]": 2,
+    }
+    assert profile.search_nanos["foo"] == 2 * (100 + 400 + 8000)
+
+
+def test_report_ranks_clauses_by_self_time():
+    profile = ProfileSummary()
+    profile.add("foo", response("foo", 5000))
+
+    lines = profile.report()
+    clause_lines = lines[3:6]
+    assert clause_lines[0].endswith("BooleanQuery > TermQuery (title)")
+    assert clause_lines[1].endswith(
+        "BooleanQuery > ToParentBlockJoinQuery (contributors.agent.label)"
+    )
+    assert ProfileSummary().report() == []
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from typing import Any
+
+from cli.services.reindex import (
+    AdaptiveThrottle,
+    SearchLoad,
+    SearchLoadMonitor,
+    config_marker,
+    resumable_update,
+    sample_slice_boundaries,
+    slice_queries,
+)
+
+
+def matches(query: dict[str, Any], document: dict[str, Any]) -> bool:
+    """Evaluates the subset of the query DSL used by slice queries"""
+    if "match_all" in query:
+        return True
+    if "range" in query:
+        [(field, bounds)] = query["range"].items()
+        value = document.get(field)
+        return (
+            value is not None
+            and ("gte" not in bounds or value >= bounds["gte"])
+            and ("lt" not in bounds or value < bounds["lt"])
+        )
+    if "exists" in query:
+        return query["exists"]["field"] in document
+    if "must_not" in query["bool"]:
+        return not matches(query["bool"]["must_not"], document)
+    return any(matches(clause, document) for clause in query["bool"]["should"])
+
+
+class _FakeSampleClient:
+    def __init__(self, values: list[str]):
+        self.values = values
+
+    def search(self, **kwargs: Any) -> dict[str, Any]:
+        return {
+            "hits": {
+                "hits": [
+                    {"fields": {"query.id": [value]}} for value in self.values
+                ]
+            }
+        }
+
+
+def test_slices_split_a_sample_evenly() -> None:
+    client: Any = _FakeSampleClient([f"{i:03}" for i in reversed(range(100))])
+
+    boundaries = sample_slice_boundaries(client, "works", "query.id", slices=4)
+
+    assert boundaries == ["025", "050", "075"]
+
+
+def test_slices_cover_every_document_exactly_once() -> None:
+    documents = [{"query.id": f"{i:03}"} for i in range(100)] + [{}]
+    queries = slice_queries("query.id", ["025", "050", "075"])
+
+    assert len(queries) == 4
+    for document in documents:
+        assert sum(matches(query, document) for query in queries) == 1
+    assert slice_queries("query.id", []) == [{"match_all": {}}]
+
+
+class _FakeStatsClient:
+    def __init__(self) -> None:
+        self.samples = [(100, 1000, 0, 0), (200, 6000, 2, 5)]
+        self.nodes = self
+
+    def stats_for(self, totals: tuple[int, int, int, int]) -> dict[str, Any]:
+        query_total, query_time, rejected, queue = totals
+        return {
+            "indices": {
+                "search": {
+                    "query_total": query_total,
+                    "query_time_in_millis": query_time,
+                }
+            },
+            "thread_pool": {"search": {"rejected": rejected, "queue": queue}},
+        }
+
+    def stats(self, **kwargs: Any) -> dict[str, Any]:
+        totals = self.samples.pop(0)
+        # split across two nodes
+        half = (totals[0] // 2, totals[1] // 2, totals[2] // 2, totals[3] // 2)
+        return {"nodes": {"a": self.stats_for(half), "b": self.stats_for(half)}}
+
+
+def test_search_load_is_measured_between_samples() -> None:
+    client: Any = _FakeStatsClient()
+    monitor = SearchLoadMonitor(client)
+
+    assert monitor.sample() == SearchLoad(latency_ms=50.0, queue=4, rejected=2)
+
+
+def test_throttle_backs_off_quickly_and_recovers_gradually() -> None:
+    throttle = AdaptiveThrottle(
+        rate=1000,
+        min_rate=100,
+        max_rate=1500,
+        max_latency_ms=50,
+        max_queue=10,
+    )
+    healthy = SearchLoad(latency_ms=10, queue=0, rejected=0)
+
+    assert throttle.update(healthy) == 1250
+    assert throttle.update(healthy) == 1500
+    assert (
+        throttle.update(SearchLoad(latency_ms=80, queue=0, rejected=0)) == 750
+    )
+    assert (
+        throttle.update(SearchLoad(latency_ms=10, queue=20, rejected=0)) == 375
+    )
+    assert (
+        throttle.update(SearchLoad(latency_ms=10, queue=0, rejected=1)) == 187.5
+    )
+    assert (
+        throttle.update(SearchLoad(latency_ms=99, queue=0, rejected=0)) == 100
+    )
+
+
+def test_resumable_updates_skip_marked_documents():
+    query, script = resumable_update(
+        {"term": {"type": "Work"}}, marker_field="rank.updated", marker="v2"
+    )
+
+    assert query == {
+        "bool": {
+            "filter": [{"term": {"type": "Work"}}],
+            "must_not": [{"term": {"rank.updated": "v2"}}],
+        }
+    }
+    assert script["params"] == {"field": "rank.updated", "marker": "v2"}
+    assert resumable_update(None, "rank.updated", "v2")[0]["bool"][
+        "filter"
+    ] == [{"match_all": {}}]
+
+
+def test_config_markers_change_when_the_config_does():
+    config = {"mappings": {"properties": {"title": {"type": "text"}}}}
+    edited = {"mappings": {"properties": {"title": {"type": "keyword"}}}}
+
+    marker = config_marker("works-2024", config)
+    assert marker.startswith("works-2024-")
+    assert marker == config_marker("works-2024", dict(config))
+    assert marker != config_marker("works-2024", edited)
@@ -0,0 +1,36 @@
+from cli.relevance_tests import collect_test_cases, models
+from cli.relevance_tests.models import (
+    LatencyTestCase,
+    OrderTestCase,
+    RecallTestCase,
+)
+
+
+def test_collects_every_test_case_for_a_content_type():
+    test_cases = collect_test_cases("works")
+
+    assert all(
+        isinstance(test_case, models.TestCase) for test_case in test_cases
+    )
+    assert {type(test_case) for test_case in test_cases} >= {
+        RecallTestCase,
+        OrderTestCase,
+        LatencyTestCase,
+    }
+    assert "cve4dn84" in {
+        doc_id
+        for test_case in test_cases
+        for doc_id in test_case.referenced_ids
+    }
+
+
+def test_referenced_ids_include_every_asserted_document():
+    recall = RecallTestCase(
+        search_terms="a", expected_ids=["x"], forbidden_ids=["y"]
+    )
+    order = OrderTestCase(search_terms="a", before_ids=["x"], after_ids=["z"])
+    latency = LatencyTestCase(search_terms="a", max_took_ms=100)
+
+    assert recall.referenced_ids == ["x", "y"]
+    assert order.referenced_ids == ["x", "z"]
+    assert latency.referenced_ids == []
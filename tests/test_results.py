@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import math
+from pathlib import Path
+
+from cli.results import RunResults, find_runs
+
+query_template = {"match": {"title": "{{query}}"}}
+
+
+def _response(took: int, *hits: tuple[str, float]) -> dict:
+    return {
+        "took": took,
+        "hits": {
+            "hits": [
+                {"_id": doc_id, "_score": score, "sort": [score, doc_id]}
+                for doc_id, score in hits
+            ]
+        },
+    }
+
+
+def test_results_round_trip_through_a_file(tmp_path: Path) -> None:
+    run = RunResults.from_responses(
+        index="works-indexed-2025-10-02",
+        query_template=query_template,
+        responses=[
+            ("anatomy", ["anatomy"], _response(12, ("a", 3.5), ("b", 2.0))),
+            ("melancholy", ["m1", "m2"], _response(7, ("b", 9.0))),
+            ("nothing", ["nothing"], _response(1)),
+        ],
+    )
+    path = run.write(directory=tmp_path)
+
+    loaded = RunResults.read(path)
+
+    assert loaded.index == "works-indexed-2025-10-02"
+    assert loaded.doc_ids == ["a", "b"]
+    assert loaded.ranked_ids("anatomy") == ["a", "b"]
+    assert loaded.ranked_ids("melancholy") == ["b"]
+    assert loaded.ranked_ids("nothing") == []
+    assert loaded.ranked_ids("missing") is None
+    assert list(loaded.columns["rank"]) == [1, 2, 1]
+    assert list(loaded.columns["score"]) == [3.5, 2.0, 9.0]
+    assert [query["took"] for query in loaded.queries] == [12, 7, 1]
+    assert loaded.queries[1]["test_case_ids"] == ["m1", "m2"]
+
+
+def test_runs_are_found_by_index_and_query_template(tmp_path: Path) -> None:
+    for index in ["works-a", "works-b"]:
+        RunResults.from_responses(
+            index=index,
+            query_template=query_template,
+            responses=[("anatomy", ["anatomy"], {"hits": {"hits": []}})],
+        ).write(directory=tmp_path)
+
+    assert len(find_runs(directory=tmp_path)) == 2
+    assert len(find_runs("works-a", query_template, directory=tmp_path)) == 1
+    assert find_runs("works-a", {"match_all": {}}, directory=tmp_path) == []
+
+
+def test_missing_scores_are_stored_as_nan() -> None:
+    run = RunResults.from_responses(
+        index="works",
+        query_template=query_template,
+        responses=[("a", ["a"], {"hits": {"hits": [{"_id": "a"}]}})],
+    )
+
+    assert math.isnan(run.columns["score"][0])
+
+
+def test_runs_in_quick_succession_are_all_kept(tmp_path: Path) -> None:
+    paths = {
+        RunResults.from_responses(
+            index="works-a",
+            query_template=query_template,
+            responses=[("anatomy", ["anatomy"], {"hits": {"hits": []}})],
+        ).write(directory=tmp_path)
+        for _ in range(3)
+    }
+
+    assert len(paths) == 3
+    assert find_runs(directory=tmp_path) == sorted(paths)
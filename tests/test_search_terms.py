@@ -0,0 +1,45 @@
+import json
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from cli import ContentType
+from cli.commands.search import read_terms, term_window, write_terms
+
+
+def test_term_files_keep_counts_most_frequent_first(tmp_path: Path):
+    path = tmp_path / "works_2026-01-31.json.gz"
+    counts = Counter({"cholera": 3, "darwin": 10, "x-rays": 1})
+
+    write_terms(
+        path,
+        counts,
+        since=datetime(2026, 1, 1),
+        until=datetime(2026, 1, 31),
+    )
+
+    terms = read_terms(path, ContentType.works)
+    assert terms == counts
+    assert list(terms) == ["darwin", "cholera", "x-rays"]
+
+
+def test_older_term_files_count_each_term_once(tmp_path: Path):
+    path = tmp_path / "works_2025-01-31.json"
+    path.write_text(json.dumps(["cholera", "darwin"]))
+
+    assert read_terms(path, ContentType.works) == {"cholera": 1, "darwin": 1}
+
+
+def test_term_windows_are_in_utc():
+    since, until = term_window(None, None, days=7)
+    assert until.tzinfo == timezone.utc
+    assert until - since == timedelta(days=7)
+    assert abs(datetime.now(timezone.utc) - until) < timedelta(minutes=1)
+
+    since, until = term_window(
+        datetime(2025, 1, 1),
+        datetime(2025, 1, 2, tzinfo=timezone(timedelta(hours=1))),
+        days=30,
+    )
+    assert since.isoformat() == "2025-01-01T00:00:00+00:00"
+    assert until.isoformat() == "2025-01-01T23:00:00+00:00"
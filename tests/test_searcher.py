@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from typing import Any
+
+from cli.searcher import Searcher
+
+
+class _FakeClient:
+    def __init__(self) -> None:
+        self.searches: list[dict[str, Any]] = []
+        self.msearches: list[list[dict[str, Any]]] = []
+
+    def _response(self, body: dict[str, Any]) -> dict[str, Any]:
+        terms = body["query"]["match"]["title"]
+        return {
+            "took": 1,
+            "hits": {
+                "hits": [{"_id": f"{terms}-{i}"} for i in range(body["size"])]
+            },
+        }
+
+    def search(self, index: str, **body: Any) -> dict[str, Any]:
+        self.searches.append({"index": index, **body})
+        return self._response(body)
+
+    def msearch(self, searches: list[dict[str, Any]]) -> dict[str, Any]:
+        self.msearches.append(searches)
+        return {"responses": [self._response(body) for body in searches[1::2]]}
+
+
+def _searcher(
+    client: _FakeClient, batch_size: int = 50, concurrency: int = 1
+) -> Searcher:
+    return Searcher(
+        client=client,
+        index="works",
+        render_query=lambda terms: {"match": {"title": terms}},
+        stable_sort_key="query.id",
+        batch_size=batch_size,
+        concurrency=concurrency,
+    )
+
+
+def test_prefetch_batches_searches_into_chunked_msearch_requests() -> None:
+    client = _FakeClient()
+    searcher = _searcher(client, batch_size=2)
+
+    searcher.prefetch([("a", 1), ("b", 2), ("c", 3), ("a", 1)])
+
+    assert [len(searches) // 2 for searches in client.msearches] == [2, 1]
+    assert searcher.search("b", 2)["hits"]["hits"] == [
+        {"_id": "b-0"},
+        {"_id": "b-1"},
+    ]
+    assert client.searches == []
+
+
+def test_search_falls_back_to_an_individual_request() -> None:
+    client = _FakeClient()
+    searcher = _searcher(client)
+
+    searcher.prefetch([("a", 1)])
+    searcher.search("b", 1)
+
+    assert len(client.msearches) == 1
+    assert client.searches == [
+        {
+            "index": "works",
+            "query": {"match": {"title": "b"}},
+            "sort": [{"_score": "desc"}, {"query.id": "asc"}],
+            "size": 1,
+            "_source": False,
+        }
+    ]
+
+
+def test_prefetch_skips_errored_responses() -> None:
+    client = _FakeClient()
+    client.msearch = lambda searches: {  # type: ignore[method-assign]
+        "responses": [{"error": {"type": "search_phase_execution_exception"}}]
+    }
+    searcher = _searcher(client)
+
+    searcher.prefetch([("a", 1)])
+    searcher.search("a", 1)
+
+    assert len(client.searches) == 1
+
+
+def test_batch_size_of_zero_disables_prefetching() -> None:
+    client = _FakeClient()
+    searcher = _searcher(client, batch_size=0)
+
+    searcher.prefetch([("a", 1)])
+
+    assert client.msearches == []
+
+
+def test_concurrent_prefetch_fetches_every_chunk() -> None:
+    client = _FakeClient()
+    searcher = _searcher(client, batch_size=2, concurrency=4)
+
+    searcher.prefetch([(str(i), 1) for i in range(9)])
+    for i in range(9):
+        searcher.search(str(i), 1)
+
+    assert len(client.msearches) == 5
+    assert client.searches == []
+
+
+def test_concurrency_prefetches_individual_searches_without_batching() -> None:
+    client = _FakeClient()
+    searcher = _searcher(client, batch_size=0, concurrency=4)
+
+    searcher.prefetch([(str(i), 1) for i in range(9)])
+    for i in range(9):
+        searcher.search(str(i), 1)
+
+    assert client.msearches == []
+    assert len(client.searches) == 9
+
+
+def test_each_search_is_fetched_once_at_the_largest_size_needed() -> None:
+    client = _FakeClient()
+    searcher = _searcher(client, batch_size=0)
+
+    searcher.prefetch([("a", 1), ("a", 3), ("b", 2)])
+    first = searcher.search("a", 1)
+    largest = searcher.search("a", 3)
+
+    assert first["hits"]["hits"] == [{"_id": "a-0"}]
+    assert largest["hits"]["hits"] == [
+        {"_id": "a-0"},
+        {"_id": "a-1"},
+        {"_id": "a-2"},
+    ]
+    assert [search["size"] for search in client.searches] == [3]
+
+
+def test_searches_larger_than_the_cached_response_are_refetched() -> None:
+    client = _FakeClient()
+    searcher = _searcher(client, batch_size=0)
+
+    searcher.search("a", 1)
+    searcher.search("a", 2)
+    searcher.search("a", 1)
+
+    assert [search["size"] for search in client.searches] == [1, 2]
+
+
+def test_profiled_searches_ask_for_a_profile() -> None:
+    client = _FakeClient()
+    searcher = Searcher(
+        client=client,
+        index="works",
+        render_query=lambda terms: {"match": {"title": terms}},
+        stable_sort_key="query.id",
+        profile=True,
+    )
+
+    searcher.search("a", 1)
+    searcher.prefetch([("b", 1)])
+
+    assert client.searches[0]["profile"] is True
+    assert client.msearches[0][1]["profile"] is True
+
+
+def test_measure_repeats_searches_without_caching() -> None:
+    client = _FakeClient()
+    searcher = _searcher(client)
+    searcher.search("a", 1)
+
+    timings = searcher.measure("a", 1, repetitions=3)
+
+    # one search for the test, one warm-up, and three measured
+    assert len(client.searches) == 5
+    assert all(
+        search["request_cache"] is False for search in client.searches[1:]
+    )
+    assert len(timings) == 3
+    assert all(timing.wall >= 0 for timing in timings)
@@ -0,0 +1,88 @@
+from typing import Any
+
+import rich.console
+
+from cli.commands.task import (
+    TaskRates,
+    build_tasks_table,
+    documents_done,
+    follow_task,
+)
+
+
+def test_rates_are_smoothed_between_polls():
+    rates = TaskRates(smoothing=0.5)
+
+    assert rates.update("a", done=0, now=0) == 0
+    assert rates.update("a", done=100, now=1) == 100
+    assert rates.update("a", done=400, now=2) == 200
+
+
+def test_table_shows_sliced_tasks_with_their_children():
+    status = {
+        "total": 1000,
+        "created": 200,
+        "updated": 50,
+        "version_conflicts": 10,
+        "batches": 3,
+        "retries": {"bulk": 1, "search": 2},
+        "requests_per_second": -1,
+    }
+    tasks = {
+        "node:1": {
+            "action": "indices:data/write/reindex",
+            "status": status,
+            "children": [
+                {
+                    "node": "node",
+                    "id": 2,
+                    "action": "indices:data/write/reindex",
+                    "status": {**status, "total": 500},
+                }
+            ],
+        }
+    }
+    rates = TaskRates()
+    rates.update("node:1", done=0, now=0)
+
+    console = rich.console.Console(width=200, record=True)
+    console.print(build_tasks_table(tasks, rates, now=10))
+    output = console.export_text()
+
+    assert documents_done(status) == 260
+    assert "260/1000" in output
+    assert "└ node:2" in output
+    # 26 docs/s leaves 740 documents, which takes 28 seconds
+    assert "0:00:28" in output
+    assert "unlimited" in output
+
+
+class _FakeTasks:
+    def __init__(self, states: list[dict]):
+        self.states = states
+
+    def get(self, task_id: str) -> dict:
+        return self.states.pop(0)
+
+
+class _FakeTaskClient:
+    def __init__(self, states: list[dict]):
+        self.tasks = _FakeTasks(states)
+
+
+def test_follows_a_task_until_it_completes():
+    def state(created: int, completed: bool) -> dict:
+        return {
+            "completed": completed,
+            "task": {"status": {"total": 10, "created": created}},
+            **({"response": {"created": created}} if completed else {}),
+        }
+
+    client: Any = _FakeTaskClient(
+        [state(0, False), state(5, False), state(10, True)]
+    )
+
+    task = follow_task(client, "node:1", "Reindexing", poll_interval=0)
+
+    assert task["response"] == {"created": 10}
+    assert client.tasks.states == []
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import json
+
+import chevron
+
+from cli.templates import QueryTemplate
+
+template = {
+    "bool": {
+        "should": [
+            {
+                "multi_match": {
+                    "query": "{{query}}",
+                    "fields": ["title^100", "contributors.agent.label"],
+                    "type": "cross_fields",
+                }
+            },
+            {"match_phrase": {"title": {"query": "{{ query }}", "slop": 3}}},
+            {"ids": {"values": ["{{{query}}}", "prefix-{{query}}-suffix"]}},
+        ],
+        "filter": [{"term": {"type": "Visible"}}],
+        "minimum_should_match": 1,
+    }
+}
+
+
+def test_renders_the_same_query_as_chevron() -> None:
+    search_terms = "the anatomy of melancholy 1621"
+    expected = json.loads(
+        chevron.render(json.dumps(template), {"query": search_terms})
+    )
+
+    assert QueryTemplate(template).render(search_terms) == expected
+
+
+def test_search_terms_are_inserted_verbatim() -> None:
+    search_terms = 'WA/HMM "benin" \\ <&>'
+    rendered = QueryTemplate(template).render(search_terms)
+
+    assert rendered["bool"]["should"][0]["multi_match"]["query"] == search_terms
+    assert rendered["bool"]["should"][2]["ids"]["values"] == [
+        search_terms,
+        f"prefix-{search_terms}-suffix",
+    ]
+
+
+def test_rendering_does_not_modify_the_template() -> None:
+    query_template = QueryTemplate(template)
+    first = query_template.render("first")
+    second = query_template.render("second")
+
+    assert first["bool"]["should"][0]["multi_match"]["query"] == "first"
+    assert second["bool"]["should"][0]["multi_match"]["query"] == "second"
+    assert template["bool"]["should"][0]["multi_match"]["query"] == "{{query}}"  # type: ignore[index]
+
+
+def test_templates_with_other_tags_fall_back_to_chevron() -> None:
+    sectioned = {"match": {"title": "{{#query}}{{query}}{{/query}}"}}
+
+    assert QueryTemplate(sectioned).render("melancholy") == {
+        "match": {"title": "melancholy"}
+    }
@@ -0,0 +1,149 @@
+import re
+from typing import Any
+
+import pytest
+
+from cli.relevance_tests.executors import do_test_token_overlap
+from cli.relevance_tests.models import RecallTestCase
+from cli.tokens import TokenChecker, query_fields, text_fields
+
+mappings = {
+    "properties": {
+        "query": {
+            "properties": {
+                "title": {
+                    "type": "text",
+                    "analyzer": "folded",
+                    "copy_to": "search.all",
+                    "fields": {"keyword": {"type": "keyword"}},
+                },
+                "id": {"type": "keyword"},
+            }
+        },
+        "search": {"properties": {"all": {"type": "text"}}},
+    }
+}
+
+
+def _analyze(analyzer, text):
+    """Lowercases, and folds v to u with the `folded` analyzer"""
+    tokens = []
+    for match in re.finditer(r"\w+", text):
+        token = match.group().lower()
+        if analyzer == "folded":
+            token = token.replace("v", "u")
+        tokens.append((token, match.start(), match.end()))
+    return tokens
+
+
+class _FakeIndices:
+    def __init__(self):
+        self.analyze_requests: list = []
+
+    def get_mapping(self, index):
+        return {"works-2024": {"mappings": mappings}}
+
+    def analyze(self, index, text, analyzer=None):
+        # Like Elasticsearch, analyse the texts as one stream
+        self.analyze_requests.append((analyzer, text))
+        tokens, offset = [], 0
+        for value in text:
+            for token, start, end in _analyze(analyzer, value):
+                tokens.append(
+                    {
+                        "token": token,
+                        "start_offset": offset + start,
+                        "end_offset": offset + end,
+                    }
+                )
+            offset += len(value) + 1
+        return {"tokens": tokens}
+
+
+class _FakeClient:
+    def __init__(self, sources):
+        self.sources = sources
+        self.indices = _FakeIndices()
+        self.mgets = 0
+
+    def mget(self, index, ids, source_includes):
+        self.mgets += 1
+        return {
+            "docs": [
+                {"_id": i, "found": True, "_source": self.sources[i]}
+                if i in self.sources
+                else {"_id": i, "found": False}
+                for i in ids
+            ]
+        }
+
+
+def render(search_terms):
+    return {
+        "bool": {
+            "should": [
+                {
+                    "multi_match": {
+                        "query": search_terms,
+                        "fields": ["query.title^10", "search.*"],
+                    }
+                },
+                {"match": {"query.id": {"query": search_terms}}},
+            ]
+        }
+    }
+
+
+def checker(client):
+    return TokenChecker(client=client, index="works", render_query=render)
+
+
+def test_finds_the_fields_a_query_searches():
+    assert query_fields(render("x")) == ["query.title", "search.*", "query.id"]
+    fields = text_fields(mappings["properties"])
+
+    assert set(fields) == {"query.title", "search.all"}
+    assert fields["search.all"].source_paths == ("search.all", "query.title")
+    assert fields["query.title"].search_analyzer == "folded"
+
+
+def test_analyses_texts_in_batches_and_caches_them():
+    client: Any = _FakeClient(
+        {
+            "a": {"query": {"title": ["Trinvm magicvm", "Opera"]}},
+            "b": {"query": {"title": "Trinum magicum"}},
+        }
+    )
+    tokens = checker(client)
+
+    tokens.prefetch([("Trinum magicum", ["a", "b"]), ("opera", ["a"])])
+    requests = len(client.indices.analyze_requests)
+
+    assert tokens.best_match("Trinum magicum", "a").missing == []
+    assert tokens.tokens("folded", "Opera") == ["opera"]
+    # one request per analyzer, and nothing is analysed twice
+    assert requests == 2
+    assert len(client.indices.analyze_requests) == 2
+    assert client.mgets == 1
+
+
+def test_splits_large_batches():
+    client: Any = _FakeClient({})
+    tokens = TokenChecker(
+        client=client, index="works", render_query=render, max_request_chars=10
+    )
+    tokens.prefetch([("abcdef", []), ("ghijkl", [])])
+    assert len(client.indices.analyze_requests) == 4
+
+
+def test_token_overlap_failures_name_the_missing_tokens():
+    client: Any = _FakeClient({"a": {"query": {"title": "Trinvm"}}})
+    test_case = RecallTestCase(
+        search_terms="trinum magicum", expected_ids=["a", "missing"]
+    )
+
+    with pytest.raises(pytest.fail.Exception) as error:
+        do_test_token_overlap(test_case, checker(client))
+
+    assert "a is missing tokens ['magicum']" in str(error.value)
+    assert "missing is not in the index" in str(error.value)